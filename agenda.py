@@ -0,0 +1,492 @@
+from __future__ import annotations
+
+import copy
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any
+
+from config import AppConfig, HostConfig, RelayConfig, ScheduleEvent
+from schedule import WEEK_SECONDS, compile_event
+
+try:
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover - NumPy is optional
+    np = None
+
+
+ENGINES = ("auto", "numpy", "python")
+MAX_HORIZON_DAYS = 366
+ACTION_CODES = {"suspend": 0, "wake": 1, "toggle": 2, "force-off": 3}
+
+CLASH = "clash"  # one host gets different actions in the same minute
+HOLDOFF = "holdoff"  # a relay channel is pressed again before the last press and holdoff ended
+PEAK = "peak"  # more fires or relay presses in one minute than agenda.max_* allows
+
+WEEK_MINUTES = WEEK_SECONDS // 60
+
+
+def relay_busy_seconds(action: str, host: HostConfig, relay: RelayConfig) -> float | None:
+    """How long *action* keeps *host*'s relay channel busy (press plus holdoff); None if it never presses it."""
+    if action == "suspend":
+        return None
+    wake_mode = host.wake_mode or relay.wake_mode
+    if action == "wake" and wake_mode == "wol":
+        return None  # the relay is only pulsed if the magic packet cannot be sent
+    if action == "force-off":
+        seconds = relay.force_off_seconds
+    elif action == "wake" and wake_mode != "toggle":
+        seconds = relay.wake_pulse_seconds
+    else:
+        seconds = relay.toggle_pulse_seconds
+    return seconds + relay.holdoff_seconds
+
+
+@dataclass(frozen=True, eq=False)
+class Fire:
+    """One host one event acts on, at one weekly offset (or one absolute time for a one-time event)."""
+
+    event: ScheduleEvent
+    host: str
+    pin: int | None  # relay channel pressed; None for SSH suspends and Wake-on-LAN
+    busy: float  # seconds the channel stays busy
+    offset: int  # seconds since Monday 00:00
+    once_at: datetime | None = None
+
+    @property
+    def minute(self) -> int:
+        """Minute of the week."""
+        return self.offset // 60
+
+
+def event_fires(event: ScheduleEvent, config: AppConfig) -> list[Fire]:
+    """Every (host, time) *event* acts on, regardless of ``enabled``; [] for a bad time or target."""
+    compiled = compile_event(event)
+    if not compiled.valid:
+        return []
+    try:
+        hosts = config.resolve_targets(event.target)
+    except ValueError:
+        return []
+    if compiled.once_at is not None:
+        at = compiled.once_at
+        offsets: tuple[int, ...] = (at.weekday() * 86400 + at.hour * 3600 + at.minute * 60 + at.second,)
+    else:
+        offsets = compiled.offsets
+    relay = config.relay
+    fires = []
+    for host in hosts:
+        busy = relay_busy_seconds(event.action, host, relay)
+        pin = None
+        if busy is not None:
+            pin = host.relay_pin if host.relay_pin is not None else relay.gpio_pin
+        for offset in offsets:
+            fires.append(Fire(event, host.name, pin, busy or 0.0, offset, compiled.once_at))
+    return fires
+
+
+@dataclass
+class Conflict:
+    kind: str  # CLASH, HOLDOFF or PEAK
+    at: datetime  # first (or, from ConflictIndex, next) occurrence
+    events: tuple[ScheduleEvent, ...]
+    message: str
+    occurrences: int = 1  # how often it recurs within the checked horizon
+
+    def text(self) -> str:
+        more = f" (+{self.occurrences - 1} more in the horizon)" if self.occurrences > 1 else ""
+        return f"[{self.kind}] {_when(self.at)}: {self.message}{more}"
+
+
+def _when(at: datetime) -> str:
+    return at.strftime("%a %Y-%m-%d %H:%M")
+
+
+def _labels(events: Any) -> str:
+    return ", ".join(f"'{e.label}'" for e in events)
+
+
+def _clash_message(events: tuple[ScheduleEvent, ...], host: str) -> str:
+    names = ", ".join(f"'{e.label}' ({e.action})" for e in events)
+    return f"{names} act on {host} in the same minute"
+
+
+def _holdoff_message(first: Fire, second: Fire, gap: float) -> str:
+    if first.event is second.event:
+        return (f"'{first.event.label}' presses relay pin {first.pin} for {first.host} and {second.host} "
+                f"{gap:g}s apart; each press needs {first.busy:g}s including holdoff")
+    return (f"'{first.event.label}' and '{second.event.label}' press relay pin {first.pin} {gap:g}s apart; "
+            f"'{first.event.label}' needs {first.busy:g}s including holdoff")
+
+
+def _peak_message(what: str, count: int, limit: int, events: Any) -> str:
+    return f"{count} {what} in one minute (limit {limit}): {_labels(events)}"
+
+
+def _fleet_key(config: AppConfig) -> Any:
+    return copy.deepcopy((config.relay, config.hosts, config.groups, config.remote))
+
+
+# ---------------------------------------------------------------------------
+# Incremental checks for one event (add)
+# ---------------------------------------------------------------------------
+
+def _week_start(now: datetime) -> datetime:
+    return (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_at(fire: Fire, now: datetime) -> datetime:
+    if fire.once_at is not None:
+        return fire.once_at
+    at = _week_start(now) + timedelta(seconds=fire.offset)
+    return at if at >= now else at + timedelta(seconds=WEEK_SECONDS)
+
+
+def _gap(first: Fire, second: Fire) -> float:
+    """Seconds from *first* to *second* in the week they share (negative if *second* is earlier)."""
+    if first.once_at is not None and second.once_at is not None:
+        return (second.once_at - first.once_at).total_seconds()
+    gap = (second.offset - first.offset) % WEEK_SECONDS
+    return gap - WEEK_SECONDS if gap >= WEEK_SECONDS // 2 else gap
+
+
+def _coincide(a: Fire, b: Fire, now: datetime) -> bool:
+    """Whether *a* and *b*, a few minutes apart in the week, can both fire in the same actual week."""
+    if (a.once_at is not None and a.once_at < now) or (b.once_at is not None and b.once_at < now):
+        return False
+    if a.once_at is not None and b.once_at is not None:
+        return abs((b.once_at - a.once_at).total_seconds()) < WEEK_SECONDS // 2
+    return True
+
+
+def _concurrent(fires: list[Fire]) -> list[Fire]:
+    """The largest subset of *fires* (one minute of the week) that can land in the same actual minute.
+
+    Weekly fires always do; one-time fires only alongside others on their own date.
+    """
+    weekly = [f for f in fires if f.once_at is None]
+    dated: dict[Any, list[Fire]] = defaultdict(list)
+    for fire in fires:
+        if fire.once_at is not None:
+            dated[fire.once_at.date()].append(fire)
+    return weekly + max(dated.values(), key=len, default=[])
+
+
+class ConflictIndex:
+    """The schedule's fires bucketed by minute of the week, to vet one event at a time.
+
+    Build it once per loaded config and keep it current with ``add`` and
+    ``remove``; ``conflicts`` then only looks at the buckets the candidate's
+    own fires land in (and their neighbours, for relay holdoff), never at the
+    rest of the schedule. ``enabled`` is read live, so pausing or resuming an
+    event needs no update. Presses are assumed shorter than a minute.
+
+    Unlike the full pass, a candidate never conflicts with itself: its own
+    presses on a shared channel are serialized by the executor, and a peak
+    needs other events' presses in the same minute.
+    """
+
+    def __init__(self, config: AppConfig):
+        self.config = config
+        self._fleet = _fleet_key(config)
+        self._buckets: dict[int, list[Fire]] = defaultdict(list)
+        self._fires: dict[str, list[Fire]] = {}
+        for event in config.schedule:
+            self.add(event)
+
+    def stale(self, config: AppConfig) -> bool:
+        """True for a different config object, or when hosts, groups or relay settings changed."""
+        return config is not self.config or _fleet_key(config) != self._fleet
+
+    def add(self, event: ScheduleEvent) -> None:
+        """Index an added or edited event."""
+        self.remove(event.id)
+        fires = event_fires(event, self.config)
+        self._fires[event.id] = fires
+        for fire in fires:
+            self._buckets[fire.minute].append(fire)
+
+    def remove(self, event_id: str) -> None:
+        for fire in self._fires.pop(event_id, ()):
+            bucket = self._buckets[fire.minute]
+            bucket.remove(fire)
+            if not bucket:
+                del self._buckets[fire.minute]
+
+    def conflicts(self, event: ScheduleEvent, now: datetime | None = None) -> list[Conflict]:
+        """What scheduling *event* (as if enabled) would clash with, soonest first."""
+        now = now or datetime.now()
+        limits = self.config.agenda
+        by_minute: dict[int, list[Fire]] = defaultdict(list)
+        for fire in event_fires(event, self.config):
+            if fire.once_at is None or fire.once_at >= now:
+                by_minute[fire.minute].append(fire)
+        found: dict[tuple, Conflict] = {}
+        for minute, own in sorted(by_minute.items(), key=lambda item: _next_at(item[1][0], now)):
+            at = _next_at(own[0], now)
+            others = [
+                f for f in self._bucket(minute)
+                if f.event.id != event.id and f.event.enabled and _coincide(f, own[0], now)
+            ]
+            for fire in own:
+                for other in others:
+                    if other.host == fire.host and other.event.action != event.action:
+                        events = (other.event, event)
+                        found.setdefault(
+                            (CLASH, other.event.id, fire.host),
+                            Conflict(CLASH, at, events, _clash_message(events, fire.host)),
+                        )
+            self._check_holdoff(event, minute, own, at, now, found)
+            concurrent = _concurrent(others)
+            presses = sum(1 for f in own if f.pin is not None)
+            other_presses = sum(1 for f in concurrent if f.pin is not None)
+            total = presses + other_presses
+            limit = limits.max_relay_presses_per_minute
+            if presses and other_presses and limit > 0 and total > limit:
+                events = tuple({f.event.id: f.event for f in concurrent if f.pin is not None}.values()) + (event,)
+                found.setdefault((PEAK, "relay"), Conflict(
+                    PEAK, at, events, _peak_message("relay presses", total, limit, events)))
+            limit = limits.max_fires_per_minute
+            firing = tuple({f.event.id: f.event for f in concurrent}.values()) + (event,)
+            if concurrent and limit > 0 and len(firing) > limit:
+                found.setdefault((PEAK, "fires"), Conflict(
+                    PEAK, at, firing, _peak_message("events", len(firing), limit, firing)))
+        return list(found.values())
+
+    def _bucket(self, minute: int) -> list[Fire]:
+        return self._buckets.get(minute % WEEK_MINUTES, [])
+
+    def _check_holdoff(
+        self,
+        event: ScheduleEvent,
+        minute: int,
+        own: list[Fire],
+        at: datetime,
+        now: datetime,
+        found: dict[tuple, Conflict],
+    ) -> None:
+        pressing = [f for f in own if f.pin is not None]
+        if not pressing:
+            return
+        nearby = [
+            f for m in (minute - 1, minute, minute + 1) for f in self._bucket(m)
+            if f.pin is not None and f.event.id != event.id and f.event.enabled and _coincide(f, own[0], now)
+        ]
+        for fire in pressing:
+            for other in nearby:
+                if other.pin != fire.pin:
+                    continue
+                gap = _gap(other, fire)
+                first, second = (other, fire) if gap >= 0 else (fire, other)
+                if abs(gap) < first.busy:
+                    found.setdefault(
+                        (HOLDOFF, other.event.id, fire.pin),
+                        Conflict(HOLDOFF, at, (first.event, second.event), _holdoff_message(first, second, abs(gap))),
+                    )
+
+
+# ---------------------------------------------------------------------------
+# Whole-schedule pass over a horizon (agenda / check)
+# ---------------------------------------------------------------------------
+
+@dataclass
+class _Columns:
+    """Per-fire attributes as parallel columns, for array expansion."""
+
+    event: list[int] = field(default_factory=list)
+    host: list[int] = field(default_factory=list)
+    action: list[int] = field(default_factory=list)
+    pin: list[int] = field(default_factory=list)  # -1 = no relay press
+    busy: list[float] = field(default_factory=list)
+    offset: list[int] = field(default_factory=list)
+    once: list[int] = field(default_factory=list)  # second of the year, -1 = weekly
+
+
+@dataclass
+class _PassResult:
+    minute_events: list[tuple[int, int]]  # sorted unique (minute, event column index)
+    presses: dict[int, int]  # minute -> relay presses
+    clashes: list[tuple[int, list[int]]]  # (minute, fire indices) for one host
+    holdoffs: list[tuple[int, int, int, int]]  # (second, fire, second, fire) on one channel
+    fires: int  # fires expanded within the horizon
+
+
+@dataclass
+class Agenda:
+    start: datetime
+    end: datetime
+    engine: str  # "numpy" or "python"
+    fires: int  # host-level fires in the horizon
+    minutes: list[tuple[datetime, int, int, list[ScheduleEvent]]]  # (minute, events, relay presses, events)
+    conflicts: list[Conflict]
+
+
+def build_agenda(
+    config: AppConfig,
+    start: datetime | None = None,
+    days: int | None = None,
+    engine: str = "auto",
+) -> Agenda:
+    """Expand every enabled event over ``[start, start + days)`` and find conflicts in one pass.
+
+    Fire times become seconds (and minutes) since January 1st of *start*'s
+    year. With NumPy the expansion, the per-minute counts and the clash and
+    holdoff scans are array operations; without it (or with *engine*
+    "python") the same pass runs on lists. Raises ValueError for an unknown
+    engine, or "numpy" when NumPy is not installed.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}' — expected one of {', '.join(ENGINES)}.")
+    if engine == "numpy" and np is None:
+        raise ValueError("NumPy is not installed; use --engine python.")
+    use_numpy = np is not None and engine != "python"
+    start = (start or datetime.now()).replace(second=0, microsecond=0)
+    days = max(1, min(MAX_HORIZON_DAYS, days or config.agenda.horizon_days))
+    end = start + timedelta(days=days)
+    base = datetime(start.year, 1, 1)
+    lo = int((start - base).total_seconds())
+    hi = lo + days * 86400
+    week0 = int((_week_start(start) - base).total_seconds())
+    weeks = days // 7 + 2
+
+    fires = [f for event in config.schedule if event.enabled for f in event_fires(event, config)]
+    cols = _Columns()
+    event_ids: dict[str, int] = {}
+    events: list[ScheduleEvent] = []
+    host_ids: dict[str, int] = {}
+    for fire in fires:
+        if fire.event.id not in event_ids:
+            event_ids[fire.event.id] = len(events)
+            events.append(fire.event)
+        cols.event.append(event_ids[fire.event.id])
+        cols.host.append(host_ids.setdefault(fire.host, len(host_ids)))
+        cols.action.append(ACTION_CODES.get(fire.event.action, -1))
+        cols.pin.append(-1 if fire.pin is None else fire.pin)
+        cols.busy.append(fire.busy)
+        cols.offset.append(fire.offset)
+        cols.once.append(-1 if fire.once_at is None else int((fire.once_at - base).total_seconds()))
+
+    run = _numpy_pass if use_numpy else _python_pass
+    result = run(cols, lo, hi, week0, weeks, max(1, len(events)), max(1, len(host_ids)))
+
+    def minute_at(minute: int) -> datetime:
+        return base + timedelta(minutes=minute)
+
+    by_minute: dict[int, list[ScheduleEvent]] = defaultdict(list)
+    for minute, event_index in result.minute_events:
+        by_minute[minute].append(events[event_index])
+    minutes = [(minute_at(m), len(evs), result.presses.get(m, 0), evs) for m, evs in by_minute.items()]
+
+    found: dict[tuple, Conflict] = {}
+
+    def note(key: tuple, kind: str, minute: int, involved: tuple[ScheduleEvent, ...], message: str) -> None:
+        if key in found:
+            found[key].occurrences += 1
+        else:
+            found[key] = Conflict(kind, minute_at(minute), involved, message)
+
+    for minute, indices in result.clashes:
+        involved = tuple(events[e] for e in sorted({cols.event[i] for i in indices}))
+        host = fires[indices[0]].host
+        note((CLASH, tuple(e.id for e in involved), host), CLASH, minute, involved, _clash_message(involved, host))
+    for first_sec, first, second_sec, second in result.holdoffs:
+        a, b = fires[first], fires[second]
+        note(
+            (HOLDOFF, a.event.id, b.event.id, a.pin), HOLDOFF, first_sec // 60, (a.event, b.event),
+            _holdoff_message(a, b, second_sec - first_sec),
+        )
+    limits = config.agenda
+    pressing_ids = {f.event.id for f in fires if f.pin is not None}
+    for at, count, presses, evs in minutes:
+        minute = int((at - base).total_seconds()) // 60
+        if limits.max_relay_presses_per_minute > 0 and presses > limits.max_relay_presses_per_minute:
+            pressing = tuple(e for e in evs if e.id in pressing_ids)
+            note((PEAK, "relay", tuple(e.id for e in evs)), PEAK, minute, pressing,
+                 _peak_message("relay presses", presses, limits.max_relay_presses_per_minute, pressing))
+        if limits.max_fires_per_minute > 0 and count > limits.max_fires_per_minute:
+            note((PEAK, "fires", tuple(e.id for e in evs)), PEAK, minute, tuple(evs),
+                 _peak_message("events", count, limits.max_fires_per_minute, evs))
+    conflicts = sorted(found.values(), key=lambda c: (c.at, c.kind))
+    return Agenda(start, end, "numpy" if use_numpy else "python", result.fires, minutes, conflicts)
+
+
+def _numpy_pass(cols: _Columns, lo: int, hi: int, week0: int, weeks: int, n_events: int, n_hosts: int) -> _PassResult:
+    once = np.asarray(cols.once, dtype=np.int64)
+    offset = np.asarray(cols.offset, dtype=np.int64)
+    weekly = np.flatnonzero(once < 0)
+    dated = np.flatnonzero(once >= 0)
+    week_starts = week0 + np.arange(weeks, dtype=np.int64) * WEEK_SECONDS
+    sec = np.concatenate([(week_starts[:, None] + offset[weekly][None, :]).ravel(), once[dated]])
+    idx = np.concatenate([np.tile(weekly, weeks), dated])
+    keep = (sec >= lo) & (sec < hi)
+    sec, idx = sec[keep], idx[keep]
+    if not len(sec):
+        return _PassResult([], {}, [], [], 0)
+    minute = sec // 60
+    event = np.asarray(cols.event, dtype=np.int64)[idx]
+    host = np.asarray(cols.host, dtype=np.int64)[idx]
+    action = np.asarray(cols.action, dtype=np.int64)[idx]
+    pin = np.asarray(cols.pin, dtype=np.int64)[idx]
+    busy = np.asarray(cols.busy, dtype=np.float64)[idx]
+
+    pairs = np.unique(minute * n_events + event)
+    minute_events = list(zip((pairs // n_events).tolist(), (pairs % n_events).tolist()))
+    relay = pin >= 0
+    pressed, counts = np.unique(minute[relay], return_counts=True)
+    presses = dict(zip(pressed.tolist(), counts.tolist()))
+
+    # Clashes: group rows by (minute, host); a group whose actions differ is one clash.
+    key = minute * n_hosts + host
+    order = np.lexsort((action, key))
+    k, a = key[order], action[order]
+    starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+    ends = np.r_[starts[1:], len(k)]
+    mixed = np.minimum.reduceat(a, starts) != np.maximum.reduceat(a, starts)
+    clashes = [
+        (int(k[s] // n_hosts), idx[order[s:e]].tolist())
+        for s, e in zip(starts[mixed].tolist(), ends[mixed].tolist())
+    ]
+
+    # Holdoff: consecutive presses of one channel closer than the first one's busy time.
+    holdoffs: list[tuple[int, int, int, int]] = []
+    pressing = np.flatnonzero(relay)
+    if len(pressing) > 1:
+        order = pressing[np.lexsort((idx[pressing], sec[pressing], pin[pressing]))]
+        p, s, b = pin[order], sec[order], busy[order]
+        hits = np.flatnonzero((p[1:] == p[:-1]) & ((s[1:] - s[:-1]) < b[:-1]))
+        holdoffs = [
+            (int(s[i]), int(idx[order[i]]), int(s[i + 1]), int(idx[order[i + 1]]))
+            for i in hits.tolist()
+        ]
+    return _PassResult(minute_events, presses, clashes, holdoffs, int(len(sec)))
+
+
+def _python_pass(cols: _Columns, lo: int, hi: int, week0: int, weeks: int, n_events: int, n_hosts: int) -> _PassResult:
+    rows: list[tuple[int, int]] = []  # (second of the year, fire index)
+    for i, once in enumerate(cols.once):
+        if once >= 0:
+            if lo <= once < hi:
+                rows.append((once, i))
+            continue
+        for week in range(weeks):
+            sec = week0 + week * WEEK_SECONDS + cols.offset[i]
+            if lo <= sec < hi:
+                rows.append((sec, i))
+    minute_events = sorted({(sec // 60, cols.event[i]) for sec, i in rows})
+    presses = Counter(sec // 60 for sec, i in rows if cols.pin[i] >= 0)
+
+    groups: dict[tuple[int, int], list[int]] = defaultdict(list)
+    for sec, i in rows:
+        groups[(sec // 60, cols.host[i])].append(i)
+    clashes = [
+        (minute, indices) for (minute, _host), indices in sorted(groups.items())
+        if len({cols.action[i] for i in indices}) > 1
+    ]
+
+    pressing = sorted((cols.pin[i], sec, i) for sec, i in rows if cols.pin[i] >= 0)
+    holdoffs = [
+        (s1, i1, s2, i2)
+        for (p1, s1, i1), (p2, s2, i2) in zip(pressing, pressing[1:])
+        if p1 == p2 and s2 - s1 < cols.busy[i1]
+    ]
+    return _PassResult(minute_events, dict(presses), clashes, holdoffs, len(rows))
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import errno
+import json
+import os
+import socket
+import socketserver
+import threading
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from config import CONFIG_PATH
+
+
+SOCKET_PATH = CONFIG_PATH.parent / "powerstack.sock"
+
+Handler = Callable[[dict[str, Any]], Iterator[dict[str, Any]]]
+
+
+def socket_path() -> Path:
+    """``$POWERSTACK_SOCKET``, or ``~/.powerstack/powerstack.sock``."""
+    return Path(os.environ.get("POWERSTACK_SOCKET") or SOCKET_PATH)
+
+
+def done(ok: bool, message: str, **extra: Any) -> dict[str, Any]:
+    """The final message of a reply."""
+    return {"done": True, "ok": ok, "message": message, **extra}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    wbufsize = 65536  # items of a long reply go out in socket-sized chunks
+
+    def handle(self) -> None:
+        try:
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("expected a JSON object")
+                except ValueError as exc:
+                    self._send(done(False, f"Bad request: {exc}"))
+                    continue
+                for message in self.server.handler(request):
+                    self._send(message)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client went away mid-reply
+
+    def _send(self, message: dict[str, Any]) -> None:
+        self.wfile.write(json.dumps(message, default=str).encode() + b"\n")
+        if "item" not in message:
+            self.wfile.flush()
+
+
+class ApiServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Newline-delimited JSON over a Unix socket, one thread per connection.
+
+    Each request is one line holding a JSON object with an ``op``. The reply
+    is zero or more ``{"item": ...}`` lines, sent as they are produced, then
+    one line with ``"done": true``, ``ok`` and ``message``. A connection may
+    send any number of requests one after another; clients wanting several
+    in flight open several connections. The socket is only accessible to
+    its owner.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path: Path, handler: Handler):
+        self.path = path
+        self.handler = handler
+        _claim(path)
+        super().__init__(str(path), _RequestHandler)
+        self._thread: threading.Thread | None = None
+
+    def server_bind(self) -> None:
+        # Created owner-only: a socket that can pulse relays must never exist with
+        # umask-default permissions, not even between bind() and a chmod().
+        previous = os.umask(0o077)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(previous)
+        os.chmod(self.server_address, 0o600)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.serve_forever, name="powerstack-api", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self.shutdown()
+            self._thread = None
+        self.server_close()
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
+
+def _claim(path: Path) -> None:
+    """Remove a stale socket left by a crashed server; raise OSError if one is still answering."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if not path.exists():
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(path))
+    except OSError:
+        path.unlink()
+        return
+    finally:
+        probe.close()
+    raise OSError(errno.EADDRINUSE, f"Another PowerStack server is listening on {path}")
+
+
+class ApiClient:
+    """One connection to the API server; requests on it run one at a time."""
+
+    def __init__(self, sock: socket.socket):
+        self._sock = sock
+        self._reader = sock.makefile("rb")
+
+    def stream(self, op: str, **params: Any) -> Iterator[dict[str, Any]]:
+        """Send a request and yield every reply message, the final ``done`` one included."""
+        self._sock.sendall(json.dumps({**params, "op": op}).encode() + b"\n")
+        for line in self._reader:
+            message = json.loads(line)
+            yield message
+            if message.get("done"):
+                return
+        raise ConnectionError("The PowerStack server closed the connection.")
+
+    def call(self, op: str, **params: Any) -> dict[str, Any]:
+        """Send a request and return its final message, ignoring items."""
+        final: dict[str, Any] = {}
+        for message in self.stream(op, **params):
+            final = message
+        return final
+
+    def close(self) -> None:
+        self._reader.close()
+        self._sock.close()
+
+
+def connect(path: Path | None = None, timeout: float = 1.0) -> ApiClient | None:
+    """A client for the running server, or None when nothing is listening."""
+    path = path or socket_path()
+    if not path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+    sock.settimeout(None)  # actions with confirmation can take minutes
+    return ApiClient(sock)
@@ -3,8 +3,10 @@ from __future__ import annotations
 import sys
 
 _CLI_COMMANDS = {
-    "list", "next", "trigger", "add", "remove", "enable", "disable",
-    "suspend", "wake", "toggle", "_run",
+    "list", "next", "trigger", "add", "remove", "enable", "disable", "apply", "export", "import",
+    "suspend", "wake", "toggle", "force-off", "agenda", "check", "hosts", "ssh-pool", "storage", "daemon",
+    "serve", "status", "shell",
+    "_run", "_prewarm", "_run_slot",
 }
 
 
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""PowerStack schedule-engine benchmarks.
+
+Generates synthetic schedules (weekly/once mix, random weekdays) and times
+the hot paths of the config store, cron block builder, CLI and GUI table.
+Nothing touches the real config, crontab or relay: everything runs against
+a temporary config directory.
+
+Usage
+-----
+  python bench.py                               100 / 1k / 10k / 100k events
+  python bench.py --sizes 100,1000 --repeat 5
+  python bench.py --storage sqlite -o after.json
+  python bench.py --compare before.json         Show ratios against a saved run
+
+Results are printed as a table on stderr and written as JSON (stdout, or
+``--output``) so runs on different commits can be diffed.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Callable
+
+from config import AppConfig, ScheduleEvent
+from cron import CronManager
+from schedule import ScheduleIndex
+
+
+DEFAULT_SIZES = (100, 1_000, 10_000, 100_000)
+
+
+def synthetic_events(count: int, seed: int = 1) -> list[ScheduleEvent]:
+    """*count* events: ~80% weekly on random weekdays, ~20% one-time in the next 60 days."""
+    rng = random.Random(seed)
+    today = date.today()
+    events: list[ScheduleEvent] = []
+    for n in range(count):
+        hh, mm = rng.randrange(24), rng.randrange(60)
+        time_hhmm = f"{hh:02d}:{mm:02d}" if rng.random() < 0.9 else f"{hh:02d}:{mm:02d}:{rng.randrange(60):02d}"
+        event = ScheduleEvent(
+            id=str(uuid.UUID(int=rng.getrandbits(128))),
+            label=f"event-{n}",
+            action=rng.choice(("suspend", "wake", "toggle")),
+            time_hhmm=time_hhmm,
+            enabled=rng.random() < 0.9,
+        )
+        if rng.random() < 0.2:
+            event.recurrence = "once"
+            event.date_ymd = (today + timedelta(days=rng.randrange(60))).isoformat()
+        else:
+            event.weekdays = sorted(rng.sample(range(7), rng.randint(1, 7)))
+        events.append(event)
+    return events
+
+
+def measure(fn: Callable[[], Any], repeat: int, setup: Callable[[], Any] | None = None) -> list[float]:
+    runs: list[float] = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - started)
+    return runs
+
+
+class Bench:
+    def __init__(self, repeat: int, only: set[str] | None):
+        self.repeat = repeat
+        self.only = only
+        self.results: list[dict[str, Any]] = []
+
+    def run(
+        self,
+        name: str,
+        events: int,
+        fn: Callable[[], Any],
+        setup: Callable[[], Any] | None = None,
+        per: int = 1,
+    ) -> None:
+        """Time *fn*; *per* > 1 reports the time per operation of a loop inside *fn*."""
+        if self.only and name not in self.only:
+            return
+        runs = [r / per for r in measure(fn, self.repeat, setup)]
+        self.add(name, events, runs)
+
+    def add(self, name: str, events: int, runs: list[float], note: str = "") -> None:
+        result: dict[str, Any] = {"name": name, "events": events}
+        if runs:
+            result.update(
+                min_s=min(runs),
+                median_s=statistics.median(runs),
+                mean_s=statistics.fmean(runs),
+                runs=len(runs),
+            )
+        if note:
+            result["note"] = note
+        self.results.append(result)
+        shown = f"{result['median_s'] * 1000:10.3f} ms" if runs else f"{'skipped':>13}"
+        print(f"{name:<28} {events:>8}  {shown}  {note}", file=sys.stderr)
+
+
+def bench_size(bench: Bench, count: int, storage: str, seed: int, workdir: Path) -> None:
+    events = synthetic_events(count, seed)
+    path = workdir / f"config-{count}.json"
+    config = AppConfig(schedule=events)
+    config.storage.backend = storage
+    config.storage.sqlite_path = str(workdir / f"schedule-{count}.db")
+    store = config.schedule_store(path)
+    if store is not None:
+        store.replace_all(events)
+    config.save(path)
+
+    bench.run("config.load", count, lambda: AppConfig.load(path))
+
+    def _touch_one() -> None:
+        config.schedule[count // 2].enabled = not config.schedule[count // 2].enabled
+
+    bench.run("config.save_one_change", count, lambda: config.save(path), setup=_touch_one)
+
+    cron = CronManager()
+    bench.run("cron.build_block", count, lambda: cron._build_block(config.schedule))
+    compact = CronManager(dispatch="compact")
+    bench.run("cron.build_block_compact", count, lambda: compact._build_block(config.schedule))
+    foreign = [f"{i} 3 * * * /usr/local/bin/job-{i}" for i in range(50)]
+    crontab = foreign[:25] + cron._build_block(config.schedule) + foreign[25:]
+    bench.run("cron.strip_block", count, lambda: cron._strip_block(crontab))
+
+    bench.run("index.build", count, lambda: ScheduleIndex(config.schedule))
+
+    from cli import PowerStackCLI
+
+    cli = PowerStackCLI(log=lambda _message: None, config=config)
+    sink = io.StringIO()
+
+    def _quiet(fn: Callable[[], Any]) -> Callable[[], Any]:
+        def _call() -> None:
+            sink.seek(0)
+            sink.truncate()
+            with contextlib.redirect_stdout(sink):
+                fn()
+        return _call
+
+    bench.run("cli.cmd_list", count, _quiet(cli.cmd_list))
+    bench.run("cli.cmd_next", count, _quiet(lambda: cli.cmd_next(10)))
+    bench.run("cli.cmd_next_repeat_100", count, _quiet(lambda: cli.cmd_next(100, repeat=True)))
+
+    rng = random.Random(seed)
+    keys = []
+    for _ in range(1000):
+        event = rng.choice(events)
+        keys.append(rng.choice((event.id, event.label.upper(), str(rng.randint(1, count)))))
+
+    def _lookups() -> None:
+        for key in keys:
+            cli._find_event(key)
+
+    bench.run("cli.find_event", count, _lookups, per=len(keys))
+
+    bench_gui(bench, count, config)
+
+
+def bench_gui(bench: Bench, count: int, config: AppConfig) -> None:
+    names = ("gui.table_populate", "gui.table_refresh_noop")
+    if bench.only and not bench.only.intersection(names):
+        return
+    try:
+        import tkinter as tk
+
+        from gui import PowerStackApp
+
+        root = tk.Tk()
+        root.withdraw()
+    except Exception as exc:
+        for name in names:
+            bench.add(name, count, [], note=f"no Tk display ({type(exc).__name__})")
+        return
+    try:
+        # Only the state _populate_schedule_table reads; no relay, cron or windows.
+        app = PowerStackApp.__new__(PowerStackApp)
+        app.root = root
+        app.config = config
+        app.index = ScheduleIndex(config.schedule)
+        app.selected_event_id = None
+        app._row_fingerprints = {}
+        tables: list[Any] = []
+
+        def _fresh_table() -> None:
+            for table in tables:
+                app._row_fingerprints.pop(str(table), None)
+                table.destroy()
+            tables[:] = [app._create_schedule_table(root)]
+
+        def _populate() -> None:
+            app._populate_schedule_table(tables[0])
+            root.update_idletasks()
+
+        bench.run("gui.table_populate", count, _populate, setup=_fresh_table)
+        bench.run("gui.table_refresh_noop", count, _populate)
+    finally:
+        root.destroy()
+
+
+def git_commit() -> str:
+    try:
+        proc = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    except OSError:
+        return ""
+    return proc.stdout.strip()
+
+
+def compare(results: list[dict[str, Any]], baseline_path: Path) -> None:
+    baseline = json.loads(baseline_path.read_text())
+    before = {(r["name"], r["events"]): r for r in baseline.get("results", []) if "median_s" in r}
+    print(f"\nvs {baseline_path} ({baseline.get('meta', {}).get('commit') or 'unknown commit'}):", file=sys.stderr)
+    for r in results:
+        old = before.get((r["name"], r["events"]))
+        if old is None or "median_s" not in r or old["median_s"] <= 0:
+            continue
+        ratio = r["median_s"] / old["median_s"]
+        print(f"{r['name']:<28} {r['events']:>8}  x{ratio:6.2f}", file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="PowerStack schedule-engine benchmarks")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(n) for n in DEFAULT_SIZES),
+        help="Comma-separated event counts (default: 100,1000,10000,100000)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (default: 3)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--only", default="", help="Comma-separated benchmark names to run")
+    parser.add_argument("--output", "-o", default="-", help="JSON results file (default: stdout)")
+    parser.add_argument("--compare", default=None, metavar="FILE", help="Earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    only = {name.strip() for name in args.only.split(",") if name.strip()} or None
+    bench = Bench(max(1, args.repeat), only)
+    print(f"{'benchmark':<28} {'events':>8}  {'median':>13}", file=sys.stderr)
+    with tempfile.TemporaryDirectory(prefix="powerstack-bench-") as tmp:
+        for count in sizes:
+            bench_size(bench, count, args.storage, args.seed, Path(tmp))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "storage": args.storage,
+            "repeat": bench.repeat,
+            "seed": args.seed,
+        },
+        "results": bench.results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        Path(args.output).write_text(text + "\n")
+    if args.compare:
+        compare(bench.results, Path(args.compare))
+
+
+if __name__ == "__main__":
+    main()
@@ -10,27 +10,58 @@ Usage
   python app.py remove <event>            Remove an event
   python app.py enable  <event>           Enable an event
   python app.py disable <event>           Pause an event
-  python app.py suspend                   Suspend remote PC now
-  python app.py wake                      Wake remote PC now
-  python app.py toggle                    Toggle remote PC power now
+  python app.py apply <file|->            Apply a batch of schedule edits atomically
+  python app.py export [-f csv] [-o FILE] Export the schedule as JSONL or CSV
+  python app.py import <file|->           Upsert events from a JSONL or CSV file
+  python app.py suspend [target]          Suspend remote PC(s) now
+  python app.py wake [target]             Wake remote PC(s) now
+  python app.py toggle [target]           Toggle remote PC power now
+  python app.py force-off [target]        Hold the power button to force PC(s) off
+  python app.py agenda [--days N]         Per-minute fire counts over the coming days
+  python app.py check [--days N]          Report schedule conflicts and load peaks
+  python app.py hosts                     List configured hosts and groups
+  python app.py ssh-pool status           Show pooled SSH connections
+  python app.py storage [sqlite|json]     Show or switch the schedule backend
+  python app.py daemon                    Run the resident scheduler
+  python app.py serve                     Serve the control API (cron mode)
+  python app.py shell                     Run many commands from one warm process
+  python app.py status [job]              Show the server's action queue and recent actions
 
   <event> can be a 1-based list index, an event ID (UUID), or a label.
+  [target] is a comma-separated list of host/group names (default: all).
 """
 from __future__ import annotations
 
 import argparse
+import csv
+import json
+import os
+import shutil
+import signal
 import sys
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import fields as dataclass_fields, replace
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Callable
+from typing import Any, Callable, Iterator, TextIO
 
-from config import AppConfig, ScheduleEvent
-from control import RelayController, RemotePcController
-from cron import CronManager
+from agenda import CLASH, ENGINES, Agenda, ConflictIndex, build_agenda
+from api import ApiClient, ApiServer, connect as connect_api, done as api_done, socket_path
+from config import CONFIG_PATH, AppConfig, LogConfig, ScheduleEvent
+from cron import SYNC_DRIFT, CronManager, events_in_minute, last_fire_minute, line_recurrence
+from executor import MANUAL, SCHEDULED
+from fleet import ACTIONS, FleetController, FleetResult
+from logsink import RotatingLogWriter
+from metrics import METRICS, SCHEDULE_LAG_SECONDS
+from schedule import ScheduleIndex
 
 
 WEEKDAY_LABELS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+SCHEDULE_ACTIONS = ("suspend", "wake", "toggle")
 LOG_PATH = Path.home() / ".powerstack" / "powerstack.log"
 
 
@@ -38,14 +69,21 @@ LOG_PATH = Path.home() / ".powerstack" / "powerstack.log"
 # Logging helpers
 # ---------------------------------------------------------------------------
 
+_log_sink: RotatingLogWriter | None = None
+
+
+def _configure_log_sink(config: LogConfig) -> None:
+    global _log_sink
+    if _log_sink is None:
+        _log_sink = RotatingLogWriter(LOG_PATH, config)
+    else:
+        _log_sink.reconfigure(config)
+
+
 def _log_to_file(message: str) -> None:
-    stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    try:
-        LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
-        with LOG_PATH.open("a") as fh:
-            fh.write(f"[{stamp}] {message}\n")
-    except Exception:
-        pass
+    if _log_sink is None:
+        _configure_log_sink(LogConfig())
+    _log_sink.write(message)
 
 
 def _print_and_log(message: str) -> None:
@@ -59,68 +97,64 @@ def _print_and_log(message: str) -> None:
 # ---------------------------------------------------------------------------
 
 class PowerStackCLI:
-    def __init__(self, log: Callable[[str], None] = _print_and_log) -> None:
+    def __init__(self, log: Callable[[str], None] = _print_and_log, config: AppConfig | None = None) -> None:
         self.log = log
-        self.config = AppConfig.load()
-        self.cron = CronManager()
+        self.config = config if config is not None else AppConfig.load()
+        _configure_log_sink(self.config.log)
+        METRICS.configure(self.config.metrics)
+        self.cron = CronManager.from_config(self.config)
+        self.index = ScheduleIndex(self.config.schedule)
+        self._conflicts: ConflictIndex | None = None  # built on the first conflict check
 
     # ------------------------------------------------------------------
     # Helpers
     # ------------------------------------------------------------------
 
     def _reload(self) -> None:
-        self.config = AppConfig.load()
+        config = AppConfig.reload(self.config)
+        if config is self.config:
+            return
+        self.config = config
+        self.cron.apply_config(self.config)
+        self.index = ScheduleIndex(self.config.schedule)
 
     def _save(self) -> None:
         self.config.save()
         try:
-            self.cron.sync(self.config.schedule)
+            outcome = self.cron.sync(self.config.schedule)
         except Exception as exc:
             self.log(f"[WARN] Crontab sync failed: {exc}")
+            return
+        if outcome == SYNC_DRIFT:
+            self.log("[WARN] PowerStack crontab block was edited outside PowerStack; rewrote it.")
+        else:
+            _log_to_file(f"Crontab sync: {outcome}.")
 
     def _find_event(self, id_or_index: str) -> ScheduleEvent | None:
-        # Try UUID match first
-        for e in self.config.schedule:
-            if e.id == id_or_index:
-                return e
-        # Try 1-based index
-        try:
-            idx = int(id_or_index) - 1
-            if 0 <= idx < len(self.config.schedule):
-                return self.config.schedule[idx]
-        except ValueError:
-            pass
-        # Try case-insensitive label
-        needle = id_or_index.lower()
-        for e in self.config.schedule:
-            if e.label.lower() == needle:
-                return e
-        return None
+        return self.index.find(id_or_index)
 
-    def _make_relay(self) -> RelayController:
-        return RelayController(self.config.relay, self.log)
+    def _conflict_index(self) -> ConflictIndex:
+        if self._conflicts is None or self._conflicts.stale(self.config):
+            self._conflicts = ConflictIndex(self.config)
+        return self._conflicts
 
-    # ------------------------------------------------------------------
-    # Actions
-    # ------------------------------------------------------------------
+    def _make_fleet(self) -> FleetController:
+        return FleetController(self.config, None, self.log)
 
-    def run_action(self, action: str) -> None:
-        relay = self._make_relay()
-        remote = RemotePcController(relay, self.log)
-        if action == "suspend":
-            result = remote.suspend(self.config.remote)
-        elif action == "wake":
-            if self.config.relay.wake_mode == "toggle":
-                result = remote.toggle_power(self.config.relay.toggle_pulse_seconds)
-            else:
-                result = remote.wake_via_power_button(self.config.relay.wake_pulse_seconds)
-        elif action == "toggle":
-            result = remote.toggle_power(self.config.relay.toggle_pulse_seconds)
-        else:
-            self.log(f"[ERROR] Unknown action: {action}")
-            return
+    def run_action(
+        self,
+        action: str,
+        target: str = "",
+        fleet: FleetController | None = None,
+        priority: int = MANUAL,
+        confirm: bool | None = None,
+        force: bool = False,
+    ) -> bool:
+        fleet = fleet or self._make_fleet()
+        result = fleet.run(action, target, priority, confirm, force).to_command_result()
         level = "OK" if result.ok else "ERROR"
         self.log(f"[{level}] {result.message}")
+        return result.ok
 
     # ------------------------------------------------------------------
     # Commands
@@ -131,43 +165,65 @@ class PowerStackCLI:
         if not events:
             print("No scheduled events.")
             return
-        col = "{:<4} {:<28} {:<9} {:<7} {:<22} {:<22} {}"
-        print(col.format("#", "Label", "Action", "Time", "When", "Next Run", "Status"))
-        print("-" * 108)
+        _print_list_header()
+        now = datetime.now()
         for i, e in enumerate(events, 1):
-            print(col.format(
-                i,
-                e.label[:27],
-                e.action,
-                e.time_hhmm,
-                self._when_text(e)[:21],
-                self._next_run_text(e)[:21],
-                self._status_text(e),
-            ))
-
-    def cmd_next(self) -> None:
-        upcoming: list[tuple[datetime, ScheduleEvent]] = []
-        for e in self.config.schedule:
-            dt = self._next_run_dt(e)
-            if dt is not None:
-                upcoming.append((dt, e))
-        upcoming.sort(key=lambda x: x[0])
+            print(_list_row(i, e, self._next_run_dt(e, now), self.index.status(e, now)))
+
+    def cmd_next(self, count: int = 10, repeat: bool = False) -> None:
+        upcoming = self.index.upcoming(count, repeat=repeat)
         if not upcoming:
             print("No upcoming events.")
             return
-        col = "{:<4} {:<22} {:<28} {}"
-        print(col.format("#", "Next Run", "Label", "Action"))
-        print("-" * 70)
-        for i, (dt, e) in enumerate(upcoming[:10], 1):
-            print(col.format(i, dt.strftime("%a %Y-%m-%d %H:%M"), e.label[:27], e.action))
+        _print_next_header()
+        for i, (dt, e) in enumerate(upcoming, 1):
+            print(_NEXT_ROW.format(i, dt.strftime("%a %Y-%m-%d %H:%M"), e.label[:27], e.action))
+
+    def cmd_agenda(self, days: int | None = None, start: str = "", engine: str = "auto") -> None:
+        """Every minute in which enabled events fire over the coming *days*, with counts."""
+        agenda = self._build_agenda(days, start, engine)
+        if not agenda.minutes:
+            print("No events fire in this period.")
+            return
+        col = "{:<22} {:>5} {:>5}  {}"
+        print(col.format("Minute", "Fires", "Relay", "Events"))
+        print("-" * 90)
+        for at, count, presses, events in agenda.minutes:
+            print(col.format(at.strftime("%a %Y-%m-%d %H:%M"), count, presses, ", ".join(e.label for e in events)[:60]))
+        print(f"\n{len(agenda.minutes)} busy minute(s) between {agenda.start:%Y-%m-%d %H:%M} "
+              f"and {agenda.end:%Y-%m-%d %H:%M} ({agenda.engine}).")
+        if agenda.conflicts:
+            print(f"{len(agenda.conflicts)} conflict(s); run 'check' for details.")
+
+    def cmd_check(self, days: int | None = None, start: str = "", engine: str = "auto") -> None:
+        """Report clashes, relay holdoff violations and load peaks; exit 1 if there are any."""
+        agenda = self._build_agenda(days, start, engine)
+        for conflict in agenda.conflicts:
+            print(conflict.text())
+        events = {e.id for _at, _count, _presses, evs in agenda.minutes for e in evs}
+        print(f"Checked {agenda.fires} fire(s) of {len(events)} event(s) between {agenda.start:%Y-%m-%d %H:%M} "
+              f"and {agenda.end:%Y-%m-%d %H:%M} ({agenda.engine}): {len(agenda.conflicts)} conflict(s).")
+        if agenda.minutes:
+            at, count, presses, _events = max(agenda.minutes, key=lambda m: (m[1], m[2]))
+            print(f"Busiest minute: {at:%a %Y-%m-%d %H:%M} ({count} event(s), {presses} relay press(es)).")
+        if agenda.conflicts:
+            sys.exit(1)
+
+    def _build_agenda(self, days: int | None, start: str, engine: str) -> Agenda:
+        try:
+            begin = datetime.strptime(start, "%Y-%m-%d") if start else None
+            return build_agenda(self.config, begin, days, engine)
+        except ValueError as exc:
+            print(exc, file=sys.stderr)
+            sys.exit(1)
 
-    def cmd_trigger(self, id_or_index: str) -> None:
+    def cmd_trigger(self, id_or_index: str, force: bool = False) -> None:
         event = self._find_event(id_or_index)
         if event is None:
             print(f"Event not found: {id_or_index}", file=sys.stderr)
             sys.exit(1)
         self.log(f"Manually triggering '{event.label}' ({event.action}).")
-        self.run_action(event.action)
+        self.run_action(event.action, event.target, force=force)
 
     def cmd_internal_run(self, event_id: str) -> None:
         """Called by cron. Runs the event and auto-disables once-only events."""
@@ -176,13 +232,136 @@ class PowerStackCLI:
         if event is None:
             _log_to_file(f"[ERROR] cron _run: event not found: {event_id}")
             sys.exit(1)
+        lag = _fire_lag(event, datetime.now())
+        if lag is not None:
+            SCHEDULE_LAG_SECONDS.observe(lag, mode="cron")
         _log_to_file(f"Cron triggered '{event.label}' ({event.action}).")
-        self.run_action(event.action)
+        self.run_action(event.action, event.target, priority=SCHEDULED)
         if event.recurrence == "once" and event.enabled:
             event.enabled = False
             self._save()
             _log_to_file(f"Auto-disabled one-time event '{event.label}'.")
 
+    def cmd_internal_run_slot(self, expr: str, prewarm: bool = False) -> None:
+        """Called by cron in slot/compact dispatch mode: runs every event the
+        fired line covers in that minute from one process, then persists once."""
+        minute = last_fire_minute(expr, datetime.now())
+        if minute is None:
+            _log_to_file(f"[ERROR] cron _run_slot: no recent fire for '{expr}'")
+            sys.exit(1)
+        lead = self.config.ssh.prewarm_seconds if prewarm else 0
+        kind = line_recurrence(expr)
+        due = [(at, e) for at, e in events_in_minute(self.config.schedule, minute, lead) if e.recurrence == kind]
+        if prewarm:
+            due = [(at, e) for at, e in due if e.action == "suspend"]
+        if not due:
+            return
+        fleet = self._make_fleet()
+
+        def _fire(at: datetime, event: ScheduleEvent) -> str | None:
+            delay = (at - datetime.now()).total_seconds()
+            if delay > 0:
+                time.sleep(delay)
+            if prewarm:
+                try:
+                    warmed = fleet.prewarm(event.target)
+                    _log_to_file(f"Pre-warmed {warmed} SSH connection(s) for '{event.label}'.")
+                except ValueError as exc:
+                    _log_to_file(f"[WARN] Pre-warm for '{event.label}' skipped: {exc}")
+                return None
+            SCHEDULE_LAG_SECONDS.observe(max(0.0, (datetime.now() - at).total_seconds()), mode="slot")
+            _log_to_file(f"Cron triggered '{event.label}' ({event.action}).")
+            self.run_action(event.action, event.target, fleet, SCHEDULED)
+            return event.id if event.recurrence == "once" else None
+
+        workers = max(1, min(self.config.scheduler.slot_max_parallel, len(due)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            finished = {eid for eid in pool.map(lambda item: _fire(*item), due) if eid}
+        if not finished:
+            return
+        # Re-read so edits made while the actions ran are not overwritten.
+        self._reload()
+        disabled = [e for e in self.config.schedule if e.id in finished and e.enabled]
+        for event in disabled:
+            event.enabled = False
+        if disabled:
+            self._save()
+            _log_to_file(f"Auto-disabled {len(disabled)} one-time event(s): "
+                         + ", ".join(f"'{e.label}'" for e in disabled))
+
+    def cmd_internal_prewarm(self, event_id: str) -> None:
+        """Called by cron shortly before a suspend event to open its SSH connections."""
+        event = self._find_event(event_id)
+        if event is None or not event.enabled:
+            return
+        try:
+            warmed = self._make_fleet().prewarm(event.target)
+        except ValueError as exc:
+            _log_to_file(f"[WARN] Pre-warm for '{event.label}' skipped: {exc}")
+            return
+        _log_to_file(f"Pre-warmed {warmed} SSH connection(s) for '{event.label}'.")
+
+    def cmd_ssh_pool(self, op: str, target: str) -> None:
+        fleet = self._make_fleet()
+        pool = fleet.ssh_pool
+        if op == "warm":
+            try:
+                warmed = fleet.prewarm(target)
+            except ValueError as exc:
+                print(f"Invalid target: {exc}", file=sys.stderr)
+                sys.exit(1)
+            print(f"Warm connections: {warmed}")
+            return
+        if op == "close":
+            try:
+                hosts = self.config.resolve_targets(target)
+            except ValueError as exc:
+                print(f"Invalid target: {exc}", file=sys.stderr)
+                sys.exit(1)
+            for h in hosts:
+                pool.close(h)
+            print(f"Closed connections for {len(hosts)} host(s).")
+            return
+        if op == "evict":
+            evicted = pool.evict()
+            print(f"Evicted: {len(evicted)}")
+            return
+        rows = pool.status()
+        if not rows:
+            print("No pooled SSH connections.")
+            return
+        now = time.time()
+        col = "{:<36} {:>10} {:>10} {}"
+        print(col.format("Connection", "Age (s)", "Idle (s)", "State"))
+        print("-" * 68)
+        for key, opened, used, alive in rows:
+            print(col.format(key[:35], int(now - opened), int(now - used), "alive" if alive else "closed"))
+
+    def cmd_storage(self, op: str) -> None:
+        storage = self.config.storage
+        if op == "status":
+            print(f"Backend: {storage.backend}")
+            if storage.backend == "sqlite":
+                print(f"Database: {self.config.sqlite_path(CONFIG_PATH)}")
+            print(f"Events: {len(self.config.schedule)}")
+            return
+        if op == storage.backend:
+            print(f"Schedule is already stored in {op}.")
+            return
+        schedule = self.config.schedule
+        if op == "sqlite":
+            backup = CONFIG_PATH.with_name(CONFIG_PATH.name + ".pre-sqlite")
+            shutil.copy2(CONFIG_PATH, backup)
+            storage.backend = "sqlite"
+            self.config.schedule_store(CONFIG_PATH).replace_all(schedule)
+            self.config.save()
+            self.log(f"Migrated {len(schedule)} event(s) to {self.config.sqlite_path(CONFIG_PATH)} "
+                     f"(previous config kept as {backup.name}).")
+        else:
+            storage.backend = "json"
+            self.config.save()
+            self.log(f"Moved {len(schedule)} event(s) back into {CONFIG_PATH.name}.")
+
     def cmd_enable(self, id_or_index: str) -> None:
         event = self._find_event(id_or_index)
         if event is None:
@@ -208,9 +387,52 @@ class PowerStackCLI:
             sys.exit(1)
         label = event.label
         self.config.schedule = [e for e in self.config.schedule if e.id != event.id]
+        self.index.remove(event.id)
+        if self._conflicts is not None:
+            self._conflicts.remove(event.id)
         self._save()
         print(f"Removed: {label}")
 
+    def cmd_serve(self) -> None:
+        """Serve the control API until SIGTERM/SIGINT (cron mode; the daemon serves it itself)."""
+        service = ControlService(self)
+        try:
+            server = ApiServer(socket_path(), service.handle)
+        except OSError as exc:
+            print(f"Cannot serve the control API: {exc}", file=sys.stderr)
+            sys.exit(1)
+        stopping = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda _signum, _frame: stopping.set())
+        server.start()
+        self.log(f"Control API listening on {server.path}.")
+        try:
+            while not stopping.wait(1.0):
+                pass
+        finally:
+            server.stop()
+            service.fleet.executor.wait_idle()
+            METRICS.flush()
+            self.log("Control API stopped.")
+
+    def cmd_status(self, job: str = "") -> None:
+        print("No PowerStack daemon or server is running (start 'daemon' or 'serve').", file=sys.stderr)
+        sys.exit(1)
+
+    def cmd_hosts(self) -> None:
+        hosts = self.config.fleet_hosts()
+        col = "{:<16} {:<32} {:<9} {:<22} {}"
+        print(col.format("Name", "Target", "Relay", "Wake", "Groups"))
+        print("-" * 92)
+        for h in hosts:
+            groups = ",".join(g for g, members in self.config.groups.items() if h.name in members)
+            pin = h.relay_pin if h.relay_pin is not None else self.config.relay.gpio_pin
+            target = f"{h.user}@{h.host}:{h.port}" if h.host else "-"
+            wake = h.wake_mode or self.config.relay.wake_mode
+            if wake == "wol":
+                wake = f"wol {h.mac}" if h.mac else "wol (no MAC)"
+            print(col.format(h.name[:15], target[:31], f"GPIO {pin}", wake[:21], groups or "-"))
+
     def cmd_add(
         self,
         label: str | None,
@@ -220,16 +442,9 @@ class PowerStackCLI:
         weekdays: list[int],
         date_ymd: str,
         enabled: bool,
+        target: str = "",
+        allow_conflicts: bool = False,
     ) -> None:
-        if not _valid_hhmm(time_hhmm):
-            print(f"Invalid time '{time_hhmm}' — expected HH:MM (24-hour).", file=sys.stderr)
-            sys.exit(1)
-        if recurrence == "once" and not _valid_ymd(date_ymd):
-            print(f"Invalid date '{date_ymd}' — expected YYYY-MM-DD.", file=sys.stderr)
-            sys.exit(1)
-        if recurrence == "weekly" and not weekdays:
-            print("Weekly recurrence requires at least one weekday (--days).", file=sys.stderr)
-            sys.exit(1)
         event = ScheduleEvent(
             id=str(uuid.uuid4()),
             label=label or f"{action} {time_hhmm}",
@@ -239,56 +454,698 @@ class PowerStackCLI:
             date_ymd=date_ymd,
             weekdays=weekdays,
             enabled=enabled,
+            target=target,
         )
+        error = self._event_error(event)
+        if error:
+            print(error, file=sys.stderr)
+            sys.exit(1)
+        if enabled and self.config.agenda.reject_conflicts and not allow_conflicts:
+            conflicts = self._conflict_index().conflicts(event)
+            for conflict in conflicts:
+                print(conflict.text(), file=sys.stderr)
+            if any(c.kind == CLASH for c in conflicts):
+                print("Not added; use --allow-conflicts to add it anyway.", file=sys.stderr)
+                sys.exit(1)
         self.config.schedule.append(event)
+        self.index.update(event)
+        if self._conflicts is not None:
+            self._conflicts.add(event)
         self._save()
         print(f"Added: {event.label}  (ID: {event.id})")
 
+    def cmd_apply(self, source: str) -> None:
+        """Apply a batch of add/update/remove/enable/disable operations atomically.
+
+        *source* is a file path or ``-`` for stdin, holding a JSON array of
+        operation objects or one JSON object per line. Every operation is
+        validated against the schedule as left by the ones before it; if any
+        fails nothing is saved.
+        """
+        try:
+            text = sys.stdin.read() if source == "-" else Path(source).read_text()
+            ops = _parse_operations(text)
+        except (OSError, ValueError) as exc:
+            print(f"Cannot read operations: {exc}", file=sys.stderr)
+            sys.exit(1)
+
+        done, errors = self.apply_operations(ops)
+        if errors:
+            for error in errors:
+                print(error, file=sys.stderr)
+            print(f"Nothing applied ({len(errors)} of {len(ops)} operation(s) failed).", file=sys.stderr)
+            sys.exit(1)
+        for line in done:
+            print(line)
+        if not ops:
+            print("No operations.")
+            return
+        self.log(f"Applied {len(ops)} schedule operation(s).")
+
+    def apply_operations(self, ops: list[Any], check_conflicts: bool = False) -> tuple[list[str], list[str]]:
+        """Stage *ops* on a copy of the schedule; (messages, errors).
+
+        The staged schedule replaces the current one, with one save and one
+        crontab sync, only when every operation succeeded. *check_conflicts*
+        also refuses enabled ``add`` operations that conflict with the
+        schedule, as ``add`` does.
+        """
+        staged = [replace(e) for e in self.config.schedule]
+        index = ScheduleIndex(staged)
+        errors: list[str] = []
+        done: list[str] = []
+        for n, op in enumerate(ops, 1):
+            try:
+                done.append(self._apply_operation(op, staged, index, check_conflicts))
+            except ValueError as exc:
+                errors.append(f"operation {n}: {exc}")
+        if errors or not ops:
+            return done, errors
+        self.config.schedule = staged
+        self.index = ScheduleIndex(staged)
+        self._conflicts = None
+        self._save()
+        return done, errors
+
+    def cmd_export(self, fmt: str, output: str) -> None:
+        """Write every event as one JSONL object or CSV row, streaming to *output* ('-' = stdout)."""
+        stream = sys.stdout if output == "-" else open(output, "w", newline="")
+        try:
+            if fmt == "csv":
+                writer = csv.DictWriter(stream, fieldnames=_RECORD_FIELDS)
+                writer.writeheader()
+            for event in self.config.schedule:
+                record = _event_record(event)
+                if fmt == "csv":
+                    record["weekdays"] = ",".join(str(d) for d in event.weekdays)
+                    record["enabled"] = "true" if event.enabled else "false"
+                    writer.writerow(record)
+                else:
+                    stream.write(json.dumps(record) + "\n")
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        if output != "-":
+            print(f"Exported {len(self.config.schedule)} event(s) to {output}.")
+
+    def cmd_import(self, source: str, fmt: str = "auto", match: str = "auto") -> None:
+        """Upsert events from a JSONL or CSV stream.
+
+        Rows are matched to existing events by ``id`` and then by label
+        (per *match*); unmatched rows are added. A bad row is reported and
+        skipped. Changes are persisted and synced once at the end.
+        """
+        if fmt == "auto":
+            fmt = "csv" if source.lower().endswith(".csv") else "jsonl"
+        try:
+            stream = sys.stdin if source == "-" else open(source, newline="")
+        except OSError as exc:
+            print(f"Cannot read {source}: {exc}", file=sys.stderr)
+            sys.exit(1)
+        schedule = self.config.schedule
+        positions = {e.id: i for i, e in enumerate(schedule)}
+        added = updated = unchanged = failed = 0
+        try:
+            for line, record in _read_records(stream, fmt):
+                try:
+                    outcome = self._import_record(record, match, schedule, positions)
+                except ValueError as exc:
+                    failed += 1
+                    print(f"line {line}: {exc}", file=sys.stderr)
+                    continue
+                if outcome == "added":
+                    added += 1
+                elif outcome == "updated":
+                    updated += 1
+                else:
+                    unchanged += 1
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        if added or updated:
+            self.index = ScheduleIndex(schedule)
+            self._conflicts = None
+            self._save()
+        summary = f"Imported: {added} added, {updated} updated, {unchanged} unchanged, {failed} failed."
+        self.log(summary)
+        if failed:
+            sys.exit(1)
+
+    def _import_record(
+        self,
+        record: Any,
+        match: str,
+        schedule: list[ScheduleEvent],
+        positions: dict[str, int],
+    ) -> str:
+        if isinstance(record, Exception):
+            raise ValueError(str(record))
+        if not isinstance(record, dict):
+            raise ValueError("expected a JSON object")
+        field_errors: list[str] = []
+        fields = _event_fields(record, field_errors)
+        if field_errors:
+            raise ValueError("; ".join(field_errors))
+        record_id = str(record.get("id") or "").strip()
+        existing = None
+        if record_id and match in ("auto", "id"):
+            compiled = self.index.get(record_id)
+            existing = compiled.event if compiled is not None else None
+        if existing is None and match in ("auto", "label") and fields.get("label"):
+            existing = self.index.find_label(fields["label"])
+        if existing is not None:
+            candidate = replace(existing, **fields)
+            error = self._event_error(candidate)
+            if error:
+                raise ValueError(error)
+            if candidate == existing:
+                return "unchanged"
+            schedule[positions[existing.id]] = candidate
+            self.index.update(candidate)
+            return "updated"
+        if "time_hhmm" not in fields:
+            raise ValueError("'time' is required for a new event")
+        fields.setdefault("action", "suspend")
+        fields.setdefault("label", f"{fields['action']} {fields['time_hhmm']}")
+        if record_id and self.index.get(record_id) is not None:
+            raise ValueError(f"event ID already exists: {record_id}")
+        event = ScheduleEvent(id=record_id or str(uuid.uuid4()), **fields)
+        error = self._event_error(event)
+        if error:
+            raise ValueError(error)
+        positions[event.id] = len(schedule)
+        schedule.append(event)
+        self.index.update(event)
+        return "added"
+
+    def _apply_operation(
+        self,
+        op: Any,
+        staged: list[ScheduleEvent],
+        index: ScheduleIndex,
+        check_conflicts: bool = False,
+    ) -> str:
+        if not isinstance(op, dict):
+            raise ValueError("expected a JSON object")
+        kind = str(op.get("op", "")).lower()
+        if kind == "add":
+            field_errors: list[str] = []
+            fields = _event_fields(op, field_errors)
+            if field_errors:
+                raise ValueError("; ".join(field_errors))
+            if "time_hhmm" not in fields:
+                raise ValueError("'time' is required")
+            fields.setdefault("action", "suspend")
+            fields.setdefault("label", f"{fields['action']} {fields['time_hhmm']}")
+            event_id = str(op.get("id") or uuid.uuid4())
+            if index.get(event_id) is not None:
+                raise ValueError(f"event ID already exists: {event_id}")
+            event = ScheduleEvent(id=event_id, **fields)
+            error = self._event_error(event)
+            if error:
+                raise ValueError(error)
+            reject = self.config.agenda.reject_conflicts and not op.get("allow_conflicts")
+            if check_conflicts and event.enabled and reject:
+                clashes = [c for c in self._conflict_index().conflicts(event) if c.kind == CLASH]
+                if clashes:
+                    raise ValueError("; ".join(c.text() for c in clashes))
+            staged.append(event)
+            index.update(event)
+            return f"Added: {event.label}  (ID: {event.id})"
+        if kind not in ("update", "remove", "enable", "disable"):
+            raise ValueError(f"unknown op {op.get('op')!r} (expected add, update, remove, enable or disable)")
+        ref = str(op.get("event", "")).strip()
+        event = index.find(ref) if ref else None
+        if event is None:
+            raise ValueError(f"event not found: {ref}" if ref else "missing 'event'")
+        if kind == "remove":
+            staged.remove(event)
+            index.remove(event.id)
+            return f"Removed: {event.label}"
+        if kind in ("enable", "disable"):
+            event.enabled = kind == "enable"
+            index.update(event)
+            return f"{'Enabled' if event.enabled else 'Disabled'}: {event.label}"
+        field_errors = []
+        fields = _event_fields(op, field_errors)
+        if field_errors:
+            raise ValueError("; ".join(field_errors))
+        updated = replace(event, **fields)
+        error = self._event_error(updated)
+        if error:
+            raise ValueError(error)
+        staged[staged.index(event)] = updated
+        index.update(updated)
+        return f"Updated: {updated.label}"
+
+    def _event_error(self, event: ScheduleEvent) -> str | None:
+        """Why *event* cannot be scheduled, or None if it is valid."""
+        if event.action not in SCHEDULE_ACTIONS:
+            return f"Invalid action '{event.action}' — expected one of {', '.join(SCHEDULE_ACTIONS)}."
+        if event.recurrence not in ("weekly", "once"):
+            return f"Invalid recurrence '{event.recurrence}' — expected weekly or once."
+        if not _valid_hhmm(event.time_hhmm):
+            return f"Invalid time '{event.time_hhmm}' — expected HH:MM or HH:MM:SS (24-hour)."
+        if event.recurrence == "once" and not _valid_ymd(event.date_ymd):
+            return f"Invalid date '{event.date_ymd}' — expected YYYY-MM-DD."
+        if event.recurrence == "weekly" and not event.weekdays:
+            return "Weekly recurrence requires at least one weekday (--days)."
+        try:
+            self.config.resolve_targets(event.target)
+        except ValueError as exc:
+            return f"Invalid target: {exc}"
+        return None
+
     # ------------------------------------------------------------------
     # Display helpers
     # ------------------------------------------------------------------
 
-    def _status_text(self, e: ScheduleEvent) -> str:
-        if e.enabled:
-            return "Enabled"
-        if e.recurrence == "once" and e.date_ymd:
-            try:
-                dt = datetime.strptime(f"{e.date_ymd} {e.time_hhmm}", "%Y-%m-%d %H:%M")
-                if datetime.now() >= dt:
-                    return "Completed"
-            except ValueError:
-                pass
-        return "Paused"
+    def _next_run_dt(self, e: ScheduleEvent, now: datetime | None = None) -> datetime | None:
+        return self.index.next_run(e, now)
+
+
+# ---------------------------------------------------------------------------
+# Control API
+# ---------------------------------------------------------------------------
+
+class ControlService:
+    """Answers control API requests from one warm PowerStackCLI and FleetController.
+
+    The config is re-read only when its files change, the schedule and
+    conflict indexes are reused between requests, and the relay device and
+    SSH connections stay open. Requests run concurrently: schedule edits are
+    serialized and saved like ``apply``, and actions share the fleet's
+    executor, which runs one action per host at a time while other hosts
+    proceed. Pass the daemon's *fleet* to share it with scheduled fires.
+    """
+
+    OPS = (
+        "ping", "list", "next", "trigger", "action", "run", "status",
+        "add", "update", "remove", "enable", "disable", "apply",
+    )
+
+    def __init__(
+        self,
+        cli: PowerStackCLI,
+        fleet: FleetController | None = None,
+        on_change: Callable[[], None] | None = None,
+    ) -> None:
+        self.cli = cli
+        self.own_fleet = fleet is None
+        self.fleet = fleet or cli._make_fleet()
+        self.on_change = on_change or (lambda: None)
+        self._lock = threading.Lock()
+        self._jobs: OrderedDict[str, tuple[dict[str, Any], Future]] = OrderedDict()
+        self._started = time.time()
 
-    def _when_text(self, e: ScheduleEvent) -> str:
-        if e.recurrence == "once":
-            return f"Once {e.date_ymd}"
-        return ",".join(WEEKDAY_LABELS[d] for d in e.weekdays)
+    def handle(self, request: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        op = str(request.get("op", ""))
+        if op not in self.OPS:
+            yield api_done(False, f"Unknown op {op!r} (expected {', '.join(self.OPS)}).")
+            return
+        try:
+            yield from getattr(self, f"_op_{op}")(request)
+        except Exception as exc:
+            yield api_done(False, f"{op} failed: {exc}")
+
+    # ------------------------------------------------------------------
+    # state
+    # ------------------------------------------------------------------
+
+    def _refresh(self) -> None:
+        """Pick up config changes on disk (call with the lock held)."""
+        config = self.cli.config
+        self.cli._reload()
+        if self.own_fleet and self.cli.config is not config:
+            self.fleet.reconfigure(self.cli.config)
+
+    def _snapshot(self) -> tuple[AppConfig, ScheduleIndex]:
+        with self._lock:
+            self._refresh()
+            return self.cli.config, self.cli.index
+
+    def _find(self, ref: Any) -> ScheduleEvent | None:
+        with self._lock:
+            self._refresh()
+            return self.cli._find_event(str(ref or ""))
 
-    def _next_run_text(self, e: ScheduleEvent) -> str:
-        dt = self._next_run_dt(e)
-        return dt.strftime("%a %Y-%m-%d %H:%M") if dt else "-"
+    # ------------------------------------------------------------------
+    # reads
+    # ------------------------------------------------------------------
+
+    def _op_ping(self, request: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        config, _index = self._snapshot()
+        yield api_done(True, "pong", pid=os.getpid(), uptime=round(time.time() - self._started, 1),
+                       events=len(config.schedule))
 
-    def _next_run_dt(self, e: ScheduleEvent) -> datetime | None:
-        if not e.enabled:
-            return None
+    def _op_list(self, request: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        config, index = self._snapshot()
         now = datetime.now()
-        if e.recurrence == "once":
-            try:
-                target = datetime.strptime(f"{e.date_ymd} {e.time_hhmm}", "%Y-%m-%d %H:%M")
-                return None if target < now else target
-            except ValueError:
-                return None
-        if not e.weekdays or ":" not in e.time_hhmm:
-            return None
-        hh, mm = (int(x) for x in e.time_hhmm.split(":"))
-        for offset in range(8):
-            candidate = (now + timedelta(days=offset)).replace(
-                hour=hh, minute=mm, second=0, microsecond=0
-            )
-            if candidate.weekday() in e.weekdays and candidate >= now:
-                return candidate
-        return None
+        for i, event in enumerate(config.schedule, 1):
+            next_at = index.next_run(event, now)
+            yield {"item": {
+                "index": i,
+                **_event_record(event),
+                "status": index.status(event, now),
+                "next_run": next_at.isoformat() if next_at else None,
+            }}
+        yield api_done(True, f"{len(config.schedule)} event(s).")
+
+    def _op_next(self, request: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        _config, index = self._snapshot()
+        upcoming = index.upcoming(int(request.get("count", 10)), repeat=bool(request.get("repeat")))
+        for at, event in upcoming:
+            yield {"item": {"at": at.isoformat(), **_event_record(event)}}
+        yield api_done(True, f"{len(upcoming)} upcoming fire(s).")
+
+    def _op_status(self, request: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        """One job's state with ``job``, else the action queue and the most recent jobs."""
+        with self._lock:
+            jobs = list(self._jobs.items())
+        if request.get("job"):
+            for job_id, (info, future) in jobs:
+                if job_id == request["job"]:
+                    record = _job_record(info, future)
+                    yield api_done(True, record.get("message", "Pending."), job=record)
+                    return
+            yield api_done(False, f"Job not found: {request['job']}")
+            return
+        for _job_id, (info, future) in reversed(jobs[-int(request.get("count", 20)):]):
+            yield {"item": _job_record(info, future)}
+        queued, running = self.fleet.executor.stats()
+        yield api_done(
+            True,
+            f"Queued: {queued}   Running: {len(running)}",
+            queued=queued,
+            running=[{"action": action, "host": host} for action, host in running],
+            pid=os.getpid(),
+        )
+
+    # ------------------------------------------------------------------
+    # actions
+    # ------------------------------------------------------------------
+
+    def _op_action(self, request: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        action = str(request.get("action", ""))
+        if action not in ACTIONS:
+            yield api_done(False, f"Unknown action {action!r} (expected {', '.join(ACTIONS)}).")
+            return
+        job_id, future = self._submit(
+            action, str(request.get("target", "")), MANUAL, request.get("confirm"), bool(request.get("force")),
+        )
+        yield from self._reply(job_id, future, bool(request.get("wait")))
+
+    def _op_trigger(self, request: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        event = self._find(request.get("event"))
+        if event is None:
+            yield api_done(False, f"Event not found: {request.get('event')}")
+            return
+        self.cli.log(f"Manually triggering '{event.label}' ({event.action}).")
+        job_id, future = self._submit(event.action, event.target, MANUAL, None, bool(request.get("force")))
+        yield from self._reply(job_id, future, bool(request.get("wait")))
+
+    def _op_run(self, request: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        """A cron ``_run`` forwarded by its client: run at scheduled priority, then auto-disable once events."""
+        event = self._find(request.get("event"))
+        if event is None:
+            _log_to_file(f"[ERROR] cron _run: event not found: {request.get('event')}")
+            yield api_done(False, f"Event not found: {request.get('event')}")
+            return
+        lag = _fire_lag(event, datetime.now())
+        if lag is not None:
+            SCHEDULE_LAG_SECONDS.observe(lag, mode="cron")
+        _log_to_file(f"Cron triggered '{event.label}' ({event.action}).")
+        job_id, future = self._submit(event.action, event.target, SCHEDULED, None, False)
+        result = future.result()
+        if event.recurrence == "once":
+            with self._lock:
+                self._refresh()
+                current = self.cli.index.get(event.id)
+                if current is not None and current.event.enabled:
+                    self.cli.apply_operations([{"op": "disable", "event": event.id}])
+                    _log_to_file(f"Auto-disabled one-time event '{event.label}'.")
+            self.on_change()
+        yield api_done(True, result.summary(), job=job_id, result=_fleet_record(result))
+
+    def _submit(
+        self,
+        action: str,
+        target: str,
+        priority: int,
+        confirm: bool | None,
+        force: bool,
+    ) -> tuple[str, Future]:
+        future = self.fleet.submit(action, target, priority, confirm, force)
+        job_id = uuid.uuid4().hex[:12]
+        info = {
+            "job": job_id,
+            "action": action,
+            "target": target or "all",
+            "submitted": datetime.now().isoformat(timespec="seconds"),
+        }
+        with self._lock:
+            self._jobs[job_id] = (info, future)
+            while len(self._jobs) > max(1, self.cli.config.api.recent_jobs):
+                self._jobs.popitem(last=False)
+        future.add_done_callback(self._log_result)
+        return job_id, future
+
+    def _log_result(self, future: Future) -> None:
+        result = future.result().to_command_result()
+        self.cli.log(f"[{'OK' if result.ok else 'ERROR'}] {result.message}")
+
+    def _reply(self, job_id: str, future: Future, wait: bool) -> Iterator[dict[str, Any]]:
+        if not wait:
+            yield api_done(True, f"Queued (job {job_id}).", job=job_id)
+            return
+        yield {"item": {"job": job_id, "state": "pending"}}
+        result = future.result()
+        yield api_done(result.ok, result.summary(), job=job_id, result=_fleet_record(result))
+
+    # ------------------------------------------------------------------
+    # schedule edits
+    # ------------------------------------------------------------------
+
+    def _op_add(self, request: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        yield from self._edit([request], check_conflicts=True)
+
+    _op_update = _op_remove = _op_enable = _op_disable = _op_add
+
+    def _op_apply(self, request: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        ops = request.get("ops")
+        if not isinstance(ops, list):
+            yield api_done(False, "'ops' must be a list of operations.")
+            return
+        yield from self._edit(ops, check_conflicts=False)
+
+    def _edit(self, ops: list[Any], check_conflicts: bool) -> Iterator[dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            applied, errors = self.cli.apply_operations(ops, check_conflicts)
+        if errors:
+            if len(ops) == 1:
+                errors = [error.split(": ", 1)[1] for error in errors]
+            yield api_done(False, "; ".join(errors), errors=errors)
+            return
+        self.on_change()
+        for line in applied:
+            yield {"item": {"message": line}}
+        yield api_done(True, applied[0] if len(applied) == 1 else f"Applied {len(applied)} operation(s).")
+
+
+def _fleet_record(result: FleetResult) -> dict[str, Any]:
+    return {
+        "ok": result.ok,
+        "message": result.summary(),
+        "hosts": [
+            {
+                "host": r.host,
+                "ok": r.result.ok,
+                "message": r.result.message,
+                "elapsed": round(r.elapsed, 3),
+                "skipped": r.skipped,
+                "state_seconds": r.result.state_seconds,
+            }
+            for r in result.results
+        ],
+    }
+
+
+def _job_record(info: dict[str, Any], future: Future) -> dict[str, Any]:
+    if not future.done():
+        return {**info, "state": "pending"}
+    return {**info, "state": "done", **_fleet_record(future.result())}
+
+
+class RemoteCLI:
+    """The schedule and action commands, answered by a running daemon or ``serve`` over the control API."""
+
+    def __init__(self, client: ApiClient) -> None:
+        self.client = client
+
+    def _call(self, op: str, **params: Any) -> dict[str, Any]:
+        final = self.client.call(op, **params)
+        if not final.get("ok"):
+            print(final.get("message", "Request failed."), file=sys.stderr)
+            sys.exit(1)
+        return final
+
+    def cmd_list(self) -> None:
+        count = 0
+        for message in self.client.stream("list"):
+            if message.get("done"):
+                break
+            item = message["item"]
+            if not count:
+                _print_list_header()
+            count += 1
+            next_run = datetime.fromisoformat(item["next_run"]) if item["next_run"] else None
+            print(_list_row(item["index"], _record_event(item), next_run, item["status"]))
+        if not message.get("ok"):
+            print(message.get("message", "Request failed."), file=sys.stderr)
+            sys.exit(1)
+        if not count:
+            print("No scheduled events.")
+
+    def cmd_next(self, count: int = 10, repeat: bool = False) -> None:
+        shown = 0
+        for message in self.client.stream("next", count=count, repeat=repeat):
+            if message.get("done"):
+                break
+            item = message["item"]
+            if not shown:
+                _print_next_header()
+            shown += 1
+            at = datetime.fromisoformat(item["at"])
+            print(_NEXT_ROW.format(shown, at.strftime("%a %Y-%m-%d %H:%M"), item["label"][:27], item["action"]))
+        if not shown:
+            print("No upcoming events.")
+
+    def cmd_trigger(self, id_or_index: str, force: bool = False) -> None:
+        final = self.client.call("trigger", event=id_or_index, force=force, wait=True)
+        if "job" not in final:
+            print(final.get("message", "Request failed."), file=sys.stderr)
+            sys.exit(1)
+        print(f"[{'OK' if final['ok'] else 'ERROR'}] {final['message']}")
+
+    def run_action(
+        self,
+        action: str,
+        target: str = "",
+        confirm: bool | None = None,
+        force: bool = False,
+    ) -> bool:
+        final = self.client.call("action", action=action, target=target, confirm=confirm, force=force, wait=True)
+        print(f"[{'OK' if final.get('ok') else 'ERROR'}] {final.get('message', 'Request failed.')}")
+        return bool(final.get("ok"))
+
+    def cmd_enable(self, id_or_index: str) -> None:
+        print(self._call("enable", event=id_or_index)["message"])
+
+    def cmd_disable(self, id_or_index: str) -> None:
+        print(self._call("disable", event=id_or_index)["message"])
+
+    def cmd_remove(self, id_or_index: str) -> None:
+        print(self._call("remove", event=id_or_index)["message"])
+
+    def cmd_add(
+        self,
+        label: str | None,
+        action: str,
+        time_hhmm: str,
+        recurrence: str,
+        weekdays: list[int],
+        date_ymd: str,
+        enabled: bool,
+        target: str = "",
+        allow_conflicts: bool = False,
+    ) -> None:
+        final = self._call(
+            "add",
+            label=label,
+            action=action,
+            time=time_hhmm,
+            recurrence=recurrence,
+            days=weekdays,
+            date=date_ymd,
+            enabled=enabled,
+            target=target,
+            allow_conflicts=allow_conflicts,
+        )
+        print(final["message"])
+
+    def cmd_status(self, job: str = "") -> None:
+        if job:
+            record = self._call("status", job=job)["job"]
+            _print_job(record)
+            for host in record.get("hosts", []):
+                level = "OK" if host["ok"] else "ERROR"
+                print(f"  [{level}] {host['host']}: {host['message']} ({host['elapsed']:.1f}s)")
+            return
+        jobs = []
+        for message in self.client.stream("status"):
+            if message.get("done"):
+                break
+            jobs.append(message["item"])
+        print(f"Server PID {message.get('pid')}: {message.get('message')}")
+        for running in message.get("running", []):
+            print(f"  running {running['action']} @ {running['host']}")
+        for record in jobs:
+            _print_job(record)
+
+    def cmd_internal_run(self, event_id: str) -> None:
+        self._call("run", event=event_id)
+
+
+def _record_event(record: dict[str, Any]) -> ScheduleEvent:
+    return ScheduleEvent(**{name: record[name] for name in _RECORD_FIELDS})
+
+
+def _print_job(record: dict[str, Any]) -> None:
+    outcome = record["state"] if record["state"] != "done" else ("ok" if record["ok"] else "error")
+    detail = f"  {record['message']}" if record.get("message") else ""
+    print(f"{record['job']}  {record['submitted']}  {record['action']:<9} {record['target'][:16]:<16} {outcome}{detail}")
+
+
+# ---------------------------------------------------------------------------
+# Display helpers
+# ---------------------------------------------------------------------------
+
+_LIST_ROW = "{:<4} {:<28} {:<9} {:<13} {:<7} {:<22} {:<22} {}"
+_NEXT_ROW = "{:<4} {:<22} {:<28} {}"
+
+
+def _when_text(e: ScheduleEvent) -> str:
+    if e.recurrence == "once":
+        return f"Once {e.date_ymd}"
+    return ",".join(WEEKDAY_LABELS[d] for d in e.weekdays)
+
+
+def _next_run_text(dt: datetime | None) -> str:
+    return dt.strftime("%a %Y-%m-%d %H:%M") if dt else "-"
+
+
+def _print_list_header() -> None:
+    print(_LIST_ROW.format("#", "Label", "Action", "Target", "Time", "When", "Next Run", "Status"))
+    print("-" * 122)
+
+
+def _list_row(number: int, e: ScheduleEvent, next_run: datetime | None, status: str) -> str:
+    return _LIST_ROW.format(
+        number,
+        e.label[:27],
+        e.action,
+        (e.target or "all")[:12],
+        e.time_hhmm,
+        _when_text(e)[:21],
+        _next_run_text(next_run)[:21],
+        status,
+    )
+
+
+def _print_next_header() -> None:
+    print(_NEXT_ROW.format("#", "Next Run", "Label", "Action"))
+    print("-" * 70)
 
 
 # ---------------------------------------------------------------------------
@@ -296,14 +1153,28 @@ class PowerStackCLI:
 # ---------------------------------------------------------------------------
 
 def _valid_hhmm(value: str) -> bool:
+    """HH:MM, or HH:MM:SS for sub-minute precision under the daemon."""
     parts = value.split(":")
-    if len(parts) != 2:
+    if len(parts) not in (2, 3):
         return False
     try:
         hh, mm = int(parts[0]), int(parts[1])
+        ss = int(parts[2]) if len(parts) == 3 else 0
     except ValueError:
         return False
-    return 0 <= hh <= 23 and 0 <= mm <= 59
+    return 0 <= hh <= 23 and 0 <= mm <= 59 and 0 <= ss <= 59
+
+
+def _fire_lag(event: ScheduleEvent, now: datetime) -> float | None:
+    """Seconds between the latest scheduled time of *event* and *now*."""
+    try:
+        hh, mm, ss = event.time_parts()
+    except ValueError:
+        return None
+    at = now.replace(hour=hh, minute=mm, second=ss, microsecond=0)
+    if at > now:
+        at -= timedelta(days=1)
+    return (now - at).total_seconds()
 
 
 def _valid_ymd(value: str) -> bool:
@@ -314,8 +1185,12 @@ def _valid_ymd(value: str) -> bool:
         return False
 
 
-def _parse_days(days_str: str) -> list[int]:
-    """Parse 'mon,tue,fri' or '0,1,4' into a sorted list of ints (0=Mon)."""
+def _parse_days(days_str: str, errors: list[str] | None = None) -> list[int]:
+    """Parse 'mon,tue,fri' or '0,1,4' into a sorted list of ints (0=Mon).
+
+    Bad entries are skipped and reported on stderr, or appended to *errors*
+    when a list is given.
+    """
     day_map = {
         "mon": 0, "monday": 0,
         "tue": 1, "tuesday": 1,
@@ -325,6 +1200,13 @@ def _parse_days(days_str: str) -> list[int]:
         "sat": 5, "saturday": 5,
         "sun": 6, "sunday": 6,
     }
+
+    def _bad(message: str) -> None:
+        if errors is None:
+            print(message, file=sys.stderr)
+        else:
+            errors.append(message)
+
     result: list[int] = []
     for part in days_str.split(","):
         p = part.strip().lower()
@@ -336,17 +1218,115 @@ def _parse_days(days_str: str) -> list[int]:
                 if 0 <= d <= 6:
                     result.append(d)
                 else:
-                    print(f"Day index out of range (0-6): {p}", file=sys.stderr)
+                    _bad(f"Day index out of range (0-6): {p}")
             except ValueError:
-                print(f"Unknown day: {p}", file=sys.stderr)
+                _bad(f"Unknown day: {p}")
     return sorted(set(result))
 
 
+def _parse_operations(text: str) -> list[Any]:
+    """A JSON array of operations, or one JSON object per line (blank and # lines skipped)."""
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        ops = json.loads(stripped)
+        if not isinstance(ops, list):
+            raise ValueError("expected a JSON array")
+        return ops
+    ops = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            ops.append(json.loads(line))
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"line {number}: {exc}") from None
+    return ops
+
+
+_RECORD_FIELDS = [f.name for f in dataclass_fields(ScheduleEvent)]
+
+
+def _event_record(event: ScheduleEvent) -> dict[str, Any]:
+    return {name: getattr(event, name) for name in _RECORD_FIELDS}
+
+
+def _read_records(stream: TextIO, fmt: str) -> Iterator[tuple[int, Any]]:
+    """Yield (line number, record) one at a time; unparsable lines yield the exception."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        try:
+            for row in reader:
+                yield reader.line_num, row
+        except csv.Error as exc:
+            yield reader.line_num, exc
+        return
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            yield number, json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield number, exc
+
+
+def _parse_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in {"1", "true", "yes", "y", "on"}:
+        return True
+    if text in {"0", "false", "no", "n", "off"}:
+        return False
+    raise ValueError(f"Invalid boolean: {value!r}")
+
+
+# Record keys accepted for event fields (CLI flag names and ScheduleEvent names).
+_FIELD_ALIASES = {
+    "label": "label",
+    "action": "action",
+    "time": "time_hhmm",
+    "time_hhmm": "time_hhmm",
+    "recurrence": "recurrence",
+    "date": "date_ymd",
+    "date_ymd": "date_ymd",
+    "days": "weekdays",
+    "weekdays": "weekdays",
+    "enabled": "enabled",
+    "target": "target",
+}
+
+
+def _event_fields(record: dict[str, Any], errors: list[str]) -> dict[str, Any]:
+    """ScheduleEvent keyword arguments from a JSON/CSV record; problems go to *errors*."""
+    fields: dict[str, Any] = {}
+    for key, value in record.items():
+        name = _FIELD_ALIASES.get(key)
+        if name is None or value is None or value == "":
+            continue
+        if name == "weekdays":
+            if isinstance(value, list):
+                value = _parse_days(",".join(str(v) for v in value), errors)
+            else:
+                value = _parse_days(str(value), errors)
+        elif name == "enabled":
+            try:
+                value = _parse_bool(value)
+            except ValueError as exc:
+                errors.append(str(exc))
+                continue
+        else:
+            value = str(value).strip()
+        fields[name] = value
+    return fields
+
+
 # ---------------------------------------------------------------------------
 # Entry point
 # ---------------------------------------------------------------------------
 
-def main() -> None:
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         prog="powerstack",
         description="PowerStack Pi Controller — CLI",
@@ -362,27 +1342,42 @@ def main() -> None:
             "  python app.py disable 2\n"
             "  python app.py remove 3\n"
             "  python app.py suspend\n"
+            "  python app.py suspend rack-a,pc-07\n"
             "  python app.py wake\n"
         ),
     )
     sub = parser.add_subparsers(dest="command", metavar="COMMAND")
+    # Commands a running daemon or `serve` can answer over the control API.
+    remote = argparse.ArgumentParser(add_help=False)
+    remote.add_argument(
+        "--local",
+        action="store_true",
+        help="Work on the config here even if a daemon or server is running",
+    )
 
-    sub.add_parser("list", help="List all scheduled events")
-    sub.add_parser("next", help="Show next upcoming events (up to 10)")
+    sub.add_parser("list", help="List all scheduled events", parents=[remote])
+    p = sub.add_parser("next", help="Show next upcoming events (up to 10)", parents=[remote])
+    p.add_argument("--count", "-n", type=int, default=10, help="How many to show (default: 10)")
+    p.add_argument(
+        "--repeat",
+        action="store_true",
+        help="List every occurrence, not just the next one per event",
+    )
 
-    p = sub.add_parser("trigger", help="Manually trigger a scheduled event")
+    p = sub.add_parser("trigger", help="Manually trigger a scheduled event", parents=[remote])
     p.add_argument("event", help="Index, ID, or label")
+    p.add_argument("--force", action="store_true", help="Run even if the host is already in the target state")
 
-    p = sub.add_parser("enable", help="Enable a scheduled event")
+    p = sub.add_parser("enable", help="Enable a scheduled event", parents=[remote])
     p.add_argument("event", help="Index, ID, or label")
 
-    p = sub.add_parser("disable", help="Disable/pause a scheduled event")
+    p = sub.add_parser("disable", help="Disable/pause a scheduled event", parents=[remote])
     p.add_argument("event", help="Index, ID, or label")
 
-    p = sub.add_parser("remove", help="Remove a scheduled event")
+    p = sub.add_parser("remove", help="Remove a scheduled event", parents=[remote])
     p.add_argument("event", help="Index, ID, or label")
 
-    p = sub.add_parser("add", help="Add a new scheduled event")
+    p = sub.add_parser("add", help="Add a new scheduled event", parents=[remote])
     p.add_argument("--label", "-l", default=None, help="Human-readable label")
     p.add_argument(
         "--action", "-a",
@@ -390,7 +1385,12 @@ def main() -> None:
         default="suspend",
         help="Action to perform (default: suspend)",
     )
-    p.add_argument("--time", "-t", required=True, metavar="HH:MM", help="Time in 24-hour HH:MM format")
+    p.add_argument(
+        "--time", "-t",
+        required=True,
+        metavar="HH:MM",
+        help="Time in 24-hour HH:MM format (HH:MM:SS for sub-minute precision)",
+    )
     p.add_argument(
         "--recurrence", "-r",
         choices=["weekly", "once"],
@@ -410,29 +1410,138 @@ def main() -> None:
         help="Date for once events",
     )
     p.add_argument("--disabled", action="store_true", help="Create the event in disabled state")
+    p.add_argument(
+        "--target",
+        default="",
+        metavar="HOSTS",
+        help="Comma-separated host/group names the event acts on. Default: all",
+    )
+    p.add_argument(
+        "--allow-conflicts",
+        action="store_true",
+        help="Add the event even if it clashes with the schedule (see 'check')",
+    )
+
+    p = sub.add_parser("apply", help="Apply a batch of schedule operations in one save")
+    p.add_argument("source", metavar="FILE", help="JSON array or JSON-lines file of operations ('-' = stdin)")
+
+    p = sub.add_parser("export", help="Export the schedule as JSON lines or CSV")
+    p.add_argument("--format", "-f", choices=["jsonl", "csv"], default="jsonl")
+    p.add_argument("--output", "-o", default="-", metavar="FILE", help="Output file (default: stdout)")
 
-    sub.add_parser("suspend", help="Suspend the remote PC immediately")
-    sub.add_parser("wake", help="Wake the remote PC immediately")
-    sub.add_parser("toggle", help="Toggle the remote PC power immediately")
+    p = sub.add_parser("import", help="Upsert events from JSON lines or CSV")
+    p.add_argument("source", metavar="FILE", help="Input file ('-' = stdin)")
+    p.add_argument(
+        "--format", "-f",
+        choices=["auto", "jsonl", "csv"],
+        default="auto",
+        help="Input format (default: by file extension, JSONL for stdin)",
+    )
+    p.add_argument(
+        "--match",
+        choices=["auto", "id", "label", "none"],
+        default="auto",
+        help="How rows find the event they update (default: id, then label)",
+    )
+
+    for name, text in (
+        ("suspend", "Suspend the remote PC(s) immediately"),
+        ("wake", "Wake the remote PC(s) immediately"),
+        ("toggle", "Toggle the remote PC power immediately"),
+        ("force-off", "Hold the power button to force the remote PC(s) off"),
+    ):
+        p = sub.add_parser(name, help=text, parents=[remote])
+        p.add_argument("target", nargs="?", default="", help="Host/group names (default: all)")
+        if name != "toggle":
+            p.add_argument(
+                "--force",
+                action="store_true",
+                help="Run even if the host already looks up (wake) or down (suspend/force-off)",
+            )
+            p.add_argument(
+                "--confirm",
+                action=argparse.BooleanOptionalAction,
+                default=None,
+                help="Wait until the host is seen up/down and report how long it took (default: confirm.enabled)",
+            )
+
+    for name, text in (
+        ("agenda", "Show per-minute fire counts for the coming days"),
+        ("check", "Report schedule conflicts, relay holdoff violations and load peaks"),
+    ):
+        p = sub.add_parser(name, help=text)
+        p.add_argument("--days", type=int, default=None, help="Horizon in days (default: agenda.horizon_days)")
+        p.add_argument("--from", dest="start", default="", metavar="YYYY-MM-DD", help="Start date (default: now)")
+        p.add_argument(
+            "--engine",
+            choices=ENGINES,
+            default="auto",
+            help="Array backend: numpy, pure python, or auto (numpy when installed)",
+        )
+
+    sub.add_parser("hosts", help="List configured hosts and groups")
+
+    p = sub.add_parser("ssh-pool", help="Inspect or manage pooled SSH connections")
+    p.add_argument("op", choices=["status", "warm", "close", "evict"], nargs="?", default="status")
+    p.add_argument("target", nargs="?", default="", help="Host/group names (default: all)")
+
+    p = sub.add_parser("storage", help="Show or switch where the schedule is stored")
+    p.add_argument("op", choices=["status", "sqlite", "json"], nargs="?", default="status")
+
+    sub.add_parser("shell", help="Run many commands from one process; edits are saved on 'commit' or exit")
+    p = sub.add_parser("daemon", help="Run the resident scheduler (scheduler.mode = daemon)")
+    p.add_argument("--boot", action="store_true", help=argparse.SUPPRESS)  # from the @reboot line
+    sub.add_parser("serve", help="Serve the control API without scheduling (for scheduler.mode = cron)")
+    p = sub.add_parser("status", help="Show the action queue and recent actions of the running daemon or server")
+    p.add_argument("job", nargs="?", default="", help="Show one action's per-host results")
 
     # Internal command invoked by cron — suppressed from help
-    p = sub.add_parser("_run", help=argparse.SUPPRESS)
+    p = sub.add_parser("_run", help=argparse.SUPPRESS, parents=[remote])
     p.add_argument("event_id")
+    p = sub.add_parser("_prewarm", help=argparse.SUPPRESS)
+    p.add_argument("event_id")
+    p = sub.add_parser("_run_slot", help=argparse.SUPPRESS)
+    p.add_argument("expr")
+    p.add_argument("--prewarm", action="store_true")
+    return parser
+
 
+def main() -> None:
+    parser = build_parser()
     args = parser.parse_args()
 
     if args.command is None:
         parser.print_help()
         sys.exit(0)
 
-    cli = PowerStackCLI()
+    if args.command == "daemon":
+        from daemon import SchedulerDaemon
+        SchedulerDaemon(log=_print_and_log, boot=args.boot).run()
+        return
+
+    if args.command == "serve":
+        PowerStackCLI().cmd_serve()
+        return
 
+    if args.command == "shell":
+        from shell import run_shell
+        run_shell()
+        return
+
+    client = None
+    if args.command == "status" or (hasattr(args, "local") and not args.local):
+        client = connect_api()
+    dispatch(RemoteCLI(client) if client is not None else PowerStackCLI(), args)
+
+
+def dispatch(cli: PowerStackCLI | RemoteCLI, args: argparse.Namespace) -> None:
+    """Run the parsed command *args* on *cli*; failures exit through ``sys.exit``."""
     if args.command == "list":
         cli.cmd_list()
     elif args.command == "next":
-        cli.cmd_next()
+        cli.cmd_next(args.count, args.repeat)
     elif args.command == "trigger":
-        cli.cmd_trigger(args.event)
+        cli.cmd_trigger(args.event, args.force)
     elif args.command == "enable":
         cli.cmd_enable(args.event)
     elif args.command == "disable":
@@ -449,15 +1558,41 @@ def main() -> None:
             weekdays=weekdays,
             date_ymd=args.date or "",
             enabled=not args.disabled,
+            target=args.target,
+            allow_conflicts=args.allow_conflicts,
         )
-    elif args.command == "suspend":
-        cli.run_action("suspend")
-    elif args.command == "wake":
-        cli.run_action("wake")
-    elif args.command == "toggle":
-        cli.run_action("toggle")
+    elif args.command == "agenda":
+        cli.cmd_agenda(args.days, args.start, args.engine)
+    elif args.command == "check":
+        cli.cmd_check(args.days, args.start, args.engine)
+    elif args.command == "export":
+        cli.cmd_export(args.format, args.output)
+    elif args.command == "import":
+        cli.cmd_import(args.source, args.format, args.match)
+    elif args.command == "apply":
+        cli.cmd_apply(args.source)
+    elif args.command in ("suspend", "wake", "toggle", "force-off"):
+        if not cli.run_action(
+            args.command,
+            args.target,
+            confirm=getattr(args, "confirm", None),
+            force=getattr(args, "force", False),
+        ):
+            sys.exit(1)
+    elif args.command == "status":
+        cli.cmd_status(args.job)
+    elif args.command == "hosts":
+        cli.cmd_hosts()
+    elif args.command == "ssh-pool":
+        cli.cmd_ssh_pool(args.op, args.target)
+    elif args.command == "storage":
+        cli.cmd_storage(args.op)
     elif args.command == "_run":
         cli.cmd_internal_run(args.event_id)
+    elif args.command == "_prewarm":
+        cli.cmd_internal_prewarm(args.event_id)
+    elif args.command == "_run_slot":
+        cli.cmd_internal_run_slot(args.expr, args.prewarm)
 
 
 if __name__ == "__main__":
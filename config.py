@@ -1,12 +1,15 @@
 from __future__ import annotations
 
 import json
+import os
 from dataclasses import asdict, dataclass, field
+from datetime import datetime
 from pathlib import Path
 from typing import Any
 
 
 CONFIG_PATH = Path.home() / ".powerstack" / "config.json"
+WAKE_MODES = ("pulse", "toggle", "wol")
 
 
 @dataclass
@@ -16,16 +19,121 @@ class RemoteConfig:
     port: int = 22
     ssh_key_path: str = ""
     suspend_command: str = "systemctl suspend"
+    mac: str = ""  # for Wake-on-LAN
+    wake_mode: str = ""  # "pulse", "toggle" or "wol"; "" = relay.wake_mode
+    wol_broadcast: str = ""  # "" = relay.wol_broadcast
+    wol_interface: str = ""  # "" = relay.wol_interface
+
+
+@dataclass
+class HostConfig(RemoteConfig):
+    name: str = ""
+    relay_pin: int | None = None  # BCM pin of this host's relay channel; None = relay.gpio_pin
+
+
+@dataclass
+class FleetConfig:
+    max_parallel: int = 8
+    host_timeout_seconds: float = 30.0
+
+
+@dataclass
+class SshPoolConfig:
+    enabled: bool = True
+    persist_seconds: int = 300  # idle lifetime of a ControlMaster socket
+    max_lifetime_seconds: int = 3600  # re-handshake after this long; 0 = unlimited
+    max_connections: int = 16  # least-recently-used masters are closed beyond this
+    prewarm_seconds: int = 0  # open the connection this long before scheduled suspends; 0 = off
+
+
+@dataclass
+class LogConfig:
+    max_bytes: int = 1_048_576  # rotate ~/.powerstack/powerstack.log past this size; 0 = never
+    rotate_daily: bool = False  # also rotate when the day changes
+    backups: int = 5  # rotated segments kept
+    compress: bool = True  # gzip rotated segments
+    buffer_lines: int = 64  # flush once this many lines are pending
+    flush_seconds: float = 2.0  # ...or this long after the first pending line
+
+
+@dataclass
+class GuiConfig:
+    log_history_lines: int = 5000  # session log kept in memory (ring buffer)
+    log_view_max_lines: int = 2000  # lines kept in the Logs window before trimming
+    watch_config: bool = True  # pick up CLI/cron edits of the config without pressing Refresh
+    watch_poll_seconds: float = 2.0  # stat polling interval when inotify is unavailable
+
+
+@dataclass
+class ConfirmConfig:
+    enabled: bool = False  # probe hosts after wake/suspend/force-off until they change state
+    port: int = 0  # TCP port probed; 0 = the host's SSH port
+    wake_timeout_seconds: float = 120.0  # give up waiting for a woken host after this long
+    down_timeout_seconds: float = 60.0  # ...or for a suspended / forced-off host to go away
+    initial_delay_seconds: float = 0.5  # pause between probes, doubled after each miss
+    max_delay_seconds: float = 5.0
+    connect_timeout_seconds: float = 1.0  # an attempt with no answer by then counts as down
+
+
+@dataclass
+class PlannerConfig:
+    enabled: bool = True  # skip wake/suspend/force-off when the host is already in that state
+    state_ttl_seconds: float = 60.0  # how long a probed or action-implied power state is trusted
+    probe_timeout_seconds: float = 0.5  # reachability probe used when no state is cached; only an answer counts
+
+
+@dataclass
+class MetricsConfig:
+    enabled: bool = True
+    textfile_path: str = ""  # "" = ~/.powerstack/metrics/powerstack.prom (node_exporter textfile collector)
+    flush_seconds: float = 5.0  # long-running processes rewrite the file at most this often
+    http_port: int = 0  # daemon/GUI serve /metrics on this port; 0 = off
+    http_bind: str = "127.0.0.1"
+
+
+@dataclass
+class AgendaConfig:
+    horizon_days: int = 7  # how far ahead `agenda` and `check` expand the schedule
+    max_fires_per_minute: int = 0  # events firing in one minute before it is a load peak; 0 = no limit
+    max_relay_presses_per_minute: int = 4  # relay presses in one minute before it is a load peak; 0 = no limit
+    reject_conflicts: bool = True  # `add` and the GUI refuse an event that clashes with the schedule
+
+
+@dataclass
+class ApiConfig:
+    enabled: bool = True  # the daemon serves the control API on ~/.powerstack/powerstack.sock
+    recent_jobs: int = 200  # finished actions kept for `status`
+
+
+@dataclass
+class StorageConfig:
+    backend: str = "json"  # "json" (schedule inside config.json) or "sqlite"
+    sqlite_path: str = ""  # "" = schedule.db next to config.json
+
+
+@dataclass
+class SchedulerConfig:
+    mode: str = "cron"  # "cron" (one process per fire) or "daemon" (resident scheduler)
+    poll_seconds: float = 2.0  # how often the daemon checks config.json for changes
+    missed_grace_seconds: float = 60.0  # late fires older than this are skipped
+    dispatch: str = "event"  # cron mode: "event" (line per event), "slot" (line per minute slot) or "compact"
+    slot_max_parallel: int = 4  # events run at once by a single _run_slot process
 
 
 @dataclass
 class RelayConfig:
     gpio_pin: int = 4
     active_high: bool = True
-    wake_mode: str = "pulse"  # "pulse" or "toggle"
+    wake_mode: str = "pulse"  # "pulse", "toggle" or "wol" (Wake-on-LAN); hosts may override
     wake_pulse_seconds: float = 0.5
     toggle_pulse_seconds: float = 1.5
+    force_off_seconds: float = 5.0  # long press used by the force-off action
     holdoff_seconds: float = 0.2
+    wol_broadcast: str = "255.255.255.255"
+    wol_port: int = 9
+    wol_interface: str = ""  # bind magic packets to this NIC; "" = by route
+    wol_repeat: int = 3  # copies sent per wake, in case one is dropped
+    wol_fallback: bool = True  # pulse the relay when a host has no MAC or the packet fails
 
 
 @dataclass
@@ -38,6 +146,24 @@ class ScheduleEvent:
     date_ymd: str = ""  # YYYY-MM-DD when recurrence == "once"
     weekdays: list[int] = field(default_factory=lambda: list(range(7)))  # 0=Mon
     enabled: bool = True
+    target: str = ""  # host/group selector; "" = every host
+
+    def time_parts(self) -> tuple[int, int, int]:
+        """(hour, minute, second) of ``time_hhmm``, which may be HH:MM or HH:MM:SS."""
+        parts = [int(p) for p in self.time_hhmm.split(":")]
+        if len(parts) == 2:
+            parts.append(0)
+        if len(parts) != 3:
+            raise ValueError(f"Invalid time: {self.time_hhmm}")
+        hh, mm, ss = parts
+        if not (0 <= hh <= 23 and 0 <= mm <= 59 and 0 <= ss <= 59):
+            raise ValueError(f"Invalid time: {self.time_hhmm}")
+        return hh, mm, ss
+
+    def once_datetime(self) -> datetime:
+        """Fire time of a one-time event; raises ValueError on a bad date/time."""
+        hh, mm, ss = self.time_parts()
+        return datetime.strptime(self.date_ymd, "%Y-%m-%d").replace(hour=hh, minute=mm, second=ss)
 
 
 @dataclass
@@ -45,6 +171,24 @@ class AppConfig:
     remote: RemoteConfig = field(default_factory=RemoteConfig)
     relay: RelayConfig = field(default_factory=RelayConfig)
     schedule: list[ScheduleEvent] = field(default_factory=list)
+    hosts: list[HostConfig] = field(default_factory=list)
+    groups: dict[str, list[str]] = field(default_factory=dict)
+    fleet: FleetConfig = field(default_factory=FleetConfig)
+    ssh: SshPoolConfig = field(default_factory=SshPoolConfig)
+    scheduler: SchedulerConfig = field(default_factory=SchedulerConfig)
+    gui: GuiConfig = field(default_factory=GuiConfig)
+    log: LogConfig = field(default_factory=LogConfig)
+    storage: StorageConfig = field(default_factory=StorageConfig)
+    metrics: MetricsConfig = field(default_factory=MetricsConfig)
+    confirm: ConfirmConfig = field(default_factory=ConfirmConfig)
+    planner: PlannerConfig = field(default_factory=PlannerConfig)
+    agenda: AgendaConfig = field(default_factory=AgendaConfig)
+    api: ApiConfig = field(default_factory=ApiConfig)
+
+    def __post_init__(self) -> None:
+        self._store = None  # SqliteScheduleStore bound by load()/save() for the sqlite backend
+        self._saved_text = ""  # config.json as last read or written, to skip no-op rewrites
+        self._stamp: tuple[tuple[int, int, int], ...] | None = None  # files as last read or written
 
     @classmethod
     def load(cls, path: Path = CONFIG_PATH) -> "AppConfig":
@@ -53,8 +197,34 @@ class AppConfig:
             cfg = cls()
             cfg.save(path)
             return cfg
-        raw = json.loads(path.read_text())
-        return cls.from_dict(raw)
+        text = path.read_text()
+        raw = json.loads(text)
+        cfg = cls.from_dict(raw)
+        cfg._saved_text = text
+        store = cfg.schedule_store(path)
+        if store is not None:
+            if "schedule" in raw and store.is_empty():
+                # Settings switched to sqlite by hand: adopt the JSON schedule once.
+                store.replace_all(cfg.schedule)
+                cfg._saved_text = ""
+            cfg.schedule = store.load_all()
+        cfg._stamp = cfg.stamp(path)
+        return cfg
+
+    @classmethod
+    def reload(cls, current: "AppConfig | None", path: Path = CONFIG_PATH) -> "AppConfig":
+        """*current* itself if none of its files changed since it was loaded or saved, else a fresh load.
+
+        Files are compared by (mtime, size, inode), so an unchanged config is
+        never re-read or re-parsed. A caller holding unsaved edits keeps them.
+        """
+        if current is not None and not current.changed_on_disk(path):
+            return current
+        return cls.load(path)
+
+    def changed_on_disk(self, path: Path = CONFIG_PATH) -> bool:
+        """Whether any of its files were written by someone else since this config was loaded or saved."""
+        return self._stamp is None or self._stamp != self.stamp(path)
 
     @classmethod
     def from_dict(cls, raw: dict[str, Any]) -> "AppConfig":
@@ -64,11 +234,126 @@ class AppConfig:
             relay_raw["wake_pulse_seconds"] = relay_raw["pulse_seconds"]
         relay_raw.pop("pulse_seconds", None)
         relay = RelayConfig(**relay_raw)
-        if relay.wake_mode not in {"pulse", "toggle"}:
+        if relay.wake_mode not in WAKE_MODES:
             relay.wake_mode = "pulse"
         schedule = [ScheduleEvent(**e) for e in raw.get("schedule", [])]
-        return cls(remote=remote, relay=relay, schedule=schedule)
+        hosts = [HostConfig(**h) for h in raw.get("hosts", [])]
+        for target in (remote, *hosts):
+            if target.wake_mode and target.wake_mode not in WAKE_MODES:
+                target.wake_mode = ""
+        groups = {name: list(members) for name, members in raw.get("groups", {}).items()}
+        fleet = FleetConfig(**raw.get("fleet", {}))
+        ssh = SshPoolConfig(**raw.get("ssh", {}))
+        scheduler = SchedulerConfig(**raw.get("scheduler", {}))
+        if scheduler.mode not in {"cron", "daemon"}:
+            scheduler.mode = "cron"
+        if scheduler.dispatch not in {"event", "slot", "compact"}:
+            scheduler.dispatch = "event"
+        gui = GuiConfig(**raw.get("gui", {}))
+        log = LogConfig(**raw.get("log", {}))
+        storage = StorageConfig(**raw.get("storage", {}))
+        if storage.backend not in {"json", "sqlite"}:
+            storage.backend = "json"
+        metrics = MetricsConfig(**raw.get("metrics", {}))
+        confirm = ConfirmConfig(**raw.get("confirm", {}))
+        planner = PlannerConfig(**raw.get("planner", {}))
+        agenda = AgendaConfig(**raw.get("agenda", {}))
+        api = ApiConfig(**raw.get("api", {}))
+        return cls(
+            remote=remote,
+            relay=relay,
+            schedule=schedule,
+            hosts=hosts,
+            groups=groups,
+            fleet=fleet,
+            ssh=ssh,
+            scheduler=scheduler,
+            gui=gui,
+            log=log,
+            storage=storage,
+            metrics=metrics,
+            confirm=confirm,
+            planner=planner,
+            agenda=agenda,
+            api=api,
+        )
 
     def save(self, path: Path = CONFIG_PATH) -> None:
+        """Write settings atomically; with the sqlite backend only changed events hit the database."""
+        data = asdict(self)
+        store = self.schedule_store(path)
+        if store is not None:
+            del data["schedule"]
+            store.save_all(self.schedule)
+        text = json.dumps(data, indent=2)
+        if text == self._saved_text and path.exists():
+            if store is not None:
+                self._stamp = self.stamp(path)
+            return
         path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(json.dumps(asdict(self), indent=2))
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(text)
+        tmp.replace(path)
+        self._saved_text = text
+        self._stamp = self.stamp(path)
+
+    def sqlite_path(self, path: Path = CONFIG_PATH) -> Path:
+        if self.storage.sqlite_path:
+            return Path(self.storage.sqlite_path).expanduser()
+        return path.with_name("schedule.db")
+
+    def schedule_store(self, path: Path = CONFIG_PATH):
+        """The SQLite store backing ``schedule``, or None for the JSON backend."""
+        if self.storage.backend != "sqlite":
+            return None
+        db_path = self.sqlite_path(path)
+        if self._store is None or self._store.path != db_path:
+            from store import SqliteScheduleStore
+
+            self._store = SqliteScheduleStore(db_path)
+        return self._store
+
+    def watched_paths(self, path: Path = CONFIG_PATH) -> list[Path]:
+        """Files whose changes mean the loaded config (including the schedule) is stale."""
+        if self.storage.backend != "sqlite":
+            return [path]
+        db_path = self.sqlite_path(path)
+        return [path, db_path, db_path.with_name(db_path.name + "-wal")]
+
+    def stamp(self, path: Path = CONFIG_PATH) -> tuple[tuple[int, int, int], ...]:
+        """(mtime_ns, size, inode) of every watched file; (0, 0, 0) for a missing one."""
+        stamps = []
+        for watched in self.watched_paths(path):
+            try:
+                st = watched.stat()
+            except OSError:
+                stamps.append((0, 0, 0))
+                continue
+            stamps.append((st.st_mtime_ns, st.st_size, st.st_ino))
+        return tuple(stamps)
+
+    def fleet_hosts(self) -> list[HostConfig]:
+        """Configured hosts, or the legacy single ``remote`` as host "default"."""
+        if self.hosts:
+            return list(self.hosts)
+        return [HostConfig(name="default", **asdict(self.remote))]
+
+    def resolve_targets(self, selector: str = "") -> list[HostConfig]:
+        """Resolve a comma-separated list of host/group names ("" or "all" = every host)."""
+        hosts = self.fleet_hosts()
+        by_name = {h.name: h for h in hosts}
+        names = [part.strip() for part in selector.split(",") if part.strip()]
+        if not names or "all" in names:
+            return hosts
+        resolved: dict[str, HostConfig] = {}
+        for name in names:
+            if name in by_name:
+                resolved[name] = by_name[name]
+            elif name in self.groups:
+                for member in self.groups[name]:
+                    if member not in by_name:
+                        raise ValueError(f"Group '{name}' references unknown host '{member}'.")
+                    resolved[member] = by_name[member]
+            else:
+                raise ValueError(f"Unknown host or group: {name}")
+        return list(resolved.values())
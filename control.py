@@ -3,11 +3,16 @@ from __future__ import annotations
 import subprocess
 import threading
 import time
+from collections import deque
+from concurrent.futures import Future
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Callable
 
 from config import RelayConfig, RemoteConfig
+from metrics import RELAY_OVERRUN_SECONDS, RELAY_PATTERN_SECONDS, SSH_EXITS_TOTAL, SSH_SECONDS
+from pulse import TIMELINE, PulseTimeline, Step, long_press_pattern, press_pattern
+from sshpool import SshConnectionPool
 
 
 LogFn = Callable[[str], None]
@@ -19,88 +24,203 @@ except Exception:  # pragma: no cover - dev environments without GPIO
     OutputDevice = None
 
 
+class _Channel:
+    """One relay channel: its output device and the patterns queued for it."""
+
+    def __init__(self, pin: int):
+        self.pin = pin
+        self.lock = threading.Lock()  # guards the fields below, never held across a step
+        self.device = None
+        self.mock = False
+        self.queue: deque[tuple[list[Step] | None, str, Future]] = deque()
+        self.busy = False
+
+
 class RelayController:
-    def __init__(self, config: RelayConfig, log: LogFn):
+    """Drives the relay HAT's channels, one ``OutputDevice`` per BCM pin.
+
+    ``config.gpio_pin`` is the default channel and is opened up front; other
+    channels are opened on first use. Pulses are timed on the shared
+    ``PulseTimeline`` instead of sleeping threads: patterns on different
+    channels overlap, patterns on the same channel run one after another.
+    """
+
+    def __init__(self, config: RelayConfig, log: LogFn, timeline: PulseTimeline = TIMELINE):
         self.config = config
         self.log = log
-        self._lock = threading.Lock()
-        self._device = None
-        self._mock = False
-        self._setup_device()
+        self.timeline = timeline
+        self._channels: dict[int, _Channel] = {}
+        self._channels_lock = threading.Lock()
+        self._channel(config.gpio_pin)
 
-    def _setup_device(self) -> None:
+    def _open(self, channel: _Channel) -> None:
         if OutputDevice is None:
-            self._mock = True
+            channel.mock = True
             self.log("GPIO library not available, relay running in mock mode.")
             return
         try:
-            self._device = OutputDevice(
-                pin=self.config.gpio_pin,
+            channel.device = OutputDevice(
+                pin=channel.pin,
                 active_high=self.config.active_high,
                 initial_value=False,
             )
-            self.log(f"Relay ready on GPIO {self.config.gpio_pin}.")
+            self.log(f"Relay ready on GPIO {channel.pin}.")
         except Exception as exc:
-            self._mock = True
+            channel.mock = True
             self.log(f"Relay init failed, using mock mode: {exc}")
 
-    def reconfigure(self, config: RelayConfig) -> None:
-        self.config = config
-        if self._device is not None:
+    def _close(self, channel: _Channel) -> None:
+        if channel.device is not None:
             try:
-                self._device.close()
+                channel.device.close()
             except Exception:
                 pass
-        self._device = None
-        self._mock = False
-        self._setup_device()
-
-    def pulse(self, on_seconds: float, label: str = "relay pulse") -> None:
-        with self._lock:
-            self.log(
-                f"{label}: pulsing relay (GPIO {self.config.gpio_pin}) for {on_seconds:.2f}s."
-            )
-            if self._mock or self._device is None:
-                time.sleep(on_seconds)
-                time.sleep(self.config.holdoff_seconds)
-                self.log(f"Mock {label} complete.")
+        channel.device = None
+        channel.mock = False
+
+    def _channel(self, pin: int | None) -> _Channel:
+        pin = self.config.gpio_pin if pin is None else pin
+        with self._channels_lock:
+            channel = self._channels.get(pin)
+            if channel is None:
+                channel = self._channels[pin] = _Channel(pin)
+                self._open(channel)
+            return channel
+
+    def channels(self) -> list[int]:
+        """BCM pins currently opened."""
+        with self._channels_lock:
+            return sorted(self._channels)
+
+    def reconfigure(self, config: RelayConfig) -> None:
+        self.config = config
+        with self._channels_lock:
+            channels = list(self._channels.values())
+        for channel in channels:
+            # Queued behind any in-flight pattern so a press is never cut short.
+            self._enqueue(channel, None, "reopen")
+        self._channel(config.gpio_pin)
+
+    def run_pattern(self, steps: list[Step], label: str = "relay pulse", channel: int | None = None) -> Future:
+        """Queue *steps* on *channel*; the returned future completes when the last step has elapsed."""
+        ch = self._channel(channel)
+        self.log(f"{label}: running {len(steps)}-step relay pattern (GPIO {ch.pin}).")
+        return self._enqueue(ch, list(steps), label)
+
+    def press(self, on_seconds: float, label: str = "relay pulse", channel: int | None = None) -> Future:
+        ch = self._channel(channel)
+        self.log(f"{label}: pulsing relay (GPIO {ch.pin}) for {on_seconds:.2f}s.")
+        return self._enqueue(ch, press_pattern(on_seconds, self.config.holdoff_seconds), label)
+
+    # ------------------------------------------------------------------
+    # timeline steps (run on the timeline thread)
+    # ------------------------------------------------------------------
+
+    def _enqueue(self, ch: _Channel, steps: list[Step] | None, label: str) -> Future:
+        future: Future = Future()
+        with ch.lock:
+            ch.queue.append((steps, label, future))
+            if ch.busy:
+                return future
+            ch.busy = True
+        self.timeline.call_later(0.0, lambda: self._start_next(ch))
+        return future
+
+    def _start_next(self, ch: _Channel) -> None:
+        with ch.lock:
+            if not ch.queue:
+                ch.busy = False
+                return
+            steps, label, future = ch.queue.popleft()
+        if steps is None:
+            try:
+                self._close(ch)
+                self._open(ch)
+            except Exception as exc:
+                future.set_exception(exc)
+            else:
+                future.set_result(None)
+            self._start_next(ch)
+            return
+        self._step(ch, steps, 0, label, future, time.monotonic())
+
+    def _step(self, ch: _Channel, steps: list[Step], index: int, label: str, future: Future, started: float) -> None:
+        # Every path resolves *future* and moves the channel on; a stuck
+        # future would leave the channel (and the action lane waiting on it) busy.
+        try:
+            if index == len(steps):
+                elapsed = time.monotonic() - started
+                RELAY_PATTERN_SECONDS.observe(elapsed, pin=ch.pin, outcome="ok")
+                RELAY_OVERRUN_SECONDS.observe(max(0.0, elapsed - sum(hold for _on, hold in steps)), pin=ch.pin)
+                self.log(f"Mock {label} complete." if ch.mock or ch.device is None else f"{label} complete.")
+                future.set_result(None)
+            else:
+                energized, hold = steps[index]
+                if ch.device is not None and not ch.mock:
+                    ch.device.on() if energized else ch.device.off()
+                self.timeline.call_later(hold, lambda: self._step(ch, steps, index + 1, label, future, started))
                 return
-            self._device.on()
-            time.sleep(on_seconds)
-            self._device.off()
-            time.sleep(self.config.holdoff_seconds)
-            self.log(f"{label} complete.")
+        except Exception as exc:
+            if not future.done():
+                future.set_exception(exc)
+            try:
+                if ch.device is not None:
+                    try:
+                        ch.device.off()
+                    except Exception:
+                        pass
+                RELAY_PATTERN_SECONDS.observe(time.monotonic() - started, pin=ch.pin, outcome="error")
+                self.log(f"{label} failed on GPIO {ch.pin}: {exc}")
+            finally:
+                self._start_next(ch)
+            return
+        self._start_next(ch)
 
 
 @dataclass
 class CommandResult:
     ok: bool
     message: str
+    state_seconds: float | None = None  # measured time-to-ready / time-to-down, when confirmed
 
 
 class RemotePcController:
-    def __init__(self, relay: RelayController, log: LogFn):
+    def __init__(
+        self,
+        relay: RelayController,
+        log: LogFn,
+        ssh_pool: SshConnectionPool | None = None,
+        channel: int | None = None,
+    ):
         self.relay = relay
         self.log = log
+        self.ssh_pool = ssh_pool
+        # BCM pin of this PC's relay channel; None = the relay's default pin.
+        self.channel = channel
 
     def suspend(self, config: RemoteConfig) -> CommandResult:
         if not config.host or not config.user:
             return CommandResult(False, "Remote host/user is not configured.")
-        cmd = [
-            "ssh",
-            "-p",
-            str(config.port),
-            "-o",
-            "BatchMode=yes",
-            "-o",
-            "ConnectTimeout=10",
-        ]
-        if config.ssh_key_path:
-            cmd.extend(["-i", str(Path(config.ssh_key_path).expanduser())])
+        if self.ssh_pool is not None:
+            cmd = self.ssh_pool.command(config)
+        else:
+            cmd = [
+                "ssh",
+                "-p",
+                str(config.port),
+                "-o",
+                "BatchMode=yes",
+                "-o",
+                "ConnectTimeout=10",
+            ]
+            if config.ssh_key_path:
+                cmd.extend(["-i", str(Path(config.ssh_key_path).expanduser())])
+            cmd.append(f"{config.user}@{config.host}")
         target = f"{config.user}@{config.host}"
-        cmd.append(target)
         cmd.append(config.suspend_command)
+        host = getattr(config, "name", "") or config.host
         self.log(f"Running remote suspend command on {target}.")
+        started = time.monotonic()
         try:
             proc = subprocess.run(
                 cmd,
@@ -110,33 +230,50 @@ class RemotePcController:
                 check=False,
             )
         except Exception as exc:
+            code = "timeout" if isinstance(exc, subprocess.TimeoutExpired) else "error"
+            SSH_EXITS_TOTAL.inc(host=host, code=code)
+            SSH_SECONDS.observe(time.monotonic() - started, host=host)
             return CommandResult(False, f"SSH failed: {exc}")
+        SSH_EXITS_TOTAL.inc(host=host, code=proc.returncode)
+        SSH_SECONDS.observe(time.monotonic() - started, host=host)
+        if self.ssh_pool is not None:
+            # ControlMaster=auto may have opened a master just now; track it so
+            # the pool's limits and 'ssh-pool status/close' cover it.
+            self.ssh_pool.touch(config)
         if proc.returncode != 0:
             stderr = (proc.stderr or "").strip()
             stdout = (proc.stdout or "").strip()
             detail = stderr or stdout or f"Exit code {proc.returncode}"
             return CommandResult(False, f"Suspend command failed: {detail}")
+        if self.ssh_pool is not None:
+            # The host is going to sleep; drop its master so the next call reconnects cleanly.
+            self.ssh_pool.close(config)
         return CommandResult(True, "Suspend command sent successfully.")
 
-    def wake_via_power_button(self, on_seconds: float) -> CommandResult:
-        try:
-            self.relay.pulse(on_seconds=on_seconds, label="Wake action")
-            return CommandResult(True, "Power button relay pulse sent.")
-        except Exception as exc:
-            return CommandResult(False, f"Relay pulse failed: {exc}")
+    # The relay actions return a future yielding the CommandResult once the
+    # pattern has run on the pulse timeline; no thread waits for the press.
+
+    def wake_via_power_button(self, on_seconds: float) -> Future:
+        job = self.relay.press(on_seconds, label="Wake action", channel=self.channel)
+        return _relay_result(job, "Power button relay pulse sent.", "Relay pulse failed")
+
+    def toggle_power(self, on_seconds: float) -> Future:
+        job = self.relay.press(on_seconds, label="Toggle power action", channel=self.channel)
+        return _relay_result(job, "Power toggle relay pulse sent.", "Relay toggle failed")
+
+    def force_off(self, hold_seconds: float) -> Future:
+        pattern = long_press_pattern(hold_seconds, self.relay.config.holdoff_seconds)
+        job = self.relay.run_pattern(pattern, label="Force-off action", channel=self.channel)
+        return _relay_result(job, f"Power button held for {hold_seconds:.1f}s (force off).", "Relay force-off failed")
 
-    def toggle_power(self, on_seconds: float) -> CommandResult:
-        try:
-            self.relay.pulse(on_seconds=on_seconds, label="Toggle power action")
-            return CommandResult(True, "Power toggle relay pulse sent.")
-        except Exception as exc:
-            return CommandResult(False, f"Relay toggle failed: {exc}")
 
+def _relay_result(job: Future, ok: str, failed: str) -> Future:
+    """A future of the CommandResult for relay pattern *job*, resolved when it completes."""
+    result: Future = Future()
 
-def run_async(fn: Callable[[], CommandResult], log: LogFn) -> None:
-    def _worker() -> None:
-        result = fn()
-        level = "OK" if result.ok else "ERROR"
-        log(f"[{level}] {result.message}")
+    def _done(f: Future) -> None:
+        exc = f.exception()
+        result.set_result(CommandResult(False, f"{failed}: {exc}") if exc else CommandResult(True, ok))
 
-    threading.Thread(target=_worker, daemon=True).start()
+    job.add_done_callback(_done)
+    return result
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+import hashlib
 import subprocess
 import sys
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Callable
 
-from config import ScheduleEvent
+from config import CONFIG_PATH, AppConfig, ScheduleEvent
 
 
 MARKER_BEGIN = "# BEGIN POWERSTACK"
@@ -13,51 +16,219 @@ MARKER_END = "# END POWERSTACK"
 
 _CLI_PATH = Path(__file__).resolve().parent / "cli.py"
 
+# Digest of the block PowerStack last wrote, shared by every process so a
+# cron-spawned run can tell its own block from an outside edit.
+STATE_PATH = CONFIG_PATH.parent / "cron.state"
+
+# ``sync`` outcomes
+SYNC_WROTE = "wrote"
+SYNC_SKIPPED = "skipped"
+SYNC_DRIFT = "drift"  # the block had been edited outside PowerStack; rewritten
+
 
 class CronManager:
     """Manages the PowerStack block inside the user's crontab."""
 
-    def sync(self, events: list[ScheduleEvent]) -> None:
-        """Rebuild the PowerStack crontab block from the current event list."""
-        lines = self._read_crontab()
-        stripped = self._strip_block(lines)
-        block = self._build_block(events)
-        self._write_crontab(stripped + block)
+    def __init__(
+        self,
+        prewarm_seconds: int = 0,
+        daemon_mode: bool = False,
+        dispatch: str = "event",
+    ) -> None:
+        # When > 0, suspend events get an extra line that opens the SSH
+        # connection this many seconds ahead of the event.
+        self.prewarm_seconds = prewarm_seconds
+        # In daemon mode the resident scheduler owns the events and the
+        # block only (re)starts it at boot.
+        self.daemon_mode = daemon_mode
+        # "event": one line per event; "slot": one line per (minute, day)
+        # slot, so simultaneous events share a single process; "compact":
+        # slot lines merged into minute/hour/weekday lists.
+        self.dispatch = dispatch
+        self._sync_lock = threading.Lock()  # one crontab read-modify-write at a time
+        self._pending_lock = threading.Lock()
+        self._pending: list[str] | None = None  # block awaiting a coalesced sync
+        self._pending_verify = False
+        self._pending_timer: threading.Timer | None = None
+        self._pending_callbacks: list[Callable[[str | None, Exception | None], None]] = []
+
+    @classmethod
+    def from_config(cls, config: AppConfig) -> "CronManager":
+        cron = cls()
+        cron.apply_config(config)
+        return cron
+
+    def apply_config(self, config: AppConfig) -> None:
+        self.prewarm_seconds = config.ssh.prewarm_seconds
+        self.daemon_mode = config.scheduler.mode == "daemon"
+        self.dispatch = config.scheduler.dispatch
+
+    def sync(self, events: list[ScheduleEvent], verify: bool = False) -> str:
+        """Bring the PowerStack crontab block in line with *events*.
+
+        Returns ``SYNC_SKIPPED`` when the block is already identical (no
+        ``crontab -`` call), ``SYNC_WROTE`` after a normal rewrite, or
+        ``SYNC_DRIFT`` when the installed block no longer matched what
+        PowerStack last wrote and had to be replaced.
+
+        A block matching the stored digest is taken as installed without
+        running ``crontab -l``; pass *verify* (the GUI's Refresh) to read
+        the crontab anyway and catch outside edits.
+        """
+        return self._sync_block(self._build_block(events), verify)
+
+    def _sync_block(self, block: list[str], verify: bool = False) -> str:
+        digest = _digest(block)
+        with self._sync_lock:
+            last = self._load_digest()
+            if not verify and last == digest:
+                return SYNC_SKIPPED
+            outside, current = self._split_block(self._read_crontab())
+            current_digest = _digest(current) if current else ""
+            if current_digest == digest:
+                self._save_digest(digest)
+                return SYNC_SKIPPED
+            drifted = bool(last) and current_digest != last
+            self._write_crontab(outside + block)
+            self._save_digest(digest)
+        return SYNC_DRIFT if drifted else SYNC_WROTE
+
+    def sync_later(
+        self,
+        events: list[ScheduleEvent],
+        callback: Callable[[str | None, Exception | None], None] | None = None,
+        delay: float = 0.5,
+        verify: bool = False,
+    ) -> None:
+        """Coalesce a burst of syncs into one, run *delay* seconds after the first.
+
+        The latest *events* win; the sync verifies if any queued call asked to. Every queued *callback* is called once with
+        ``(outcome, None)`` or ``(None, exc)`` on the thread that runs the sync.
+        """
+        block = self._build_block(events)  # snapshot now; the caller may keep editing
+        with self._pending_lock:
+            self._pending = block
+            self._pending_verify = self._pending_verify or verify
+            if callback is not None:
+                self._pending_callbacks.append(callback)
+            if self._pending_timer is not None:
+                return
+            self._pending_timer = threading.Timer(delay, self.flush_pending)
+            self._pending_timer.daemon = True
+            self._pending_timer.start()
+
+    def flush_pending(self) -> None:
+        """Run a queued ``sync_later`` now (e.g. before the GUI exits)."""
+        with self._pending_lock:
+            block, self._pending = self._pending, None
+            verify, self._pending_verify = self._pending_verify, False
+            callbacks, self._pending_callbacks = self._pending_callbacks, []
+            if self._pending_timer is not None:
+                self._pending_timer.cancel()
+                self._pending_timer = None
+        if block is None:
+            return
+        outcome: str | None = None
+        error: Exception | None = None
+        try:
+            outcome = self._sync_block(block, verify)
+        except Exception as exc:
+            error = exc
+        for callback in callbacks:
+            callback(outcome, error)
 
     def remove_all(self) -> None:
         """Remove the entire PowerStack crontab block."""
-        lines = self._read_crontab()
-        stripped = self._strip_block(lines)
-        self._write_crontab(stripped)
+        with self._sync_lock:
+            outside, current = self._split_block(self._read_crontab())
+            if current:
+                self._write_crontab(outside)
+            self._save_digest("")
 
     # ------------------------------------------------------------------
     # internals
     # ------------------------------------------------------------------
 
-    def _cron_expr(self, event: ScheduleEvent) -> str:
-        hh, mm = event.time_hhmm.split(":")
+    def _cron_entry(self, event: ScheduleEvent, lead_seconds: int = 0) -> tuple[str, int]:
+        """Cron expression for *event* fired *lead_seconds* early, plus the
+        sub-minute delay (cron only has minute resolution)."""
+        lead = timedelta(seconds=lead_seconds)
         if event.recurrence == "once":
-            dt = datetime.strptime(event.date_ymd, "%Y-%m-%d")
-            return f"{mm} {hh} {dt.day} {dt.month} *"
+            fire = event.once_datetime() - lead
+            return f"{fire.minute:02d} {fire.hour:02d} {fire.day} {fire.month} *", fire.second
+        hh, mm, ss = event.time_parts()
+        # Any weekday works as an anchor; only the day shift matters.
+        anchor = datetime(2024, 1, 1, hh, mm, ss)  # a Monday
+        fire = anchor - lead
+        shift = (fire.date() - anchor.date()).days
         # Python weekday 0=Mon → cron weekday 1=Mon; Sun is 0 in cron
-        days = ",".join(str((d + 1) % 7) for d in sorted(event.weekdays))
-        return f"{mm} {hh} * * {days}"
+        days = ",".join(str(d) for d in sorted({(d + shift + 1) % 7 for d in event.weekdays}))
+        return f"{fire.minute:02d} {fire.hour:02d} * * {days}", fire.second
 
     def _build_block(self, events: list[ScheduleEvent]) -> list[str]:
         py = sys.executable
         cli = str(_CLI_PATH)
         lines: list[str] = [MARKER_BEGIN]
+        if self.daemon_mode:
+            lines.append(f"@reboot {py} {cli} daemon --boot  # PowerStack scheduler daemon")
+            lines.append(MARKER_END)
+            return lines
+        if self.dispatch in ("slot", "compact"):
+            lines.extend(self._slot_lines(events, py, cli))
+            lines.append(MARKER_END)
+            return lines
         for event in events:
             if not event.enabled:
                 continue
             try:
-                expr = self._cron_expr(event)
+                expr, delay = self._cron_entry(event)
             except Exception:
                 continue
-            lines.append(f"{expr} {py} {cli} _run {event.id}  # {event.label}")
+            sleep = f"sleep {delay} && " if delay else ""
+            lines.append(f"{expr} {sleep}{py} {cli} _run {event.id}  # {event.label}")
+            if self.prewarm_seconds > 0 and event.action == "suspend":
+                expr, delay = self._cron_entry(event, self.prewarm_seconds)
+                sleep = f"sleep {delay} && " if delay else ""
+                lines.append(f"{expr} {sleep}{py} {cli} _prewarm {event.id}  # prewarm {event.label}")
         lines.append(MARKER_END)
         return lines
 
+    def _slot_exprs(self, event: ScheduleEvent, lead_seconds: int = 0) -> list[str]:
+        """One cron expression per (minute, day) slot *event* fires in."""
+        expr, _delay = self._cron_entry(event, lead_seconds)
+        minute, hour, dom, month, dow = expr.split()
+        if dow == "*":
+            return [expr]
+        return [f"{minute} {hour} {dom} {month} {d}" for d in dow.split(",")]
+
+    def _slot_groups(self, events: list[ScheduleEvent], lead_seconds: int = 0) -> dict[str, set[str]]:
+        """{slot expression: ids of the events firing in it}."""
+        slots: dict[str, set[str]] = {}
+        for event in events:
+            if not event.enabled:
+                continue
+            if lead_seconds and event.action != "suspend":
+                continue
+            try:
+                for expr in self._slot_exprs(event, lead_seconds):
+                    slots.setdefault(expr, set()).add(event.id)
+            except Exception:
+                continue
+        return slots
+
+    def _slot_lines(self, events: list[ScheduleEvent], py: str, cli: str) -> list[str]:
+        slots = self._slot_groups(events)
+        warm_slots = self._slot_groups(events, self.prewarm_seconds) if self.prewarm_seconds > 0 else {}
+        if self.dispatch == "compact":
+            slots = compact_slots(slots)
+            warm_slots = compact_slots(warm_slots)
+        lines = [f"{expr} {py} {cli} _run_slot '{expr}'  # {len(ids)} event(s)" for expr, ids in slots.items()]
+        lines.extend(
+            f"{expr} {py} {cli} _run_slot --prewarm '{expr}'  # prewarm {len(ids)} event(s)"
+            for expr, ids in warm_slots.items()
+        )
+        return lines
+
     def _read_crontab(self) -> list[str]:
         result = subprocess.run(
             ["crontab", "-l"],
@@ -68,17 +239,44 @@ class CronManager:
             return []
         return result.stdout.splitlines()
 
-    def _strip_block(self, lines: list[str]) -> list[str]:
-        out: list[str] = []
+    def _split_block(self, lines: list[str]) -> tuple[list[str], list[str]]:
+        """(lines outside the PowerStack block, the block itself including markers)."""
+        outside: list[str] = []
+        block: list[str] = []
         inside = False
         for line in lines:
-            if line.strip() == MARKER_BEGIN:
+            marker = line.strip()
+            if marker == MARKER_BEGIN:
                 inside = True
-            elif line.strip() == MARKER_END:
+                block.append(line)
+            elif marker == MARKER_END:
                 inside = False
-            elif not inside:
-                out.append(line)
-        return out
+                block.append(line)
+            elif inside:
+                block.append(line)
+            else:
+                outside.append(line)
+        return outside, block
+
+    def _load_digest(self) -> str:
+        try:
+            return STATE_PATH.read_text().strip()
+        except OSError:
+            return ""
+
+    def _save_digest(self, digest: str) -> None:
+        if self._load_digest() == digest:
+            return
+        try:
+            STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            tmp = STATE_PATH.with_suffix(".tmp")
+            tmp.write_text(digest)
+            tmp.replace(STATE_PATH)
+        except OSError:
+            pass
+
+    def _strip_block(self, lines: list[str]) -> list[str]:
+        return self._split_block(lines)[0]
 
     def _write_crontab(self, lines: list[str]) -> None:
         content = "\n".join(lines)
@@ -92,3 +290,170 @@ class CronManager:
         )
         if proc.returncode != 0:
             raise RuntimeError(f"Failed to write crontab: {proc.stderr.strip()}")
+
+
+def _digest(block: list[str]) -> str:
+    return hashlib.sha256("\n".join(line.rstrip() for line in block).encode()).hexdigest()
+
+
+# ----------------------------------------------------------------------
+# slot compaction
+# ----------------------------------------------------------------------
+
+def _cron_list(values: set[int], width: int = 0) -> str:
+    """Sorted cron list, with runs of three or more written as ranges."""
+    ordered = sorted(values)
+    parts: list[str] = []
+    i = 0
+    while i < len(ordered):
+        j = i
+        while j + 1 < len(ordered) and ordered[j + 1] == ordered[j] + 1:
+            j += 1
+        if j - i >= 2:
+            parts.append(f"{ordered[i]:0{width}d}-{ordered[j]:0{width}d}")
+        else:
+            parts.extend(f"{v:0{width}d}" for v in ordered[i:j + 1])
+        i = j + 1
+    return ",".join(parts)
+
+
+def _compact_times(cells: dict[tuple[int, int], set[str]]) -> list[tuple[str, str, set[str]]]:
+    """Cover the (hour, minute) cells exactly with minute-list x hour-list
+    rectangles, as (minute field, hour field, event ids)."""
+    best: list[tuple[str, str, set[str]]] | None = None
+    for by_minute in (True, False):
+        # Group one axis by the exact set of values it pairs with on the other.
+        pairs: dict[int, set[int]] = {}
+        for hour, minute in cells:
+            key, other = (minute, hour) if by_minute else (hour, minute)
+            pairs.setdefault(key, set()).add(other)
+        groups: dict[frozenset[int], set[int]] = {}
+        for key, others in pairs.items():
+            groups.setdefault(frozenset(others), set()).add(key)
+        out = []
+        for others, keys in groups.items():
+            minutes, hours = (keys, set(others)) if by_minute else (set(others), keys)
+            ids = set().union(*(cells[(h, m)] for h in hours for m in minutes))
+            out.append((_cron_list(minutes, 2), _cron_list(hours, 2), ids))
+        if best is None or len(out) < len(best):
+            best = out
+    return best or []
+
+
+def compact_slots(slots: dict[str, set[str]]) -> dict[str, set[str]]:
+    """Merge single-slot expressions into the fewest lines covering exactly
+    the same minutes.
+
+    Weekly slots (``m h * * d``) are grouped by the weekday set each time of
+    day fires on, then by minute/hour lists; one-time slots (``m h D M *``)
+    by date. Lines never overlap, so a fired minute belongs to one line only.
+    """
+    weekly: dict[tuple[int, int], dict[int, set[str]]] = {}
+    dated: dict[tuple[str, str], dict[tuple[int, int], set[str]]] = {}
+    for expr, ids in slots.items():
+        minute, hour, dom, month, dow = expr.split()
+        cell = (int(hour), int(minute))
+        if dom == "*":
+            weekly.setdefault(cell, {}).setdefault(int(dow), set()).update(ids)
+        else:
+            dated.setdefault((dom, month), {}).setdefault(cell, set()).update(ids)
+
+    by_days: dict[frozenset[int], dict[tuple[int, int], set[str]]] = {}
+    for cell, days in weekly.items():
+        by_days.setdefault(frozenset(days), {})[cell] = set().union(*days.values())
+
+    out: dict[str, set[str]] = {}
+    for days, cells in sorted(by_days.items(), key=lambda kv: sorted(kv[0])):
+        for minutes, hours, ids in _compact_times(cells):
+            out[f"{minutes} {hours} * * {_cron_list(set(days))}"] = ids
+    for (dom, month), cells in dated.items():
+        for minutes, hours, ids in _compact_times(cells):
+            out[f"{minutes} {hours} {dom} {month} *"] = ids
+    return out
+
+
+def line_recurrence(expr: str) -> str:
+    """Which events a slot line stands for: dated lines carry one-time events,
+    weekday lines weekly ones (so a shared minute never runs an event twice)."""
+    return "weekly" if expr.split()[2] == "*" else "once"
+
+
+# ----------------------------------------------------------------------
+# slot resolution (used by ``cli.py _run_slot``)
+# ----------------------------------------------------------------------
+
+def _field_values(field: str, lo: int, hi: int) -> set[int]:
+    if field == "*":
+        return set(range(lo, hi + 1))
+    values: set[int] = set()
+    for part in field.split(","):
+        if "-" in part:
+            start, end = part.split("-", 1)
+            values.update(range(int(start), int(end) + 1))
+        else:
+            values.add(int(part))
+    return values
+
+
+def cron_matches(expr: str, when: datetime) -> bool:
+    """Whether the five-field cron *expr* fires at *when* (minute resolution)."""
+    minute, hour, dom, month, dow = expr.split()
+    if when.minute not in _field_values(minute, 0, 59):
+        return False
+    if when.hour not in _field_values(hour, 0, 23):
+        return False
+    if when.month not in _field_values(month, 1, 12):
+        return False
+    dows = _field_values(dow, 0, 7)
+    if 7 in dows:
+        dows.add(0)
+    dom_ok = when.day in _field_values(dom, 1, 31)
+    dow_ok = (when.weekday() + 1) % 7 in dows
+    # Like cron: when both day fields are restricted, either one may match.
+    if dom != "*" and dow != "*":
+        return dom_ok or dow_ok
+    return dom_ok and dow_ok
+
+
+def last_fire_minute(expr: str, now: datetime, lookback_minutes: int = 60) -> datetime | None:
+    """The latest minute at or before *now* that *expr* fires in."""
+    minute = now.replace(second=0, microsecond=0)
+    for _ in range(lookback_minutes + 1):
+        if cron_matches(expr, minute):
+            return minute
+        minute -= timedelta(minutes=1)
+    return None
+
+
+def events_in_minute(
+    events: list[ScheduleEvent],
+    minute: datetime,
+    lead_seconds: int = 0,
+) -> list[tuple[datetime, ScheduleEvent]]:
+    """Enabled events due in *minute* (shifted *lead_seconds* early), as
+    (act-at, event) pairs sorted by time."""
+    lead = timedelta(seconds=lead_seconds)
+    start = minute + lead
+    end = start + timedelta(minutes=1)
+    due: list[tuple[datetime, ScheduleEvent]] = []
+    for event in events:
+        if not event.enabled:
+            continue
+        try:
+            if event.recurrence == "once":
+                candidates = [event.once_datetime()]
+            else:
+                hh, mm, ss = event.time_parts()
+                candidates = [
+                    datetime(day.year, day.month, day.day, hh, mm, ss)
+                    for day in sorted({start.date(), end.date()})
+                ]
+                candidates = [c for c in candidates if c.weekday() in event.weekdays]
+        except ValueError:
+            continue
+        for fire in candidates:
+            if start <= fire < end:
+                due.append((fire - lead, event))
+                break
+    due.sort(key=lambda item: item[0])
+    return due
@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import fcntl
+import heapq
+import itertools
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable
+
+from api import ApiServer, socket_path
+from cli import ControlService, PowerStackCLI
+from config import CONFIG_PATH, AppConfig, ScheduleEvent
+from cron import SYNC_DRIFT, CronManager
+from executor import SCHEDULED
+from fleet import FleetController
+from metrics import METRICS, SCHEDULE_LAG_SECONDS, SCHEDULE_MISSED_TOTAL
+from schedule import ScheduleIndex, next_run
+
+
+LogFn = Callable[[str], None]
+
+LOCK_PATH = CONFIG_PATH.parent / "daemon.lock"
+
+
+class SchedulerDaemon:
+    """Long-running alternative to one cron process per fire.
+
+    The parsed schedule lives in a heap of (fire time, event) entries, the
+    relay device and SSH pool stay open for the lifetime of the process, and
+    ``config.json`` (and the schedule database, if any) is re-read whenever it
+    changes on disk (or on SIGHUP). With ``api.enabled`` the same process
+    answers the control API, sharing its fleet with scheduled fires.
+    """
+
+    def __init__(self, path: Path = CONFIG_PATH, log: LogFn = print, boot: bool = False) -> None:
+        self.path = path
+        self.log = log
+        self.boot = boot  # started by the crontab's @reboot line
+        self.config = AppConfig.load(path)
+        METRICS.configure(self.config.metrics)
+        self.cron = CronManager.from_config(self.config)
+        self.fleet = FleetController(self.config, None, log)
+        self.index = ScheduleIndex(self.config.schedule)
+        self._heap: list[tuple[float, int, str, str]] = []  # (fire ts, seq, kind, event id)
+        self._seq = itertools.count()
+        self._stamp = self._config_stamp()
+        # Everything due up to this instant has been dispatched; rebuilds
+        # resume from here so a reload never drops a fire that is due now.
+        self._dispatched_until = time.time()
+        self._wake = threading.Event()
+        self._reload_requested = False
+        self._stopping = False
+        self._handed_back = False  # scheduler.mode went back to cron while running
+        self._save_lock = threading.Lock()
+        self._api: ApiServer | None = None
+        self._workers = ThreadPoolExecutor(
+            max_workers=max(1, self.config.fleet.max_parallel),
+            thread_name_prefix="powerstack-fire",
+        )
+
+    def run(self) -> None:
+        LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = LOCK_PATH.open("w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self.log("[ERROR] Another PowerStack daemon is already running.")
+            return
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+
+        if self.boot and self.config.scheduler.mode != "daemon":
+            # The schedule was handed back to cron; a leftover @reboot line must not undo that.
+            self.log("scheduler.mode is 'cron'; not starting the daemon at boot.")
+            self._sync_cron()
+            lock_file.close()
+            return
+
+        self._install_signal_handlers()
+        self._serve_metrics()
+        self._take_ownership()
+        self._serve_api()
+        self._rebuild()
+        self.log(f"Scheduler daemon started ({len(self._heap)} pending fire(s)).")
+        try:
+            while not self._stopping:
+                self._check_config()
+                self._dispatch_due()
+                timeout = self.config.scheduler.poll_seconds
+                if self._heap:
+                    timeout = min(timeout, max(0.0, self._heap[0][0] - time.time()))
+                self._wake.wait(timeout)
+                self._wake.clear()
+        finally:
+            self._workers.shutdown(wait=True)
+            self.fleet.executor.wait_idle()
+            if self._api is not None:
+                self._api.stop()
+            METRICS.stop_serving()
+            METRICS.flush()
+            lock_file.close()
+            if self._handed_back:
+                self.log("Scheduler daemon stopped; cron fires the schedule again.")
+            else:
+                self.log("Scheduler daemon stopped. Scheduled events will not fire until it is started "
+                         "again (at the latest on reboot) or scheduler.mode is set back to 'cron'.")
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._wake.set()
+
+    # ------------------------------------------------------------------
+    # schedule heap
+    # ------------------------------------------------------------------
+
+    def _rebuild(self) -> None:
+        after = datetime.fromtimestamp(self._dispatched_until)
+        self.index = ScheduleIndex(self.config.schedule)
+        self._heap = []
+        for event in self.config.schedule:
+            self._push_next(event, after)
+        heapq.heapify(self._heap)
+
+    def _push_next(self, event: ScheduleEvent, after: datetime) -> None:
+        fire = self._next_fire(event, after)
+        if fire is not None:
+            self._heap.append((fire.timestamp(), next(self._seq), "run", event.id))
+        lead = self.config.ssh.prewarm_seconds
+        if lead > 0 and event.action == "suspend":
+            # The first fire whose pre-warm point is still ahead of *after*.
+            warm_fire = self._next_fire(event, after + timedelta(seconds=lead))
+            if warm_fire is not None:
+                warm_at = warm_fire - timedelta(seconds=lead)
+                self._heap.append((warm_at.timestamp(), next(self._seq), "prewarm", event.id))
+
+    def _next_fire(self, event: ScheduleEvent, after: datetime) -> datetime | None:
+        compiled = self.index.get(event.id)
+        return next_run(compiled, after) if compiled is not None else None
+
+    def _dispatch_due(self) -> None:
+        now = time.time()
+        grace = self.config.scheduler.missed_grace_seconds
+        by_id = {e.id: e for e in self.config.schedule}
+        while self._heap and self._heap[0][0] <= now:
+            fire_ts, _seq, kind, event_id = heapq.heappop(self._heap)
+            event = by_id.get(event_id)
+            if event is None or not event.enabled:
+                continue
+            if kind == "run":
+                # Re-queue the following occurrence before running this one.
+                fire = self._next_fire(event, datetime.fromtimestamp(fire_ts) + timedelta(seconds=1))
+                if fire is not None:
+                    heapq.heappush(self._heap, (fire.timestamp(), next(self._seq), "run", event.id))
+                if now - fire_ts > grace:
+                    SCHEDULE_MISSED_TOTAL.inc(mode="daemon")
+                    self.log(f"[WARN] Skipped '{event.label}': missed by {now - fire_ts:.0f}s.")
+                    continue
+                self._fire(event, fire_ts)
+            else:
+                lead = self.config.ssh.prewarm_seconds
+                warm_fire = self._next_fire(event, datetime.fromtimestamp(fire_ts + lead) + timedelta(seconds=1))
+                if warm_fire is not None:
+                    warm_at = (warm_fire - timedelta(seconds=lead)).timestamp()
+                    heapq.heappush(self._heap, (warm_at, next(self._seq), "prewarm", event.id))
+                self._workers.submit(self._prewarm, event)
+        self._dispatched_until = now
+
+    # ------------------------------------------------------------------
+    # firing
+    # ------------------------------------------------------------------
+
+    def _fire(self, event: ScheduleEvent, fire_ts: float) -> None:
+        lag = time.time() - fire_ts
+        SCHEDULE_LAG_SECONDS.observe(max(0.0, lag), mode="daemon")
+        self.log(f"Daemon triggered '{event.label}' ({event.action}, {lag:.2f}s late).")
+        job = self.fleet.submit(event.action, event.target, SCHEDULED)
+        job.add_done_callback(lambda f: self._fired(event, f))
+
+    def _fired(self, event: ScheduleEvent, job: Future) -> None:
+        try:
+            result = job.result().to_command_result()
+        except Exception as exc:
+            self.log(f"[ERROR] '{event.label}' failed: {exc}")
+            return
+        level = "OK" if result.ok else "ERROR"
+        self.log(f"[{level}] {result.message}")
+        if event.recurrence == "once":
+            # This runs on the fleet's results thread; the config load and save go elsewhere.
+            self._workers.submit(self._auto_disable, event.id)
+
+    def _prewarm(self, event: ScheduleEvent) -> None:
+        try:
+            warmed = self.fleet.prewarm(event.target)
+        except Exception as exc:
+            self.log(f"[WARN] Pre-warm for '{event.label}' failed: {exc}")
+            return
+        self.log(f"Pre-warmed {warmed} SSH connection(s) for '{event.label}'.")
+
+    def _auto_disable(self, event_id: str) -> None:
+        # Edit the latest on-disk copy so concurrent CLI/GUI edits are kept;
+        # the main loop then sees the new mtime and reloads.
+        with self._save_lock:
+            fresh = AppConfig.load(self.path)
+            for event in fresh.schedule:
+                if event.id == event_id and event.enabled:
+                    event.enabled = False
+                    fresh.save(self.path)
+                    self.log(f"Auto-disabled one-time event '{event.label}'.")
+                    break
+        self._wake.set()
+
+    # ------------------------------------------------------------------
+    # config tracking
+    # ------------------------------------------------------------------
+
+    def _config_stamp(self) -> tuple[tuple[int, int, int], ...]:
+        return self.config.stamp(self.path)
+
+    def _check_config(self) -> None:
+        stamp = self._config_stamp()
+        if stamp == self._stamp and not self._reload_requested:
+            return
+        self._stamp = stamp
+        self._reload_requested = False
+        try:
+            config = AppConfig.load(self.path)
+        except Exception as exc:
+            self.log(f"[WARN] Config reload failed, keeping previous schedule: {exc}")
+            return
+        if config.scheduler.mode != "daemon":
+            self.log("scheduler.mode is no longer 'daemon'; handing the schedule back to cron.")
+            self.config = config
+            self.cron.apply_config(config)
+            self._sync_cron()
+            self._handed_back = True
+            self.stop()
+            return
+        self.config = config
+        METRICS.configure(config.metrics)
+        self._serve_metrics()
+        self._serve_api()
+        self.cron.apply_config(config)
+        self.fleet.reconfigure(config)
+        self._rebuild()
+        self.log(f"Config reloaded ({len(self._heap)} pending fire(s)).")
+
+    def _take_ownership(self) -> None:
+        """Switch scheduling to daemon mode so cron stops firing the same events."""
+        if self.config.scheduler.mode != "daemon":
+            self.config.scheduler.mode = "daemon"
+            self.config.save(self.path)
+            self._stamp = self._config_stamp()
+            self.cron.apply_config(self.config)
+            self.log("Switched scheduler.mode to 'daemon'.")
+        self._sync_cron()
+
+    def _sync_cron(self) -> None:
+        """Write the crontab block for the current mode: the @reboot line, or the events themselves."""
+        try:
+            outcome = self.cron.sync(self.config.schedule)
+        except Exception as exc:
+            self.log(f"[WARN] Crontab sync failed: {exc}")
+            return
+        if outcome == SYNC_DRIFT:
+            self.log("[WARN] PowerStack crontab block was edited outside PowerStack; rewrote it.")
+
+    def _serve_metrics(self) -> None:
+        try:
+            METRICS.serve()
+        except OSError as exc:
+            self.log(f"[WARN] Metrics endpoint unavailable: {exc}")
+
+    def _serve_api(self) -> None:
+        """Start or stop the control API to match ``api.enabled``."""
+        if not self.config.api.enabled:
+            if self._api is not None:
+                self._api.stop()
+                self._api = None
+                self.log("Control API stopped.")
+            return
+        if self._api is not None:
+            return
+        # Edits made through the API are saved to disk; waking the loop reloads them.
+        cli = PowerStackCLI(self.log, AppConfig.load(self.path))
+        service = ControlService(cli, self.fleet, self._wake.set)
+        try:
+            self._api = ApiServer(socket_path(), service.handle)
+        except OSError as exc:
+            self.log(f"[WARN] Control API unavailable: {exc}")
+            return
+        self._api.start()
+        self.log(f"Control API listening on {self._api.path}.")
+
+    def _install_signal_handlers(self) -> None:
+        def _stop(_signum: int, _frame: object) -> None:
+            self.stop()
+
+        def _reload(_signum: int, _frame: object) -> None:
+            self._reload_requested = True
+            self._wake.set()
+
+        signal.signal(signal.SIGTERM, _stop)
+        signal.signal(signal.SIGINT, _stop)
+        signal.signal(signal.SIGHUP, _reload)
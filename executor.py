@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+
+# Lower runs first: a button press jumps ahead of queued scheduled fires.
+MANUAL = 0
+SCHEDULED = 1
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    key: tuple[str, str, str] = field(compare=False)  # (action, host, variant) for coalescing
+    lane: str = field(compare=False)  # jobs sharing a lane never overlap
+    fn: Callable[[], Any] = field(compare=False)
+    future: Future = field(compare=False)
+    cancelled: bool = field(default=False, compare=False)
+
+
+class ActionExecutor:
+    """Fixed pool of workers running actions one host ("lane") at a time.
+
+    Submitting an (action, host) pair that is already queued returns the
+    queued job's future instead of adding a second one, raising its priority
+    if needed. A *variant* (e.g. "force") keeps requests that would behave
+    differently from merging. Workers take the highest-priority job whose lane is idle, so a
+    host never runs two actions at once while other hosts proceed.
+
+    A job may return a ``Future`` (a relay press timed on the pulse
+    timeline): its worker moves on at once, and the lane stays busy until
+    that future completes, which then completes the job's own future.
+    """
+
+    def __init__(self, workers: int = 4, name: str = "powerstack-action"):
+        self._heap: list[_Job] = []
+        self._pending: dict[tuple[str, str, str], _Job] = {}
+        self._busy_lanes: dict[str, tuple[str, str]] = {}  # lane -> key running there
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._name = name
+        self._threads: list[threading.Thread] = []
+        self._target_workers = 0
+        self._stopping = False
+        self.resize(workers)
+
+    def resize(self, workers: int) -> None:
+        """Grow or shrink the pool; surplus workers exit once idle."""
+        with self._cond:
+            self._target_workers = max(1, workers)
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self._target_workers:
+                thread = threading.Thread(
+                    target=self._work,
+                    name=f"{self._name}-{len(self._threads)}",
+                    daemon=True,
+                )
+                self._threads.append(thread)
+                thread.start()
+            self._cond.notify_all()
+
+    def submit(
+        self,
+        action: str,
+        lane: str,
+        fn: Callable[[], Any],
+        priority: int = MANUAL,
+        variant: str = "",
+    ) -> Future:
+        key = (action, lane, variant)
+        with self._cond:
+            job = self._pending.get(key)
+            if job is not None:
+                if priority < job.priority:
+                    # Re-queue at the better priority; the old heap entry is skipped.
+                    job.cancelled = True
+                    job = _Job(priority, next(self._seq), key, lane, job.fn, job.future)
+                    self._pending[key] = job
+                    heapq.heappush(self._heap, job)
+                    self._cond.notify()
+                return job.future
+            job = _Job(priority, next(self._seq), key, lane, fn, Future())
+            self._pending[key] = job
+            heapq.heappush(self._heap, job)
+            self._cond.notify()
+            return job.future
+
+    def cancel_pending(self) -> int:
+        """Drop every queued (not yet running) job; returns how many were cancelled."""
+        with self._cond:
+            jobs = list(self._pending.values())
+            self._pending.clear()
+            self._heap = []
+        for job in jobs:
+            job.future.cancel()
+        return len(jobs)
+
+    def stats(self) -> tuple[int, list[tuple[str, str]]]:
+        """(queued job count, (action, host) of every running job)."""
+        with self._cond:
+            return len(self._pending), sorted(self._busy_lanes.values())
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        """Block until nothing is queued or running; False if *timeout* expired first."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy_lanes, timeout)
+
+    def shutdown(self) -> None:
+        self.cancel_pending()
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+
+    # ------------------------------------------------------------------
+    # workers
+    # ------------------------------------------------------------------
+
+    def _next_job(self) -> _Job | None:
+        """Pop the best job whose lane is free (call with the condition held)."""
+        skipped: list[_Job] = []
+        found: _Job | None = None
+        while self._heap:
+            job = heapq.heappop(self._heap)
+            if job.cancelled:
+                continue
+            if job.lane in self._busy_lanes:
+                skipped.append(job)
+                continue
+            found = job
+            break
+        for job in skipped:
+            heapq.heappush(self._heap, job)
+        return found
+
+    def _work(self) -> None:
+        me = threading.current_thread()
+        while True:
+            with self._cond:
+                job = None
+                while not self._stopping:
+                    if len([t for t in self._threads if t.is_alive()]) > self._target_workers:
+                        self._threads.remove(me)
+                        return
+                    job = self._next_job()
+                    if job is not None:
+                        break
+                    self._cond.wait()
+                if job is None:
+                    return
+                del self._pending[job.key]
+                self._busy_lanes[job.lane] = job.key[:2]
+            if job.future.set_running_or_notify_cancel():
+                try:
+                    outcome = job.fn()
+                except BaseException as exc:
+                    job.future.set_exception(exc)
+                else:
+                    if isinstance(outcome, Future):
+                        outcome.add_done_callback(lambda f, job=job: self._settle(job, f))
+                        continue
+                    job.future.set_result(outcome)
+            self._release(job)
+
+    def _settle(self, job: _Job, outcome: Future) -> None:
+        """Complete an asynchronous job from its inner future, then free its lane."""
+        try:
+            result = outcome.result()
+        except BaseException as exc:
+            job.future.set_exception(exc)
+        else:
+            job.future.set_result(result)
+        self._release(job)
+
+    def _release(self, job: _Job) -> None:
+        with self._cond:
+            del self._busy_lanes[job.lane]
+            # The lane is free again; a job waiting on it may now run.
+            self._cond.notify_all()
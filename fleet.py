@@ -0,0 +1,405 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from config import AppConfig, HostConfig
+from control import CommandResult, LogFn, RelayController, RemotePcController
+from executor import MANUAL, ActionExecutor
+from metrics import ACTION_SECONDS, ACTION_TIMEOUTS_TOTAL, ACTIONS_TOTAL, CONFIRM_SECONDS
+from powerstate import DOWN, UP, PowerStateCache
+from probe import reachable, wait_for_state
+from pulse import PulseTimeline, TimerHandle
+from sshpool import SshConnectionPool
+from wol import wake_on_lan
+
+
+ACTIONS = ("suspend", "wake", "toggle", "force-off")
+# State each action should leave the host in (True = up); toggle has no known outcome.
+CONFIRM_STATES = {"wake": True, "suspend": False, "force-off": False}
+
+# Per-host deadlines get their own timer thread so they never delay relay steps.
+DEADLINES = PulseTimeline("powerstack-deadlines")
+# Batch results are delivered here, off the timer threads. One thread serves
+# every host and batch, so its callbacks (logging, GUI updates) must not
+# block: anything slow goes to _SETUP or the caller's own workers.
+_RESULTS = ThreadPoolExecutor(max_workers=1, thread_name_prefix="powerstack-results")
+# Blocking work a result triggers, such as resolving a host for confirmation.
+_SETUP = ThreadPoolExecutor(max_workers=4, thread_name_prefix="powerstack-setup")
+
+
+def _finished(result: CommandResult) -> Future:
+    future: Future = Future()
+    future.set_result(result)
+    return future
+
+
+def _complete_from(future: Future, fn: Callable[[], Any]) -> None:
+    try:
+        future.set_result(fn())
+    except BaseException as exc:
+        future.set_exception(exc)
+
+
+@dataclass
+class HostResult:
+    host: str
+    result: CommandResult
+    elapsed: float
+    skipped: bool = False  # the planner found the host already in the target state
+
+
+@dataclass
+class FleetResult:
+    action: str
+    results: list[HostResult]
+
+    @property
+    def ok(self) -> bool:
+        return bool(self.results) and all(r.result.ok for r in self.results)
+
+    def summary(self) -> str:
+        if len(self.results) == 1:
+            return self.results[0].result.message
+        passed = sum(1 for r in self.results if r.result.ok)
+        return f"{self.action}: {passed}/{len(self.results)} hosts ok."
+
+    def to_command_result(self) -> CommandResult:
+        state_seconds = self.results[0].result.state_seconds if len(self.results) == 1 else None
+        return CommandResult(self.ok, self.summary(), state_seconds)
+
+
+class FleetController:
+    """Runs suspend/wake/toggle against a host/group selector.
+
+    Every host action goes through one ``ActionExecutor``: a fixed pool of
+    ``fleet.max_parallel`` workers, one action per host at a time, repeated
+    requests coalesced and manual actions ahead of scheduled ones.
+    """
+
+    def __init__(self, config: AppConfig, relay: RelayController | None, log: LogFn):
+        self.config = config
+        self.relay = relay
+        self.log = log
+        self.ssh_pool = SshConnectionPool(config.ssh, log)
+        self.executor = ActionExecutor(config.fleet.max_parallel)
+        self.power_states = PowerStateCache(config.planner.state_ttl_seconds)
+        self._relay_lock = threading.Lock()
+
+    def reconfigure(self, config: AppConfig) -> None:
+        self.config = config
+        self.power_states.ttl = config.planner.state_ttl_seconds
+        self.ssh_pool.reconfigure(config.ssh)
+        self.executor.resize(config.fleet.max_parallel)
+        # Re-open devices in place; dropping them would leave their pins claimed.
+        if self.relay is not None and self.relay.config != config.relay:
+            self.relay.reconfigure(config.relay)
+
+    def run(
+        self,
+        action: str,
+        selector: str = "",
+        priority: int = MANUAL,
+        confirm: bool | None = None,
+        force: bool = False,
+    ) -> FleetResult:
+        return self.submit(action, selector, priority, confirm, force).result()
+
+    def submit(
+        self,
+        action: str,
+        selector: str = "",
+        priority: int = MANUAL,
+        confirm: bool | None = None,
+        force: bool = False,
+    ) -> Future:
+        """Queue *action* for every selected host; the future yields a FleetResult.
+
+        With *confirm* (default: ``confirm.enabled``) each host's result waits
+        for the host to be seen up or down; see ``confirm``. Unless *force*
+        is set, hosts already in the action's target state are skipped; see
+        ``plan``. Done-callbacks may run on the shared results thread and
+        must not block; hand slow work (config saves, say) to another thread.
+        """
+        batch: Future = Future()
+        if action not in ACTIONS:
+            batch.set_result(
+                FleetResult(action, [HostResult("-", CommandResult(False, f"Unknown action: {action}"), 0.0)])
+            )
+            return batch
+        try:
+            hosts = self.config.resolve_targets(selector)
+        except ValueError as exc:
+            batch.set_result(FleetResult(action, [HostResult("-", CommandResult(False, str(exc)), 0.0)]))
+            return batch
+        if len(hosts) > 1:
+            self.log(f"Running {action} on {len(hosts)} hosts (max {self.config.fleet.max_parallel} in parallel).")
+        _Batch(self, action, hosts, batch, priority, confirm, force)
+        return batch
+
+    def prewarm(self, selector: str = "") -> int:
+        """Open pooled SSH connections to every selected host; returns how many are warm."""
+        hosts = [h for h in self.config.resolve_targets(selector) if h.host and h.user]
+        if not hosts:
+            return 0
+        workers = max(1, min(self.config.fleet.max_parallel, len(hosts)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return sum(pool.map(self.ssh_pool.warm, hosts))
+
+    def perform(self, action: str, host: HostConfig) -> Future:
+        """Start *action* on *host*; the future yields its CommandResult.
+
+        SSH and Wake-on-LAN run in the calling thread and return a finished
+        future; relay presses return at once and complete on the pulse timeline.
+        """
+        relay = self.config.relay
+        wake_mode = host.wake_mode or relay.wake_mode
+        if action == "wake" and wake_mode == "wol":
+            # A UDP broadcast: no relay channel is opened or held.
+            result = wake_on_lan(host, relay)
+            if result.ok or not relay.wol_fallback:
+                return _finished(result)
+            self.log(f"{host.name}: {result.message} Falling back to the relay pulse.")
+            wake_mode = "pulse"
+        remote = RemotePcController(self._get_relay(), self.log, self.ssh_pool, host.relay_pin)
+        if action == "suspend":
+            return _finished(remote.suspend(host))
+        if action == "force-off":
+            return remote.force_off(relay.force_off_seconds)
+        if action == "wake" and wake_mode != "toggle":
+            return remote.wake_via_power_button(relay.wake_pulse_seconds)
+        return remote.toggle_power(relay.toggle_pulse_seconds)
+
+    def plan(self, action: str, host: HostConfig) -> CommandResult | None:
+        """A result standing in for *action* when *host* is already where it would leave it.
+
+        Returns None when the action should run: toggle, planner disabled,
+        or the host's state is unknown or different.
+        """
+        want_up = CONFIRM_STATES.get(action)
+        if want_up is None or not self.config.planner.enabled:
+            return None
+        known = self.power_state(host)
+        if known is None:
+            return None
+        state, age, source = known
+        if (state == UP) != want_up:
+            return None
+        self.log(f"{host.name}: {action} skipped, host already {state} ({source}, {age:.0f}s ago); use --force to run it.")
+        return CommandResult(True, f"Already {state}; {action} skipped.")
+
+    def power_state(self, host: HostConfig) -> tuple[str, float, str] | None:
+        """(state, age, source) of *host* from the cache, else from a quick probe; None if unknown."""
+        known = self.power_states.get(host.name)
+        if known is not None or not host.host:
+            return known
+        up = reachable(host.host, self.config.confirm.port or host.port, self.config.planner.probe_timeout_seconds)
+        if not up:
+            # Silence proves nothing: a dropped SYN or a filtering firewall looks the same as a sleeping PC.
+            return None
+        self.power_states.set(host.name, UP, "probe")
+        return UP, 0.0, "probe"
+
+    def note_result(self, action: str, host: HostConfig, result: CommandResult) -> None:
+        """Feed an action's outcome into the power-state cache."""
+        want_up = CONFIRM_STATES.get(action)
+        if want_up is None or not result.ok:
+            # Toggles and failures leave the state unknown.
+            self.power_states.forget(host.name)
+            return
+        self.power_states.set(host.name, UP if want_up else DOWN, action)
+
+    def confirm(self, action: str, host: HostConfig, result: CommandResult) -> Future | None:
+        """Probe *host* after a successful *action*; the future yields the final CommandResult.
+
+        Returns None when there is nothing to confirm (toggle, a failed
+        action, or a host without an address). Resolving the host blocks, so
+        call this from a worker; the probes themselves run on the pulse
+        timeline, so waiting for a woken PC holds neither a worker nor a lane.
+        """
+        want_up = CONFIRM_STATES.get(action)
+        if want_up is None or not result.ok or not host.host:
+            return None
+        settings = self.config.confirm
+        timeout = settings.wake_timeout_seconds if want_up else settings.down_timeout_seconds
+        state = "ready" if want_up else "down"
+        confirmed: Future = Future()
+        try:
+            probe = wait_for_state(host.host, settings.port or host.port, want_up, timeout, settings)
+        except OSError as exc:
+            confirmed.set_result(CommandResult(False, f"{result.message} Could not probe {host.host}: {exc}"))
+            return confirmed
+
+        def _probed(job: Future) -> None:
+            try:
+                seconds = job.result()
+            except Exception as exc:
+                self.power_states.forget(host.name)
+                confirmed.set_result(CommandResult(False, f"{result.message} Could not probe {host.host}: {exc}"))
+                return
+            if seconds is None:
+                self.power_states.forget(host.name)
+                CONFIRM_SECONDS.observe(timeout, action=action, host=host.name, outcome="timeout")
+                confirmed.set_result(CommandResult(False, f"{result.message} Host not {state} after {timeout:.0f}s."))
+                return
+            self.power_states.set(host.name, UP if want_up else DOWN, "confirmed")
+            CONFIRM_SECONDS.observe(seconds, action=action, host=host.name, outcome="confirmed")
+            confirmed.set_result(CommandResult(True, f"{result.message} Host {state} after {seconds:.1f}s.", seconds))
+
+        probe.add_done_callback(_probed)
+        return confirmed
+
+    # ------------------------------------------------------------------
+    # internals
+    # ------------------------------------------------------------------
+
+    def _get_relay(self) -> RelayController:
+        # Fan-out workers race here; the GPIO device must only be opened once.
+        with self._relay_lock:
+            if self.relay is None:
+                # Created on first use so SSH-only runs never touch the GPIO hardware.
+                self.relay = RelayController(self.config.relay, self.log)
+            return self.relay
+
+
+class _Batch:
+    """Collects per-host results of one ``FleetController.submit`` call.
+
+    A host whose action runs longer than ``fleet.host_timeout_seconds`` is
+    reported as timed out so the batch completes; its worker finishes in the
+    background. Confirmation, if enabled, starts once the action has returned
+    and has its own deadline.
+    """
+
+    def __init__(
+        self,
+        fleet: FleetController,
+        action: str,
+        hosts: list[HostConfig],
+        future: Future,
+        priority: int,
+        confirm: bool | None = None,
+        force: bool = False,
+    ):
+        self.fleet = fleet
+        self.action = action
+        self.hosts = hosts
+        self.future = future
+        self.confirm = fleet.config.confirm.enabled if confirm is None else confirm
+        self.force = force
+        self.results: dict[str, HostResult] = {}
+        self._performed: set[str] = set()
+        self._lock = threading.Lock()
+        for host in hosts:
+            # A forced request must not merge into a queued one the planner may skip.
+            variant = "force" if force else ""
+            job = fleet.executor.submit(action, host.name, lambda h=host: self._perform(h), priority, variant)
+            job.add_done_callback(lambda f, h=host: self._job_done(h, f))
+
+    def _perform(self, host: HostConfig) -> HostResult:
+        started = time.monotonic()
+        skipped = None if self.force else self.fleet.plan(self.action, host)
+        if skipped is not None:
+            with self._lock:
+                self._performed.add(host.name)
+            ACTIONS_TOTAL.inc(action=self.action, host=host.name, outcome="skipped")
+            return HostResult(host.name, skipped, time.monotonic() - started, skipped=True)
+        timeout = self.fleet.config.fleet.host_timeout_seconds
+        deadline = None
+        if len(self.hosts) > 1 and timeout > 0:
+            deadline = DEADLINES.call_later(timeout, lambda: self._expire(host, started, timeout))
+        try:
+            pending = self.fleet.perform(self.action, host)
+        except Exception as exc:
+            pending = _finished(CommandResult(False, f"{self.action} failed: {exc}"))
+        if pending.done():
+            return self._performed_result(host, started, deadline, pending)
+        # A relay press: free this worker now and keep the host's lane until the
+        # press completes. Its bookkeeping then runs on the results thread, not
+        # on the pulse timeline.
+        done: Future = Future()
+        pending.add_done_callback(
+            lambda f: _RESULTS.submit(_complete_from, done, lambda: self._performed_result(host, started, deadline, f))
+        )
+        return done
+
+    def _performed_result(
+        self,
+        host: HostConfig,
+        started: float,
+        deadline: TimerHandle | None,
+        pending: Future,
+    ) -> HostResult:
+        if deadline is not None:
+            deadline.cancel()
+        try:
+            result = pending.result()
+        except Exception as exc:
+            result = CommandResult(False, f"{self.action} failed: {exc}")
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._performed.add(host.name)
+        self.fleet.note_result(self.action, host, result)
+        outcome = "ok" if result.ok else "error"
+        ACTIONS_TOTAL.inc(action=self.action, host=host.name, outcome=outcome)
+        ACTION_SECONDS.observe(elapsed, action=self.action, host=host.name, outcome=outcome)
+        return HostResult(host.name, result, elapsed)
+
+    def _expire(self, host: HostConfig, started: float, timeout: float) -> None:
+        with self._lock:
+            if host.name in self._performed or host.name in self.results:
+                return
+        ACTION_TIMEOUTS_TOTAL.inc(action=self.action, host=host.name)
+        self._record(HostResult(host.name, CommandResult(False, f"Timed out after {timeout:.0f}s."),
+                                time.monotonic() - started))
+
+    def _job_done(self, host: HostConfig, job: Future) -> None:
+        if job.cancelled():
+            ACTIONS_TOTAL.inc(action=self.action, host=host.name, outcome="cancelled")
+            self._record(HostResult(host.name, CommandResult(False, "Cancelled."), 0.0))
+            return
+        try:
+            result = job.result()
+        except Exception as exc:
+            result = HostResult(host.name, CommandResult(False, f"{self.action} failed: {exc}"), 0.0)
+        if self.confirm and not result.skipped:
+            # May run on the results thread; resolving the host name blocks.
+            _SETUP.submit(self._confirm, host, result)
+            return
+        # A coalesced job may carry another batch's host label; report it under ours.
+        self._record(HostResult(host.name, result.result, result.elapsed, result.skipped))
+
+    def _confirm(self, host: HostConfig, result: HostResult) -> None:
+        try:
+            confirmation = self.fleet.confirm(self.action, host, result.result)
+        except Exception as exc:
+            confirmation = _finished(CommandResult(False, f"{result.result.message} Could not probe: {exc}"))
+        if confirmation is None:
+            self._record(HostResult(host.name, result.result, result.elapsed))
+            return
+        started = time.monotonic()
+        confirmation.add_done_callback(
+            lambda f: self._record(HostResult(host.name, f.result(), result.elapsed + time.monotonic() - started))
+        )
+
+    def _record(self, result: HostResult) -> None:
+        with self._lock:
+            if result.host in self.results or self.future.done():
+                return
+            self.results[result.host] = result
+            if len(self.results) < len(self.hosts):
+                return
+            ordered = [self.results[h.name] for h in self.hosts]
+        # The last result may arrive on the pulse timeline (confirmations) or
+        # the deadline thread (timeouts); complete the batch off both.
+        _RESULTS.submit(self._complete, ordered)
+
+    def _complete(self, ordered: list[HostResult]) -> None:
+        if len(ordered) > 1:
+            for r in ordered:
+                level = "OK" if r.result.ok else "ERROR"
+                self.fleet.log(f"[{level}] {r.host}: {r.result.message} ({r.elapsed:.1f}s)")
+        self.future.set_result(FleetResult(self.action, ordered))
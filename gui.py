@@ -1,14 +1,26 @@
 from __future__ import annotations
 
 import queue
+import threading
 import uuid
-from datetime import datetime, timedelta
+from collections import deque
+from dataclasses import replace
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Any, Callable
 import tkinter as tk
 from tkinter import messagebox, ttk
 
-from config import AppConfig, RelayConfig, ScheduleEvent
-from control import RelayController, RemotePcController, run_async
-from cron import CronManager
+from agenda import CLASH, ConflictIndex
+from config import CONFIG_PATH, WAKE_MODES, AppConfig, RelayConfig, ScheduleEvent
+from control import CommandResult, RelayController, RemotePcController
+from cron import SYNC_DRIFT, SYNC_SKIPPED, CronManager
+from executor import MANUAL
+from fleet import FleetController
+from metrics import METRICS
+from schedule import ScheduleIndex
+from watch import FileWatcher
+from wol import parse_mac
 
 
 WEEKDAY_LABELS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
@@ -28,12 +40,21 @@ class PowerStackApp:
         self.root.geometry("1040x720")
 
         self.config = AppConfig.load()
+        self.index = ScheduleIndex(self.config.schedule)
+        self._conflicts: ConflictIndex | None = None  # built on the first added event
         self.log_queue: queue.Queue[str] = queue.Queue()
-        self.log_history: list[str] = []
+        self.log_history: deque[str] = deque(maxlen=max(1, self.config.gui.log_history_lines))
+        # Drains are scheduled on demand by _log; only a non-threaded Tcl,
+        # which cannot take calls from worker threads, falls back to polling.
+        self._log_drain_pending = False
+        self._log_drain_lock = threading.Lock()
+        self._log_polling = not bool(self.root.tk.call("info", "exists", "tcl_platform(threaded)"))
 
         self.relay = RelayController(self.config.relay, self._log)
         self.remote = RemotePcController(self.relay, self._log)
-        self.cron = CronManager()
+        self.fleet = FleetController(self.config, self.relay, self._log)
+        self.cron = CronManager.from_config(self.config)
+        self._apply_metrics_config()
 
         self.selected_event_id: str | None = None
 
@@ -43,36 +64,44 @@ class PowerStackApp:
 
         self.logs_text: tk.Text | None = None
         self.main_status_var = tk.StringVar(value="Ready")
+        self.queue_depth_var = tk.StringVar(value="Queued: 0   Running: 0")
+        self.queue_running_var = tk.StringVar(value="Idle")
         self.selected_label_var = tk.StringVar(value="None selected")
         self.selected_status_var = tk.StringVar(value="-")
         self.selected_next_var = tk.StringVar(value="-")
 
         self.main_schedule_table: ttk.Treeview | None = None
+        # Per-table {event id: (values, tag)} of what each row currently shows.
+        self._row_fingerprints: dict[str, dict[str, tuple[tuple[str, ...], str]]] = {}
+        self._config_watcher: FileWatcher | None = None
+        self._config_change_pending = threading.Event()
 
         self._build_vars()
         self._build_main_ui()
         self._refresh_schedule_tables()
 
         self._sync_crontab()
+        self._start_config_watch()
         self._drain_log_queue()
+        self._poll_action_queue()
         self.root.protocol("WM_DELETE_WINDOW", self._on_close)
 
     def _build_vars(self) -> None:
-        r = self.config.remote
-        relay = self.config.relay
-        self.host_var = tk.StringVar(value=r.host)
-        self.user_var = tk.StringVar(value=r.user)
-        self.port_var = tk.StringVar(value=str(r.port))
-        self.key_var = tk.StringVar(value=r.ssh_key_path)
-        self.suspend_cmd_var = tk.StringVar(value=r.suspend_command)
-
-        self.gpio_pin_var = tk.StringVar(value=str(relay.gpio_pin))
-        self.relay_channel_var = tk.StringVar(value=self._channel_label_for_pin(relay.gpio_pin))
-        self.active_high_var = tk.BooleanVar(value=relay.active_high)
-        self.wake_mode_var = tk.StringVar(value=relay.wake_mode)
-        self.wake_pulse_var = tk.StringVar(value=str(relay.wake_pulse_seconds))
-        self.toggle_pulse_var = tk.StringVar(value=str(relay.toggle_pulse_seconds))
-        self.holdoff_var = tk.StringVar(value=str(relay.holdoff_seconds))
+        self.host_var = tk.StringVar()
+        self.user_var = tk.StringVar()
+        self.port_var = tk.StringVar()
+        self.key_var = tk.StringVar()
+        self.suspend_cmd_var = tk.StringVar()
+        self.mac_var = tk.StringVar()
+
+        self.gpio_pin_var = tk.StringVar()
+        self.relay_channel_var = tk.StringVar()
+        self.active_high_var = tk.BooleanVar()
+        self.wake_mode_var = tk.StringVar()
+        self.wake_pulse_var = tk.StringVar()
+        self.toggle_pulse_var = tk.StringVar()
+        self.holdoff_var = tk.StringVar()
+        self._load_settings_vars()
 
         self.event_label_var = tk.StringVar(value="")
         self.event_action_var = tk.StringVar(value="suspend")
@@ -80,11 +109,32 @@ class PowerStackApp:
         self.event_date_var = tk.StringVar(value=datetime.now().strftime("%Y-%m-%d"))
         self.event_time_var = tk.StringVar(value=datetime.now().strftime("%H:%M"))
         self.event_enabled_var = tk.BooleanVar(value=True)
+        self.event_target_var = tk.StringVar(value="all")
+        self.action_target_var = tk.StringVar(value="all")
         self.weekday_vars = [tk.BooleanVar(value=True) for _ in range(7)]
 
         self.event_date_entry: ttk.Entry | None = None
         self.days_frame: ttk.Frame | None = None
 
+    def _load_settings_vars(self) -> None:
+        """Show the current remote/relay settings in the Suspend Config form."""
+        r = self.config.remote
+        relay = self.config.relay
+        self.host_var.set(r.host)
+        self.user_var.set(r.user)
+        self.port_var.set(str(r.port))
+        self.key_var.set(r.ssh_key_path)
+        self.suspend_cmd_var.set(r.suspend_command)
+        self.mac_var.set(r.mac)
+
+        self.gpio_pin_var.set(str(relay.gpio_pin))
+        self.relay_channel_var.set(self._channel_label_for_pin(relay.gpio_pin))
+        self.active_high_var.set(relay.active_high)
+        self.wake_mode_var.set(relay.wake_mode)
+        self.wake_pulse_var.set(str(relay.wake_pulse_seconds))
+        self.toggle_pulse_var.set(str(relay.toggle_pulse_seconds))
+        self.holdoff_var.set(str(relay.holdoff_seconds))
+
     def _build_main_ui(self) -> None:
         main = ttk.Frame(self.root, padding=12)
         main.pack(fill="both", expand=True)
@@ -115,13 +165,36 @@ class PowerStackApp:
 
         system_card = ttk.LabelFrame(left_rail, text="System")
         system_card.pack(fill="x", pady=(0, 8))
-        ttk.Button(system_card, text="Suspend Now", command=lambda: self._run_action("suspend")).pack(
-            fill="x", padx=8, pady=(8, 4)
+        ttk.Label(system_card, text="Target").pack(anchor="w", padx=8, pady=(8, 2))
+        self.action_target_combo = ttk.Combobox(
+            system_card,
+            textvariable=self.action_target_var,
+            values=self._target_choices(),
         )
-        ttk.Button(system_card, text="Wake Now", command=lambda: self._run_action("wake")).pack(
-            fill="x", padx=8, pady=(0, 8)
+        self.action_target_combo.pack(fill="x", padx=8, pady=(0, 8))
+        ttk.Button(
+            system_card,
+            text="Suspend Now",
+            command=lambda: self._run_action("suspend", self.action_target_var.get()),
+        ).pack(fill="x", padx=8, pady=(0, 4))
+        ttk.Button(
+            system_card,
+            text="Wake Now",
+            command=lambda: self._run_action("wake", self.action_target_var.get()),
+        ).pack(fill="x", padx=8, pady=(0, 8))
+        ttk.Button(
+            system_card,
+            text="Toggle Power",
+            command=lambda: self._run_action("toggle", self.action_target_var.get()),
+        ).pack(fill="x", padx=8, pady=(0, 8))
+
+        queue_card = ttk.LabelFrame(left_rail, text="Action Queue")
+        queue_card.pack(fill="x", pady=(0, 8))
+        ttk.Label(queue_card, textvariable=self.queue_depth_var).pack(anchor="w", padx=8, pady=(8, 2))
+        ttk.Label(queue_card, textvariable=self.queue_running_var, justify="left").pack(
+            anchor="w", padx=8, pady=(2, 4)
         )
-        ttk.Button(system_card, text="Toggle Power", command=lambda: self._run_action("toggle")).pack(
+        ttk.Button(queue_card, text="Cancel Queued", command=self._cancel_queued_actions).pack(
             fill="x", padx=8, pady=(0, 8)
         )
 
@@ -173,13 +246,14 @@ class PowerStackApp:
     def _create_schedule_table(self, parent: tk.Widget) -> ttk.Treeview:
         table = ttk.Treeview(
             parent,
-            columns=("label", "action", "time", "when", "next", "status"),
+            columns=("label", "action", "target", "time", "when", "next", "status"),
             show="headings",
             selectmode="browse",
         )
         specs = [
             ("label", "Label", 220),
             ("action", "Action", 80),
+            ("target", "Target", 100),
             ("time", "Time", 70),
             ("when", "When", 190),
             ("next", "Next Run", 160),
@@ -202,7 +276,7 @@ class PowerStackApp:
         win = tk.Toplevel(self.root)
         self.suspend_config_window = win
         win.title("Suspend Config")
-        win.geometry("760x320")
+        win.geometry("760x350")
         win.protocol("WM_DELETE_WINDOW", self._close_suspend_config_window)
 
         frame = ttk.Frame(win, padding=12)
@@ -219,6 +293,7 @@ class PowerStackApp:
             ("Wake On (s)", self.wake_pulse_var),
             ("Holdoff (s)", self.holdoff_var),
             ("Toggle On (s)", self.toggle_pulse_var),
+            ("MAC (WoL)", self.mac_var),
         ]
 
         for idx, (label, var) in enumerate(items):
@@ -227,7 +302,7 @@ class PowerStackApp:
             ttk.Label(frame, text=label).grid(row=row, column=col, sticky="w", padx=4, pady=4)
             ttk.Entry(frame, textvariable=var).grid(row=row, column=col + 1, sticky="ew", padx=4, pady=4)
 
-        row_base = 4
+        row_base = (len(items) + 1) // 2
         ttk.Label(frame, text="Relay Channel").grid(row=row_base, column=0, sticky="w", padx=4, pady=4)
         channel_combo = ttk.Combobox(
             frame,
@@ -248,7 +323,7 @@ class PowerStackApp:
         ttk.Combobox(
             frame,
             textvariable=self.wake_mode_var,
-            values=["pulse", "toggle"],
+            values=list(WAKE_MODES),
             state="readonly",
         ).grid(row=row_base + 1, column=3, sticky="ew", padx=4, pady=4)
 
@@ -266,7 +341,7 @@ class PowerStackApp:
         win = tk.Toplevel(self.root)
         self.schedule_config_window = win
         win.title("Add Schedule Event")
-        win.geometry("420x430")
+        win.geometry("420x470")
         win.protocol("WM_DELETE_WINDOW", self._close_schedule_config_window)
 
         frame = ttk.Frame(win, padding=12)
@@ -301,23 +376,30 @@ class PowerStackApp:
         self.event_date_entry = ttk.Entry(form, textvariable=self.event_date_var)
         self.event_date_entry.grid(row=3, column=1, sticky="ew", padx=4, pady=4)
 
-        ttk.Label(form, text="Time (HH:MM)").grid(row=4, column=0, sticky="w", padx=4, pady=4)
+        ttk.Label(form, text="Time (HH:MM[:SS])").grid(row=4, column=0, sticky="w", padx=4, pady=4)
         ttk.Entry(form, textvariable=self.event_time_var).grid(row=4, column=1, sticky="ew", padx=4, pady=4)
 
+        ttk.Label(form, text="Target").grid(row=5, column=0, sticky="w", padx=4, pady=4)
+        ttk.Combobox(
+            form,
+            textvariable=self.event_target_var,
+            values=self._target_choices(),
+        ).grid(row=5, column=1, sticky="ew", padx=4, pady=4)
+
         ttk.Checkbutton(form, text="Enabled", variable=self.event_enabled_var).grid(
-            row=5, column=0, columnspan=2, sticky="w", padx=4, pady=4
+            row=6, column=0, columnspan=2, sticky="w", padx=4, pady=4
         )
 
-        ttk.Label(form, text="Weekdays").grid(row=6, column=0, sticky="nw", padx=4, pady=4)
+        ttk.Label(form, text="Weekdays").grid(row=7, column=0, sticky="nw", padx=4, pady=4)
         self.days_frame = ttk.Frame(form)
-        self.days_frame.grid(row=6, column=1, sticky="w", padx=4, pady=4)
+        self.days_frame.grid(row=7, column=1, sticky="w", padx=4, pady=4)
         for i, label in enumerate(WEEKDAY_LABELS):
             ttk.Checkbutton(self.days_frame, text=label, variable=self.weekday_vars[i]).grid(
                 row=i // 3, column=i % 3, sticky="w", padx=2, pady=2
             )
 
         form_buttons = ttk.Frame(form)
-        form_buttons.grid(row=7, column=0, columnspan=2, sticky="ew", padx=4, pady=8)
+        form_buttons.grid(row=8, column=0, columnspan=2, sticky="ew", padx=4, pady=8)
         ttk.Button(form_buttons, text="New/Clear", command=self._reset_event_form).pack(side="left")
         ttk.Button(form_buttons, text="Add Event", command=self._add_event).pack(side="right")
 
@@ -347,8 +429,9 @@ class PowerStackApp:
         scroll.grid(row=0, column=1, sticky="ns")
         self.logs_text.configure(yscrollcommand=scroll.set)
 
-        for line in self.log_history:
-            self.logs_text.insert("end", line + "\n")
+        backlog = list(self.log_history)[-max(1, self.config.gui.log_view_max_lines):]
+        if backlog:
+            self.logs_text.insert("end", "\n".join(backlog) + "\n")
         self.logs_text.see("end")
 
     def _close_suspend_config_window(self) -> None:
@@ -376,8 +459,13 @@ class PowerStackApp:
             self.config.remote.port = int(self.port_var.get().strip())
             self.config.remote.ssh_key_path = self.key_var.get().strip()
             self.config.remote.suspend_command = self.suspend_cmd_var.get().strip() or "systemctl suspend"
+            mac = self.mac_var.get().strip()
+            if mac:
+                parse_mac(mac)
+            self.config.remote.mac = mac
             self.config.relay = self._relay_config_from_form()
             self.relay.reconfigure(self.config.relay)
+            self.fleet.reconfigure(self.config)
             self.config.save()
             self._log("Settings saved.")
         except ValueError as exc:
@@ -400,9 +488,10 @@ class PowerStackApp:
     def _relay_config_from_form(self) -> RelayConfig:
         self._apply_channel_selection_to_gpio_pin()
         wake_mode = self.wake_mode_var.get().strip() or "pulse"
-        if wake_mode not in {"pulse", "toggle"}:
-            raise ValueError("Wake Mode must be 'pulse' or 'toggle'.")
-        return RelayConfig(
+        if wake_mode not in WAKE_MODES:
+            raise ValueError("Wake Mode must be 'pulse', 'toggle' or 'wol'.")
+        return replace(
+            self.config.relay,
             gpio_pin=int(self.gpio_pin_var.get().strip()),
             active_high=bool(self.active_high_var.get()),
             wake_mode=wake_mode,
@@ -416,46 +505,92 @@ class PowerStackApp:
             temp_config = self._relay_config_from_form()
             self.relay.reconfigure(temp_config)
             if temp_config.wake_mode == "toggle":
-                run_async(lambda: self.remote.toggle_power(temp_config.toggle_pulse_seconds), self._log)
+                test = lambda: self.remote.toggle_power(temp_config.toggle_pulse_seconds)
             else:
-                run_async(lambda: self.remote.wake_via_power_button(temp_config.wake_pulse_seconds), self._log)
+                test = lambda: self.remote.wake_via_power_button(temp_config.wake_pulse_seconds)
+            job = self.fleet.executor.submit("relay-test", f"relay:{temp_config.gpio_pin}", test, MANUAL)
+            job.add_done_callback(lambda f: self._log_job_result(f, lambda r: r))
             self._log("Testing relay with current form settings (not saved).")
         except ValueError as exc:
             messagebox.showerror("Invalid relay settings", str(exc))
 
-    def _run_action(self, action: str) -> None:
-        if action == "suspend":
-            run_async(lambda: self.remote.suspend(self.config.remote), self._log)
-        elif action == "wake":
-            if self.config.relay.wake_mode == "toggle":
-                run_async(
-                    lambda: self.remote.toggle_power(self.config.relay.toggle_pulse_seconds),
-                    self._log,
-                )
-            else:
-                run_async(
-                    lambda: self.remote.wake_via_power_button(self.config.relay.wake_pulse_seconds),
-                    self._log,
-                )
-        elif action == "toggle":
-            run_async(
-                lambda: self.remote.toggle_power(self.config.relay.toggle_pulse_seconds),
-                self._log,
-            )
-        else:
+    def _target_choices(self) -> list[str]:
+        return ["all", *(h.name for h in self.config.fleet_hosts()), *self.config.groups]
+
+    def _run_action(self, action: str, target: str = "") -> None:
+        if action not in {"suspend", "wake", "toggle"}:
             self._log(f"[ERROR] Unknown action: {action}")
+            return
+        target = target.strip()
+        job = self.fleet.submit(action, target, MANUAL)
+        job.add_done_callback(lambda f: self._log_job_result(f, lambda r: r.to_command_result()))
+        self._refresh_action_queue()
+
+    def _log_job_result(self, job: Future, to_result: Callable[[Any], CommandResult]) -> None:
+        # Runs on an executor worker; _log is safe to call from any thread.
+        if job.cancelled():
+            self._log("Queued action cancelled.")
+            return
+        try:
+            result = to_result(job.result())
+        except Exception as exc:
+            self._log(f"[ERROR] Action failed: {exc}")
+            return
+        level = "OK" if result.ok else "ERROR"
+        self._log(f"[{level}] {result.message}")
+
+    def _cancel_queued_actions(self) -> None:
+        cancelled = self.fleet.executor.cancel_pending()
+        self._log(f"Cancelled {cancelled} queued action(s).")
+        self._refresh_action_queue()
+
+    def _refresh_action_queue(self) -> None:
+        queued, running = self.fleet.executor.stats()
+        depth = f"Queued: {queued}   Running: {len(running)}"
+        detail = "\n".join(f"{action} @ {host}" for action, host in running[:6]) or "Idle"
+        if len(running) > 6:
+            detail += f"\n+{len(running) - 6} more"
+        if self.queue_depth_var.get() != depth:
+            self.queue_depth_var.set(depth)
+        if self.queue_running_var.get() != detail:
+            self.queue_running_var.set(detail)
+
+    def _poll_action_queue(self) -> None:
+        self._refresh_action_queue()
+        self._apply_config_change()
+        self.root.after(500, self._poll_action_queue)
 
     def _add_event(self) -> None:
         event = self._event_from_form()
         if event is None:
             return
         event.id = str(uuid.uuid4())
+        if event.enabled and self.config.agenda.reject_conflicts:
+            conflicts = self._conflict_index().conflicts(event)
+            clashes = [c for c in conflicts if c.kind == CLASH]
+            if clashes and not messagebox.askyesno(
+                "Schedule conflict",
+                "\n".join(c.text() for c in clashes[:8]) + "\n\nAdd the event anyway?",
+                default=messagebox.NO,
+            ):
+                return
+            for conflict in conflicts:
+                if conflict.kind != CLASH:
+                    self._log(f"[WARN] {conflict.text()}")
         self.config.schedule.append(event)
+        self.index.update(event)
+        if self._conflicts is not None:
+            self._conflicts.add(event)
         self._persist_schedule_changes()
         self._refresh_schedule_tables()
         self._reset_event_form()
         self._log(f"Added schedule event '{event.label}'.")
 
+    def _conflict_index(self) -> ConflictIndex:
+        if self._conflicts is None or self._conflicts.stale(self.config):
+            self._conflicts = ConflictIndex(self.config)
+        return self._conflicts
+
     def _delete_selected_event(self) -> None:
         event_id = self.selected_event_id
         if not event_id:
@@ -465,6 +600,9 @@ class PowerStackApp:
         self.config.schedule = [e for e in self.config.schedule if e.id != event_id]
         if len(self.config.schedule) == before:
             return
+        self.index.remove(event_id)
+        if self._conflicts is not None:
+            self._conflicts.remove(event_id)
         self.selected_event_id = None
         self._persist_schedule_changes()
         self._refresh_schedule_tables()
@@ -494,7 +632,7 @@ class PowerStackApp:
         for event in self.config.schedule:
             if event.id == event_id:
                 self._log(f"Running selected event now: '{event.label}' ({event.action}).")
-                self._run_action(event.action)
+                self._run_action(event.action, event.target)
                 if event.recurrence == "once":
                     self.root.after(0, lambda eid=event.id: self._auto_disable_one_time_event(eid))
                 return
@@ -525,6 +663,7 @@ class PowerStackApp:
             self.event_date_var.set(event.date_ymd or datetime.now().strftime("%Y-%m-%d"))
             self.event_time_var.set(event.time_hhmm)
             self.event_enabled_var.set(event.enabled)
+            self.event_target_var.set(event.target or "all")
             for i, var in enumerate(self.weekday_vars):
                 var.set(i in event.weekdays)
             self._update_event_form_mode()
@@ -534,7 +673,7 @@ class PowerStackApp:
         recurrence = self.event_recurrence_var.get().strip()
         time_text = self.event_time_var.get().strip()
         if not self._valid_hhmm(time_text):
-            messagebox.showerror("Invalid time", "Time must be HH:MM (24-hour).")
+            messagebox.showerror("Invalid time", "Time must be HH:MM or HH:MM:SS (24-hour).")
             return None
         if recurrence not in {"weekly", "once"}:
             messagebox.showerror("Invalid recurrence", "Recurrence must be 'weekly' or 'once'.")
@@ -554,6 +693,15 @@ class PowerStackApp:
                 return None
             date_ymd = ""
 
+        target = self.event_target_var.get().strip()
+        if target == "all":
+            target = ""
+        try:
+            self.config.resolve_targets(target)
+        except ValueError as exc:
+            messagebox.showerror("Invalid target", str(exc))
+            return None
+
         return ScheduleEvent(
             id=str(uuid.uuid4()),
             label=self.event_label_var.get().strip() or f"{self.event_action_var.get()} {time_text}",
@@ -563,6 +711,7 @@ class PowerStackApp:
             date_ymd=date_ymd,
             weekdays=weekdays,
             enabled=bool(self.event_enabled_var.get()),
+            target=target,
         )
 
     def _reset_event_form(self) -> None:
@@ -574,6 +723,7 @@ class PowerStackApp:
         self.event_date_var.set(datetime.now().strftime("%Y-%m-%d"))
         self.event_time_var.set(datetime.now().strftime("%H:%M"))
         self.event_enabled_var.set(True)
+        self.event_target_var.set("all")
         for var in self.weekday_vars:
             var.set(True)
         self._update_event_form_mode()
@@ -605,26 +755,48 @@ class PowerStackApp:
             self._clear_selected_summary()
 
     def _populate_schedule_table(self, table: ttk.Treeview | None) -> None:
+        """Bring *table* in line with the schedule, touching only rows that changed.
+
+        Rows are diffed against the fingerprint of what they currently show,
+        so a single add/delete/enable costs one Treeview operation instead of
+        a full rebuild, and selection and scroll position are left alone.
+        """
         if table is None:
             return
-        for item in table.get_children():
-            table.delete(item)
-
+        now = datetime.now()
+        wanted: dict[str, tuple[tuple[str, ...], str]] = {}
         for event in self.config.schedule:
-            when_text = self._event_when_text(event)
-            next_text = self._event_next_run_text(event)
-            status = self._event_status_text(event)
-            tag = self._event_status_tag(status)
-            table.insert(
-                "",
-                "end",
-                iid=event.id,
-                values=(event.label, event.action, event.time_hhmm, when_text, next_text, status),
-                tags=(tag,),
+            status = self._event_status_text(event, now)
+            values = (
+                event.label,
+                event.action,
+                event.target or "all",
+                event.time_hhmm,
+                self._event_when_text(event),
+                self._event_next_run_text(event, now),
+                status,
             )
-
-        if self.selected_event_id and table.exists(self.selected_event_id):
-            table.selection_set(self.selected_event_id)
+            wanted[event.id] = (values, self._event_status_tag(status))
+
+        shown = self._row_fingerprints.get(str(table), {})
+        stale = [iid for iid in shown if iid not in wanted]
+        if stale:
+            table.delete(*stale)
+        for position, (iid, fingerprint) in enumerate(wanted.items()):
+            previous = shown.get(iid)
+            values, tag = fingerprint
+            if previous is None:
+                table.insert("", position, iid=iid, values=values, tags=(tag,))
+            elif previous != fingerprint:
+                table.item(iid, values=values, tags=(tag,))
+        if list(table.get_children()) != list(wanted):
+            for position, iid in enumerate(wanted):
+                table.move(iid, "", position)
+        self._row_fingerprints[str(table)] = wanted
+
+        selected = self.selected_event_id
+        if selected and table.exists(selected) and table.selection() != (selected,):
+            table.selection_set(selected)
 
     def _update_selected_summary(self, event_id: str) -> None:
         for event in self.config.schedule:
@@ -646,39 +818,19 @@ class PowerStackApp:
             return f"Once {event.date_ymd}"
         return ",".join(WEEKDAY_LABELS[d] for d in event.weekdays)
 
-    def _event_next_run_text(self, event: ScheduleEvent) -> str:
+    def _event_next_run_text(self, event: ScheduleEvent, now: datetime | None = None) -> str:
         if not event.enabled:
             return "-"
-        now = datetime.now()
+        next_run = self.index.next_run(event, now)
         if event.recurrence == "once":
-            try:
-                target = datetime.strptime(f"{event.date_ymd} {event.time_hhmm}", "%Y-%m-%d %H:%M")
-            except ValueError:
-                return "Invalid date/time"
-            return "Past due" if target < now else target.strftime("%Y-%m-%d %H:%M")
-
-        next_run = self._next_weekly_run(now, event)
+            if next_run is not None:
+                return next_run.strftime("%Y-%m-%d %H:%M")
+            compiled = self.index.get(event.id)
+            return "Past due" if compiled is not None and compiled.valid else "Invalid date/time"
         return next_run.strftime("%a %Y-%m-%d %H:%M") if next_run else "-"
 
-    def _next_weekly_run(self, now: datetime, event: ScheduleEvent) -> datetime | None:
-        if not event.weekdays or not self._valid_hhmm(event.time_hhmm):
-            return None
-        hh, mm = [int(part) for part in event.time_hhmm.split(":")]
-        for offset in range(0, 8):
-            candidate_day = now + timedelta(days=offset)
-            if candidate_day.weekday() not in event.weekdays:
-                continue
-            candidate = candidate_day.replace(hour=hh, minute=mm, second=0, microsecond=0)
-            if candidate >= now:
-                return candidate
-        return None
-
-    def _event_status_text(self, event: ScheduleEvent) -> str:
-        if event.enabled:
-            return "Enabled"
-        if event.recurrence == "once" and event.date_ymd and self._one_time_event_has_passed(event):
-            return "Completed"
-        return "Paused"
+    def _event_status_text(self, event: ScheduleEvent, now: datetime | None = None) -> str:
+        return self.index.status(event, now)
 
     def _event_status_tag(self, status: str) -> str:
         if status == "Enabled":
@@ -698,23 +850,17 @@ class PowerStackApp:
                 self._log(f"Auto-disabled one-time event '{event.label}' after firing.")
                 return
 
-    def _one_time_event_has_passed(self, event: ScheduleEvent) -> bool:
-        try:
-            scheduled = datetime.strptime(f"{event.date_ymd} {event.time_hhmm}", "%Y-%m-%d %H:%M")
-        except ValueError:
-            return False
-        return datetime.now() >= scheduled
-
     def _valid_hhmm(self, value: str) -> bool:
         parts = value.split(":")
-        if len(parts) != 2:
+        if len(parts) not in (2, 3):
             return False
         try:
             hh = int(parts[0])
             mm = int(parts[1])
+            ss = int(parts[2]) if len(parts) == 3 else 0
         except ValueError:
             return False
-        return 0 <= hh <= 23 and 0 <= mm <= 59
+        return 0 <= hh <= 23 and 0 <= mm <= 59 and 0 <= ss <= 59
 
     def _valid_ymd(self, value: str) -> bool:
         try:
@@ -726,34 +872,145 @@ class PowerStackApp:
     def _log(self, message: str) -> None:
         stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.log_queue.put(f"[{stamp}] {message}")
+        self._request_log_drain()
+
+    def _request_log_drain(self) -> None:
+        with self._log_drain_lock:
+            if self._log_drain_pending or self._log_polling:
+                return
+            self._log_drain_pending = True
+        try:
+            # Threaded Tcl marshals this onto the Tk thread, whichever thread logs.
+            self.root.after(0, self._drain_log_queue)
+        except (RuntimeError, tk.TclError):
+            with self._log_drain_lock:
+                self._log_drain_pending = False
 
     def _drain_log_queue(self) -> None:
+        with self._log_drain_lock:
+            self._log_drain_pending = False
+        lines: list[str] = []
         try:
             while True:
-                line = self.log_queue.get_nowait()
-                self.log_history.append(line)
-                self.main_status_var.set(line)
-                if self.logs_text is not None and self.logs_window and self.logs_window.winfo_exists():
-                    self.logs_text.insert("end", line + "\n")
-                    self.logs_text.see("end")
+                lines.append(self.log_queue.get_nowait())
         except queue.Empty:
             pass
-        self.root.after(200, self._drain_log_queue)
+        if lines:
+            self.log_history.extend(lines)
+            self.main_status_var.set(lines[-1])
+            if self.logs_text is not None and self.logs_window and self.logs_window.winfo_exists():
+                self.logs_text.insert("end", "\n".join(lines) + "\n")
+                self._trim_log_view()
+                self.logs_text.see("end")
+        if self._log_polling:
+            self.root.after(200, self._drain_log_queue)
+
+    def _trim_log_view(self) -> None:
+        if self.logs_text is None:
+            return
+        # "end-1c" sits on the empty line after the final newline.
+        line_count = int(self.logs_text.index("end-1c").split(".")[0]) - 1
+        excess = line_count - max(1, self.config.gui.log_view_max_lines)
+        if excess > 0:
+            self.logs_text.delete("1.0", f"{excess + 1}.0")
+
+    def _sync_crontab(self, verify: bool = False) -> None:
+        # Rapid edits collapse into one crontab rewrite, off the Tk thread.
+        self.cron.sync_later(self.config.schedule, self._on_crontab_synced, verify=verify)
+
+    def _on_crontab_synced(self, outcome: str | None, error: Exception | None) -> None:
+        if error is not None:
+            self._log(f"[WARN] Crontab sync failed: {error}")
+        elif outcome == SYNC_DRIFT:
+            self._log("[WARN] PowerStack crontab block was edited outside PowerStack; rewrote it.")
+        elif outcome == SYNC_SKIPPED:
+            self._log("Crontab already up to date.")
+        else:
+            self._log("Crontab synced.")
 
-    def _sync_crontab(self) -> None:
+    def _reload_config(self, external: bool = False) -> None:
+        """Adopt the config on disk, updating only the parts that changed.
+
+        An unchanged file (same mtime, size and inode) is not re-read. The
+        Refresh button (*external* False) always re-syncs the crontab and
+        reads it back to catch outside edits; a change reported by the
+        watcher only does so when the schedule or scheduler settings
+        changed, since the CLI or cron run that wrote the file has
+        normally synced already.
+        """
         try:
-            self.cron.sync(self.config.schedule)
-            self._log("Crontab synced.")
+            config = AppConfig.reload(self.config)
         except Exception as exc:
-            self._log(f"[WARN] Crontab sync failed: {exc}")
+            self._log(f"[WARN] Config reload failed, keeping the current settings: {exc}")
+            return
+        if config is self.config:
+            if not external:
+                self._sync_crontab(verify=True)
+                self._log("Config unchanged on disk.")
+            return
+        previous, self.config = self.config, config
+        schedule_changed = config.schedule != previous.schedule
+        if schedule_changed:
+            self.index = ScheduleIndex(config.schedule)
+            self._refresh_schedule_tables()
+        history_lines = max(1, config.gui.log_history_lines)
+        if self.log_history.maxlen != history_lines:
+            self.log_history = deque(self.log_history, maxlen=history_lines)
+        self.fleet.reconfigure(config)
+        self.cron.apply_config(config)
+        if config.metrics != previous.metrics:
+            self._apply_metrics_config()
+        if (config.hosts, config.groups, config.remote) != (previous.hosts, previous.groups, previous.remote):
+            self.action_target_combo.configure(values=self._target_choices())
+        if (config.remote, config.relay) != (previous.remote, previous.relay):
+            self._load_settings_vars()
+        if self._config_watcher is not None:
+            self._config_watcher.set_paths(config.watched_paths(CONFIG_PATH))
+        if not external or schedule_changed or config.scheduler != previous.scheduler:
+            self._sync_crontab(verify=not external)
+        self._log("Config changed on disk; applied." if external else "Config reloaded from disk.")
+
+    def _start_config_watch(self) -> None:
+        if not self.config.gui.watch_config:
+            return
+        self._config_watcher = FileWatcher(
+            self.config.watched_paths(CONFIG_PATH),
+            self._on_config_file_changed,
+            lambda: self.config.stamp(CONFIG_PATH),
+            self.config.gui.watch_poll_seconds,
+            log=self._log,
+        )
+        mode = self._config_watcher.start()
+        self._log(f"Watching config for external changes ({mode}).")
+
+    def _on_config_file_changed(self) -> None:
+        # Runs on the watcher thread; the reload itself happens on the Tk thread.
+        self._config_change_pending.set()
+        if self._log_polling:
+            return  # picked up by _poll_action_queue
+        try:
+            self.root.after(0, self._apply_config_change)
+        except (RuntimeError, tk.TclError):
+            pass
 
-    def _reload_config(self) -> None:
-        self.config = AppConfig.load()
-        self._refresh_schedule_tables()
-        self._sync_crontab()
-        self._log("Config reloaded from disk.")
+    def _apply_config_change(self) -> None:
+        if not self._config_change_pending.is_set():
+            return
+        self._config_change_pending.clear()
+        self._reload_config(external=True)
+
+    def _apply_metrics_config(self) -> None:
+        METRICS.configure(self.config.metrics)
+        try:
+            METRICS.serve()
+        except OSError as exc:
+            self._log(f"Metrics endpoint unavailable: {exc}")
 
     def _on_close(self) -> None:
+        self.cron.flush_pending()
+        METRICS.stop_serving()
+        if self._config_watcher is not None:
+            self._config_watcher.stop()
         self.root.destroy()
 
 
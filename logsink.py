@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import atexit
+import fcntl
+import gzip
+import os
+import shutil
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from config import LogConfig
+
+
+# Lines kept for a retry while the log cannot be written; older ones are dropped.
+_MAX_RETAINED = 10000
+
+
+class RotatingLogWriter:
+    """Buffered, rotating append-only log file shared by concurrent processes.
+
+    Lines are buffered in memory and written in one ``O_APPEND`` write per
+    flush: when the buffer is full, ``flush_seconds`` after the first pending
+    line, and at interpreter exit. Every flush holds an exclusive ``flock`` on
+    a sibling ``.lock`` file, so cron-spawned ``_run`` processes appending at
+    the same moment never interleave partial lines or race a rotation. Lines
+    a flush fails to write go back into the buffer for the next one.
+    """
+
+    def __init__(self, path: Path, config: LogConfig):
+        self.path = path
+        self.config = config
+        self._buffer: list[str] = []
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self._failing = False  # the last flush failed and said so on stderr
+        atexit.register(self.flush)
+
+    def reconfigure(self, config: LogConfig) -> None:
+        self.config = config
+
+    def write(self, message: str) -> None:
+        stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self._buffer.append(f"[{stamp}] {message}\n")
+            full = len(self._buffer) >= max(1, self.config.buffer_lines)
+            if not full and self._timer is None and self.config.flush_seconds > 0:
+                self._timer = threading.Timer(self.config.flush_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full or self.config.flush_seconds <= 0:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._buffer:
+                return
+            lines, self._buffer = self._buffer, []
+        data = "".join(lines).encode()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path.with_name(self.path.name + ".lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    if self._should_rotate(len(data)):
+                        self._rotate()
+                    fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                    try:
+                        os.write(fd, data)
+                    finally:
+                        os.close(fd)
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        except Exception as exc:
+            with self._lock:
+                self._buffer[:0] = lines
+                dropped = max(0, len(self._buffer) - _MAX_RETAINED)
+                del self._buffer[:dropped]
+                report, self._failing = not self._failing, True
+            if report:
+                print(f"[ERROR] Cannot write {self.path}: {exc}; keeping lines for a retry.", file=sys.stderr)
+            if dropped:
+                print(f"[ERROR] Dropped {dropped} unwritten log line(s).", file=sys.stderr)
+            return
+        self._failing = False
+
+    # ------------------------------------------------------------------
+    # rotation
+    # ------------------------------------------------------------------
+
+    def _should_rotate(self, incoming: int) -> bool:
+        try:
+            st = self.path.stat()
+        except OSError:
+            return False
+        if st.st_size == 0:
+            return False
+        if self.config.max_bytes > 0 and st.st_size + incoming > self.config.max_bytes:
+            return True
+        if self.config.rotate_daily:
+            return datetime.fromtimestamp(st.st_mtime).date() != datetime.now().date()
+        return False
+
+    def _segment(self, index: int) -> Path:
+        suffix = ".gz" if self.config.compress else ""
+        return self.path.with_name(f"{self.path.name}.{index}{suffix}")
+
+    def _rotate(self) -> None:
+        backups = max(0, self.config.backups)
+        # Drop segments past the limit (either suffix, in case compress changed).
+        for candidate in self.path.parent.glob(f"{self.path.name}.*"):
+            index = candidate.name[len(self.path.name) + 1:].removesuffix(".gz")
+            if index.isdigit() and int(index) >= backups:
+                candidate.unlink(missing_ok=True)
+        if backups == 0:
+            self.path.unlink(missing_ok=True)
+            return
+        for index in range(backups - 1, 0, -1):
+            src = self._segment(index)
+            if src.exists():
+                src.replace(self._segment(index + 1))
+        if not self.config.compress:
+            self.path.replace(self._segment(1))
+            return
+        rotated = self.path.with_name(f"{self.path.name}.rotating")
+        self.path.replace(rotated)
+        try:
+            with open(rotated, "rb") as src, gzip.open(self._segment(1), "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        except Exception:
+            # Keep the uncompressed lines as the live log; the next flush retries.
+            self._segment(1).unlink(missing_ok=True)
+            rotated.replace(self.path)
+            raise
+        rotated.unlink(missing_ok=True)
+
@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import atexit
+import fcntl
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from config import MetricsConfig
+
+
+DEFAULT_TEXTFILE = Path.home() / ".powerstack" / "metrics" / "powerstack.prom"
+
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+LAG_BUCKETS = (0.05, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+OVERRUN_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(pairs: list[tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, registry: "MetricsRegistry", name: str, labels: tuple[str, ...]):
+        self._registry = registry
+        self.name = name
+        self.labels = labels
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        pairs = [(name, str(labels.get(name, ""))) for name in self.labels]
+        self._registry._add(self.name, [(self.name + _label_text(pairs), amount)])
+
+
+class Histogram:
+    def __init__(
+        self,
+        registry: "MetricsRegistry",
+        name: str,
+        labels: tuple[str, ...],
+        buckets: tuple[float, ...],
+    ):
+        self._registry = registry
+        self.name = name
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: object) -> None:
+        pairs = [(name, str(labels.get(name, ""))) for name in self.labels]
+        samples = [
+            (f"{self.name}_bucket{_label_text(pairs + [('le', format(bound, 'g'))])}", 1.0)
+            for bound in self.buckets
+            if value <= bound
+        ]
+        samples.append((f"{self.name}_bucket{_label_text(pairs + [('le', '+Inf')])}", 1.0))
+        samples.append((f"{self.name}_sum{_label_text(pairs)}", value))
+        samples.append((f"{self.name}_count{_label_text(pairs)}", 1.0))
+        self._registry._add(self.name, samples)
+
+
+class MetricsRegistry:
+    """Counters and histograms shared by every PowerStack process.
+
+    Observations only bump in-memory deltas. A flush (``flush_seconds``
+    after the first pending observation, and at interpreter exit) merges
+    them into the Prometheus textfile under an exclusive ``flock`` and
+    replaces the file atomically, so each cron-spawned ``_run`` adds its own
+    counts to the totals instead of overwriting them, and the node_exporter
+    textfile collector never reads a half-written file. Deltas a flush fails
+    to write are kept for the next one.
+    """
+
+    def __init__(self) -> None:
+        self.config = MetricsConfig()
+        self._families: dict[str, tuple[str, str]] = {}  # name -> (type, help)
+        self._pending: dict[str, dict[str, float]] = {}  # family -> {sample: delta}
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self._failing = False  # the last flush failed and said so on stderr
+        self._server: ThreadingHTTPServer | None = None
+        self._server_address: tuple[str, int] | None = None
+        atexit.register(self.flush)
+
+    def configure(self, config: MetricsConfig) -> None:
+        self.config = config
+        if not config.enabled:
+            with self._lock:
+                self._pending.clear()
+
+    @property
+    def path(self) -> Path:
+        if self.config.textfile_path:
+            return Path(self.config.textfile_path).expanduser()
+        return DEFAULT_TEXTFILE
+
+    def counter(self, name: str, help_text: str, labels: tuple[str, ...] = ()) -> Counter:
+        self._families[name] = ("counter", help_text)
+        return Counter(self, name, labels)
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DURATION_BUCKETS,
+    ) -> Histogram:
+        self._families[name] = ("histogram", help_text)
+        return Histogram(self, name, labels, buckets)
+
+    def _add(self, family: str, samples: list[tuple[str, float]]) -> None:
+        if not self.config.enabled:
+            return
+        with self._lock:
+            pending = self._pending.setdefault(family, {})
+            for sample, amount in samples:
+                pending[sample] = pending.get(sample, 0.0) + amount
+            if self._timer is None and self.config.flush_seconds > 0:
+                self._timer = threading.Timer(self.config.flush_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    # ------------------------------------------------------------------
+    # textfile
+    # ------------------------------------------------------------------
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return
+            pending = self._pending
+            self._pending = {}
+        path = self.path
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path.with_name(path.name + ".lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    families, totals = _parse(path.read_text()) if path.exists() else ({}, {})
+                    for family, samples in pending.items():
+                        families[family] = self._families.get(family, families.get(family, ("untyped", "")))
+                        merged = totals.setdefault(family, {})
+                        for sample, amount in samples.items():
+                            merged[sample] = merged.get(sample, 0.0) + amount
+                    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+                    tmp.write_text(_render(families, totals))
+                    tmp.replace(path)
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        except Exception as exc:
+            # Put the deltas back so the next flush still adds them.
+            with self._lock:
+                for family, samples in pending.items():
+                    merged = self._pending.setdefault(family, {})
+                    for sample, amount in samples.items():
+                        merged[sample] = merged.get(sample, 0.0) + amount
+                report, self._failing = not self._failing, True
+            if report:
+                print(f"[ERROR] Cannot write metrics to {path}: {exc}; keeping them for a retry.", file=sys.stderr)
+            return
+        self._failing = False
+
+    def read(self) -> str:
+        """The textfile's current contents, including this process's pending counts."""
+        self.flush()
+        try:
+            return self.path.read_text()
+        except OSError:
+            return ""
+
+    # ------------------------------------------------------------------
+    # HTTP endpoint
+    # ------------------------------------------------------------------
+
+    def serve(self) -> None:
+        """Start, move or stop the ``/metrics`` endpoint to match the config.
+
+        Raises OSError when the port cannot be bound.
+        """
+        address = (self.config.http_bind, self.config.http_port)
+        if not self.config.enabled or self.config.http_port <= 0:
+            self.stop_serving()
+            return
+        if self._server is not None and self._server_address == address:
+            return
+        self.stop_serving()
+        registry = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.read().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, _format: str, *_args: object) -> None:
+                pass
+
+        server = ThreadingHTTPServer(address, _Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="powerstack-metrics", daemon=True).start()
+        self._server = server
+        self._server_address = address
+
+    def stop_serving(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        self._server = None
+        self._server_address = None
+
+
+def _parse(text: str) -> tuple[dict[str, tuple[str, str]], dict[str, dict[str, float]]]:
+    """Read back a file written by ``_render``: family metadata and sample values."""
+    families: dict[str, tuple[str, str]] = {}
+    totals: dict[str, dict[str, float]] = {}
+    family = ""
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            name, _, help_text = line[len("# HELP "):].partition(" ")
+            families[name] = (families.get(name, ("untyped", ""))[0], help_text)
+            family = name
+        elif line.startswith("# TYPE "):
+            name, _, kind = line[len("# TYPE "):].partition(" ")
+            families[name] = (kind.strip(), families.get(name, ("", ""))[1])
+            family = name
+        elif line and not line.startswith("#"):
+            sample, _, value = line.rpartition(" ")
+            try:
+                amount = float(value)
+            except ValueError:
+                continue
+            owner = family if family and sample.startswith(family) else sample.split("{", 1)[0]
+            totals.setdefault(owner, {})[sample] = amount
+    return families, totals
+
+
+def _render(families: dict[str, tuple[str, str]], totals: dict[str, dict[str, float]]) -> str:
+    lines: list[str] = []
+    for family in sorted(totals):
+        kind, help_text = families.get(family, ("untyped", ""))
+        if help_text:
+            lines.append(f"# HELP {family} {help_text}")
+        lines.append(f"# TYPE {family} {kind}")
+        for sample, amount in totals[family].items():
+            lines.append(f"{sample} {int(amount) if amount.is_integer() else repr(amount)}")
+    return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+ACTIONS_TOTAL = METRICS.counter(
+    "powerstack_actions_total",
+    "Host actions finished, by action, host and outcome (ok, error, skipped, cancelled).",
+    ("action", "host", "outcome"),
+)
+ACTION_TIMEOUTS_TOTAL = METRICS.counter(
+    "powerstack_action_timeouts_total",
+    "Host actions reported as timed out (fleet.host_timeout_seconds); they still finish later.",
+    ("action", "host"),
+)
+ACTION_SECONDS = METRICS.histogram(
+    "powerstack_action_duration_seconds",
+    "Wall time of one host action.",
+    ("action", "host", "outcome"),
+)
+CONFIRM_SECONDS = METRICS.histogram(
+    "powerstack_confirm_seconds",
+    "Time from a finished wake/suspend/force-off until the host was seen up/down (outcome confirmed or timeout).",
+    ("action", "host", "outcome"),
+    buckets=(1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 90.0, 120.0, 180.0),
+)
+SSH_EXITS_TOTAL = METRICS.counter(
+    "powerstack_ssh_exit_total",
+    "Remote suspend commands by host and ssh exit code (or 'timeout'/'error').",
+    ("host", "code"),
+)
+SSH_SECONDS = METRICS.histogram(
+    "powerstack_ssh_duration_seconds",
+    "Wall time of the remote suspend command, including the SSH handshake.",
+    ("host",),
+)
+RELAY_PATTERN_SECONDS = METRICS.histogram(
+    "powerstack_relay_pattern_seconds",
+    "Measured duration of a relay pattern, first step to last hold-off.",
+    ("pin", "outcome"),
+    buckets=(0.1, 0.25, 0.5, 1.0, 1.5, 2.0, 3.0, 5.0, 7.5, 10.0),
+)
+RELAY_OVERRUN_SECONDS = METRICS.histogram(
+    "powerstack_relay_pattern_overrun_seconds",
+    "How much longer a relay pattern took than the sum of its step holds.",
+    ("pin",),
+    buckets=OVERRUN_BUCKETS,
+)
+SCHEDULE_LAG_SECONDS = METRICS.histogram(
+    "powerstack_schedule_lag_seconds",
+    "Delay between an event's scheduled time and the moment its action was dispatched.",
+    ("mode",),
+    buckets=LAG_BUCKETS,
+)
+SCHEDULE_MISSED_TOTAL = METRICS.counter(
+    "powerstack_schedule_missed_total",
+    "Fires skipped because they were later than scheduler.missed_grace_seconds.",
+    ("mode",),
+)
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import threading
+import time
+
+
+UP = "up"
+DOWN = "down"
+
+
+class PowerStateCache:
+    """Last known power state of each host, trusted for ``ttl`` seconds.
+
+    Entries come from reachability probes and from the results of recent
+    actions (a sent wake means "up", a sent suspend means "down"), so a
+    repeated action right after the first one is recognised without a probe.
+    """
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._states: dict[str, tuple[str, float, str]] = {}  # host -> (state, monotonic stamp, source)
+        self._lock = threading.Lock()
+
+    def get(self, host: str) -> tuple[str, float, str] | None:
+        """(state, age in seconds, source) if a fresh entry exists."""
+        with self._lock:
+            entry = self._states.get(host)
+            if entry is None:
+                return None
+            state, stamp, source = entry
+            age = time.monotonic() - stamp
+            if age > self.ttl:
+                del self._states[host]
+                return None
+            return state, age, source
+
+    def set(self, host: str, state: str, source: str) -> None:
+        with self._lock:
+            self._states[host] = (state, time.monotonic(), source)
+
+    def forget(self, host: str) -> None:
+        with self._lock:
+            self._states.pop(host, None)
+
+    def snapshot(self) -> dict[str, tuple[str, float, str]]:
+        """Fresh entries as {host: (state, age, source)}."""
+        with self._lock:
+            hosts = list(self._states)
+        return {host: entry for host in hosts if (entry := self.get(host)) is not None}
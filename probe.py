@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import errno
+import select
+import socket
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+from config import ConfirmConfig
+from pulse import TIMELINE, PulseTimeline
+
+
+_POLL_SECONDS = 0.05
+_IN_PROGRESS = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY}
+# Accepted or refused: either way the machine is powered and its network stack answers.
+_ANSWERED = {0, errno.ECONNREFUSED}
+
+
+def reachable(host: str, port: int, timeout: float) -> bool | None:
+    """One blocking probe: True if the host answers on *port* at all (accepts or refuses).
+
+    A refused connect still means the machine is powered and its network
+    stack is up; silence within *timeout* means it is off or asleep. None if
+    *host* does not resolve.
+    """
+    try:
+        addresses = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except OSError:
+        return None
+    family, _type, _proto, _name, address = addresses[0]
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(address)
+        except ConnectionRefusedError:
+            return True
+        except OSError:
+            return False
+    return True
+
+
+def wait_for_state(
+    host: str,
+    port: int,
+    want_up: bool,
+    timeout: float,
+    config: ConfirmConfig,
+    timeline: PulseTimeline = TIMELINE,
+) -> Future:
+    """Probe ``host:port`` until it is up (answers a TCP connect, even by refusing it) or down.
+
+    The future yields the seconds until the wanted state was first seen, or
+    None if *timeout* passed first. Name resolution happens here, in the
+    caller's thread; the probes themselves are non-blocking connects polled
+    from the timeline, so no thread waits on them. Raises OSError when
+    *host* does not resolve; a probe that fails later (no sockets left,
+    say) fails the future with that exception.
+    """
+    family, _type, _proto, _name, address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0]
+    future: Future = Future()
+    _Probe(family, address, want_up, timeout, config, timeline, future).start()
+    return future
+
+
+class _Probe:
+    """One confirmation: repeated connect attempts with doubling pauses until a deadline."""
+
+    def __init__(
+        self,
+        family: int,
+        address: tuple,
+        want_up: bool,
+        timeout: float,
+        config: ConfirmConfig,
+        timeline: PulseTimeline,
+        future: Future,
+    ):
+        self.family = family
+        self.address = address
+        self.want_up = want_up
+        self.config = config
+        self.timeline = timeline
+        self.future = future
+        self.timeout = timeout
+        self.started = 0.0
+        self.delay = max(_POLL_SECONDS, config.initial_delay_seconds)
+        self._sock: socket.socket | None = None
+
+    def start(self) -> None:
+        self.started = time.monotonic()
+        self._later(0.0, self._attempt)
+
+    def _later(self, delay: float, step: Callable[[], None]) -> None:
+        self.timeline.call_later(delay, lambda: self._guarded(step))
+
+    def _guarded(self, step: Callable[[], None]) -> None:
+        """Run *step*; if it raises (socket() hitting EMFILE, say), fail the future.
+
+        The timeline swallows exceptions, so without this the future would
+        never resolve and every caller waiting on it would hang.
+        """
+        try:
+            step()
+        except Exception as exc:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+            if not self.future.done():
+                self.future.set_exception(exc)
+
+    # ------------------------------------------------------------------
+    # timeline steps (run on the timeline thread)
+    # ------------------------------------------------------------------
+
+    def _attempt(self) -> None:
+        if self.future.done():
+            return
+        sock = self._sock = socket.socket(self.family, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            err = sock.connect_ex(self.address)
+        except OSError as exc:
+            err = exc.errno or errno.EHOSTUNREACH
+        if err in _IN_PROGRESS:
+            self._poll(sock, time.monotonic() + self.config.connect_timeout_seconds)
+        else:
+            self._finish_attempt(sock, err in _ANSWERED)
+
+    def _poll(self, sock: socket.socket, give_up: float) -> None:
+        _readable, writable, _errored = select.select([], [sock], [], 0)
+        if writable:
+            self._finish_attempt(sock, sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) in _ANSWERED)
+        elif time.monotonic() >= give_up:
+            self._finish_attempt(sock, False)
+        else:
+            self._later(_POLL_SECONDS, lambda: self._poll(sock, give_up))
+
+    def _finish_attempt(self, sock: socket.socket, up: bool) -> None:
+        sock.close()
+        self._sock = None
+        if self.future.done():
+            return  # cancelled meanwhile
+        now = time.monotonic()
+        if up == self.want_up:
+            self.future.set_result(now - self.started)
+            return
+        remaining = self.started + self.timeout - now
+        if remaining <= 0:
+            self.future.set_result(None)
+            return
+        self._later(min(self.delay, remaining), self._attempt)
+        self.delay = min(self.delay * 2, max(self.delay, self.config.max_delay_seconds))
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import sys
+import threading
+import time
+import traceback
+from typing import Callable
+
+
+# A relay pattern is a list of (energized, hold seconds) steps, run in order.
+Step = tuple[bool, float]
+
+
+def press_pattern(on_seconds: float, holdoff_seconds: float = 0.0) -> list[Step]:
+    """A single power-button press followed by the release hold-off."""
+    return [(True, on_seconds), (False, holdoff_seconds)]
+
+
+def long_press_pattern(hold_seconds: float = 5.0, holdoff_seconds: float = 0.0) -> list[Step]:
+    """Hold the button long enough for the firmware to force the PC off."""
+    return press_pattern(hold_seconds, holdoff_seconds)
+
+
+class TimerHandle:
+    """Returned by ``PulseTimeline.call_later``; ``cancel`` drops a call that has not run yet."""
+
+    __slots__ = ("fn",)
+
+    def __init__(self, fn: Callable[[], None]):
+        self.fn: Callable[[], None] | None = fn
+
+    def cancel(self) -> None:
+        self.fn = None
+
+
+class PulseTimeline:
+    """One timer thread running every scheduled relay step, in due order.
+
+    Callbacks must be short (toggle a GPIO line, complete a future, queue the
+    next step); nothing on the timeline sleeps, so any number of pending
+    pulses costs a heap entry each rather than a blocked thread.
+    """
+
+    def __init__(self, name: str = "powerstack-pulses") -> None:
+        self.name = name
+        self._heap: list[tuple[float, int, TimerHandle]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+
+    def call_later(self, delay: float, fn: Callable[[], None]) -> TimerHandle:
+        handle = TimerHandle(fn)
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + max(0.0, delay), next(self._seq), handle))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return handle
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._cond.wait(timeout)
+                _due, _seq, handle = heapq.heappop(self._heap)
+            fn = handle.fn
+            if fn is None:
+                continue  # cancelled
+            try:
+                fn()
+            except Exception:
+                # Keep the timeline running for everyone else, but leave a trace.
+                print(f"[ERROR] {self.name}: timeline callback failed:", file=sys.stderr)
+                traceback.print_exc()
+
+
+TIMELINE = PulseTimeline()
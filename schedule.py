@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import heapq
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from config import ScheduleEvent
+
+
+WEEK_SECONDS = 7 * 86400
+
+
+@dataclass(frozen=True)
+class CompiledEvent:
+    """An event reduced to what next-run maths needs, parsed exactly once.
+
+    Weekly events become sorted offsets in seconds from Monday 00:00 (one per
+    selected weekday, so the weekday mask is implicit); one-time events keep
+    their absolute fire time. ``enabled`` is read live from the event so
+    enable/disable never requires a recompile.
+    """
+
+    event: ScheduleEvent
+    offsets: tuple[int, ...] = ()
+    once_at: datetime | None = None
+    valid: bool = True
+
+    @property
+    def enabled(self) -> bool:
+        return self.event.enabled
+
+
+def compile_event(event: ScheduleEvent) -> CompiledEvent:
+    try:
+        if event.recurrence == "once":
+            return CompiledEvent(event, once_at=event.once_datetime())
+        hh, mm, ss = event.time_parts()
+    except ValueError:
+        return CompiledEvent(event, valid=False)
+    day_offset = hh * 3600 + mm * 60 + ss
+    offsets = tuple(sorted({d * 86400 + day_offset for d in event.weekdays if 0 <= d <= 6}))
+    return CompiledEvent(event, offsets=offsets)
+
+
+def _week_start(now: datetime) -> datetime:
+    return (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_run(compiled: CompiledEvent, now: datetime) -> datetime | None:
+    """First fire time at or after *now*, in closed form (no day-by-day scan)."""
+    if not compiled.valid or not compiled.enabled:
+        return None
+    if compiled.once_at is not None:
+        return compiled.once_at if compiled.once_at >= now else None
+    if not compiled.offsets:
+        return None
+    week = _week_start(now)
+    elapsed = (now - week).total_seconds()
+    i = bisect_left(compiled.offsets, elapsed)
+    if i < len(compiled.offsets):
+        return week + timedelta(seconds=compiled.offsets[i])
+    return week + timedelta(seconds=WEEK_SECONDS + compiled.offsets[0])
+
+
+class ScheduleIndex:
+    """Shared schedule engine for the CLI, GUI and daemon.
+
+    Build it once per loaded schedule; every query is then either O(log k)
+    per event (``next_run``) or a heap merge (``upcoming``).
+    """
+
+    def __init__(self, events: Iterable[ScheduleEvent]):
+        self._compiled: dict[str, CompiledEvent] = {e.id: compile_event(e) for e in events}
+        self._order: list[str] | None = None  # lookup tables, rebuilt lazily after edits
+        self._labels: dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._compiled)
+
+    def get(self, event_id: str) -> CompiledEvent | None:
+        return self._compiled.get(event_id)
+
+    def update(self, event: ScheduleEvent) -> None:
+        """Recompile a single added or edited event."""
+        previous = self._compiled.get(event.id)
+        self._compiled[event.id] = compile_event(event)
+        if self._order is None:
+            return
+        if previous is None:
+            # Appends keep the lookup tables valid, so bulk adds stay O(1) each.
+            self._order.append(event.id)
+            self._labels.setdefault(event.label.lower(), event.id)
+        elif previous.event.label != event.label:
+            self._order = None
+
+    def remove(self, event_id: str) -> None:
+        if self._compiled.pop(event_id, None) is not None:
+            self._order = None
+
+    def find(self, key: str) -> ScheduleEvent | None:
+        """Look up an event by ID, 1-based position, or label (case-insensitive)."""
+        compiled = self._compiled.get(key)
+        if compiled is not None:
+            return compiled.event
+        self._build_lookup()
+        if key.isdigit() and 0 < int(key) <= len(self._order):
+            return self._compiled[self._order[int(key) - 1]].event
+        return self.find_label(key)
+
+    def find_label(self, label: str) -> ScheduleEvent | None:
+        """First event whose label matches case-insensitively."""
+        self._build_lookup()
+        event_id = self._labels.get(label.lower())
+        return self._compiled[event_id].event if event_id is not None else None
+
+    def _build_lookup(self) -> None:
+        if self._order is not None:
+            return
+        self._order = list(self._compiled)
+        self._labels = {}
+        for event_id in self._order:
+            self._labels.setdefault(self._compiled[event_id].event.label.lower(), event_id)
+
+    def next_run(self, event: ScheduleEvent, now: datetime | None = None) -> datetime | None:
+        compiled = self._compiled.get(event.id)
+        if compiled is None or compiled.event is not event:
+            compiled = compile_event(event)
+            self._compiled[event.id] = compiled
+        return next_run(compiled, now or datetime.now())
+
+    def status(self, event: ScheduleEvent, now: datetime | None = None) -> str:
+        """Enabled, Paused, or Completed (a disabled one-time event whose time has passed)."""
+        if event.enabled:
+            return "Enabled"
+        compiled = self._compiled.get(event.id)
+        if compiled is None or compiled.event is not event:
+            compiled = compile_event(event)
+        if compiled.once_at is not None and (now or datetime.now()) >= compiled.once_at:
+            return "Completed"
+        return "Paused"
+
+    def upcoming(
+        self,
+        count: int,
+        now: datetime | None = None,
+        repeat: bool = False,
+    ) -> list[tuple[datetime, ScheduleEvent]]:
+        """The next *count* fires across all events, earliest first.
+
+        Each event contributes only its next fire unless *repeat* is set, in
+        which case a popped weekly event re-enters the heap with its
+        following occurrence.
+        """
+        now = now or datetime.now()
+        heap: list[tuple[datetime, int, CompiledEvent]] = []
+        for seq, compiled in enumerate(self._compiled.values()):
+            fire = next_run(compiled, now)
+            if fire is not None:
+                heap.append((fire, seq, compiled))
+        if not repeat:
+            return [(fire, c.event) for fire, _seq, c in heapq.nsmallest(count, heap)]
+        heapq.heapify(heap)
+        out: list[tuple[datetime, ScheduleEvent]] = []
+        while heap and len(out) < count:
+            fire, seq, compiled = heapq.heappop(heap)
+            out.append((fire, compiled.event))
+            if compiled.offsets:
+                following = next_run(compiled, fire + timedelta(seconds=1))
+                if following is not None:
+                    heapq.heappush(heap, (following, seq, compiled))
+        return out
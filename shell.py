@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import cmd
+import shlex
+import sys
+
+from cli import PowerStackCLI, build_parser, dispatch
+from config import AppConfig
+from fleet import FleetController
+from metrics import METRICS
+from schedule import ScheduleIndex
+
+
+# Long-running, API-only or cron-only commands; everything else runs in the shell.
+NOT_IN_SHELL = {"shell", "daemon", "serve", "status", "_run", "_prewarm", "_run_slot"}
+
+
+class ShellCLI(PowerStackCLI):
+    """A ``PowerStackCLI`` that outlives one command.
+
+    The parsed config, schedule index, conflict index, crontab state and one
+    fleet (relay device, SSH pool, action executor) are kept between commands.
+    Edits stay in memory until :meth:`commit`, which saves and syncs the
+    crontab once for all of them. With nothing pending, each command first
+    picks up changes other processes made to the config.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.pending = 0  # commands whose edits are not saved yet
+        self._fleet: FleetController | None = None
+
+    def _save(self) -> None:
+        self.pending += 1
+
+    def _reload(self) -> None:
+        if self.pending:
+            return  # unsaved edits win; commit() refuses to overwrite outside changes
+        super()._reload()
+
+    def _make_fleet(self) -> FleetController:
+        if self._fleet is None:
+            self._fleet = FleetController(self.config, None, self.log)
+        elif self._fleet.config is not self.config:
+            self._fleet.reconfigure(self.config)
+        return self._fleet
+
+    def commit(self, force: bool = False) -> bool:
+        """Save pending edits and sync the crontab; False if the config changed on disk meanwhile."""
+        if not self.pending:
+            print("Nothing to commit.")
+            return True
+        if self.config.changed_on_disk() and not force:
+            print(
+                "The config was changed by another process since it was loaded; "
+                "'commit --force' overwrites those changes, 'discard' drops yours.",
+                file=sys.stderr,
+            )
+            return False
+        super()._save()
+        self.log(f"Committed {self.pending} change(s).")
+        self.pending = 0
+        return True
+
+    def discard(self) -> None:
+        """Drop pending edits and re-read the config."""
+        self.config = AppConfig.load()
+        self.cron.apply_config(self.config)
+        self.index = ScheduleIndex(self.config.schedule)
+        self._conflicts = None
+        print(f"Discarded {self.pending} change(s).")
+        self.pending = 0
+
+    def close(self) -> None:
+        if self._fleet is not None:
+            self._fleet.executor.wait_idle()
+        METRICS.flush()
+
+
+class PowerStackShell(cmd.Cmd):
+    """Reads CLI command lines (without ``python app.py``) and runs them on one ``ShellCLI``."""
+
+    intro = (
+        "PowerStack shell. Commands are the CLI's; 'help' lists them, 'help <command>' shows its options.\n"
+        "Edits are saved by 'commit' or on exit; 'discard' drops them."
+    )
+
+    def __init__(self, cli: ShellCLI) -> None:
+        super().__init__()
+        self.cli = cli
+        self.parser = build_parser()
+        self.interactive = sys.stdin.isatty()
+        if not self.interactive:
+            self.intro = None
+        self._update_prompt()
+
+    def _update_prompt(self) -> None:
+        if not self.interactive:
+            self.prompt = ""
+        else:
+            self.prompt = f"powerstack ({self.cli.pending} pending)> " if self.cli.pending else "powerstack> "
+
+    def postcmd(self, stop: bool, line: str) -> bool:
+        self._update_prompt()
+        return stop
+
+    def emptyline(self) -> bool:
+        return False  # never repeat the last command: it may have been an action
+
+    def default(self, line: str) -> bool:
+        try:
+            argv = shlex.split(line)
+        except ValueError as exc:
+            print(f"Cannot parse command: {exc}", file=sys.stderr)
+            return False
+        if argv[0] in NOT_IN_SHELL:
+            print(f"'{argv[0]}' is not available in the shell.", file=sys.stderr)
+            return False
+        try:
+            args = self.parser.parse_args(argv)
+            if args.command == "storage" and args.op != "status" and self.cli.pending:
+                print("Commit or discard pending changes before switching storage.", file=sys.stderr)
+                return False
+            self.cli._reload()
+            dispatch(self.cli, args)
+        except SystemExit:
+            pass  # argparse or the command already said what went wrong
+        except KeyboardInterrupt:
+            print("Interrupted.", file=sys.stderr)
+        return False
+
+    def do_help(self, arg: str) -> bool:
+        """help [command]: list commands, or show one command's options."""
+        if hasattr(self, f"do_{arg}"):
+            return super().do_help(arg)
+        if arg:
+            self.default(f"{arg} --help")
+            return False
+        self.parser.print_help()
+        print(
+            "\nshell commands:\n"
+            "  commit [--force]      Save pending edits and sync the crontab\n"
+            "  discard               Drop pending edits and re-read the config\n"
+            "  exit, quit            Commit and leave (Ctrl-D too)"
+        )
+        return False
+
+    def do_commit(self, arg: str) -> bool:
+        """commit [--force]: save pending edits and sync the crontab."""
+        if arg.strip() not in ("", "--force"):
+            print("usage: commit [--force]", file=sys.stderr)
+            return False
+        self.cli.commit(force=arg.strip() == "--force")
+        return False
+
+    def do_discard(self, arg: str) -> bool:
+        """discard: drop pending edits and re-read the config."""
+        self.cli.discard()
+        return False
+
+    def do_exit(self, arg: str) -> bool:
+        """exit: commit pending edits and leave."""
+        if not self.cli.pending or self.cli.commit():
+            return True
+        if self.interactive:
+            return False  # let the user choose between 'commit --force' and 'discard'
+        print(f"Left {self.cli.pending} change(s) unsaved.", file=sys.stderr)
+        return True
+
+    do_quit = do_exit
+
+    def do_EOF(self, arg: str) -> bool:
+        if self.interactive:
+            print()
+        if self.cli.pending and not self.cli.commit():
+            print(f"Left {self.cli.pending} change(s) unsaved.", file=sys.stderr)
+        return True
+
+
+def run_shell() -> None:
+    cli = ShellCLI()
+    shell = PowerStackShell(cli)
+    try:
+        while True:
+            try:
+                shell.cmdloop()
+                break
+            except KeyboardInterrupt:
+                print("\n(Use 'exit' or Ctrl-D to leave.)")
+                shell.intro = None
+    finally:
+        cli.close()
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import subprocess
+import time
+from pathlib import Path
+from typing import Callable
+
+from config import RemoteConfig, SshPoolConfig
+
+
+LogFn = Callable[[str], None]
+
+SSH_DIR = Path.home() / ".powerstack" / "ssh"
+
+
+def connection_key(config: RemoteConfig) -> str:
+    return f"{config.user}@{config.host}:{config.port}"
+
+
+class SshConnectionPool:
+    """Keeps OpenSSH ControlMaster sockets under ``~/.powerstack/ssh`` warm.
+
+    Masters outlive the process that opened them (``ControlPersist``), so a
+    socket warmed by one cron run or the daemon is reused by the next ``ssh``
+    call. A small JSON state file tracks when each master was opened and last
+    used so the pool can enforce its lifetime and connection-count limits.
+    """
+
+    def __init__(self, config: SshPoolConfig, log: LogFn, socket_dir: Path = SSH_DIR):
+        self.config = config
+        self.log = log
+        self.socket_dir = socket_dir
+        self._state_path = socket_dir / "pool.json"
+
+    def reconfigure(self, config: SshPoolConfig) -> None:
+        self.config = config
+
+    # ------------------------------------------------------------------
+    # command building
+    # ------------------------------------------------------------------
+
+    def command(self, config: RemoteConfig, multiplex: bool = True) -> list[str]:
+        """Base ``ssh`` argv for *config*, routed through the pool when enabled."""
+        cmd = [
+            "ssh",
+            "-p",
+            str(config.port),
+            "-o",
+            "BatchMode=yes",
+            "-o",
+            "ConnectTimeout=10",
+        ]
+        if config.ssh_key_path:
+            cmd.extend(["-i", str(Path(config.ssh_key_path).expanduser())])
+        if multiplex and self.config.enabled:
+            # ssh cannot create the ControlPath directory itself; without it
+            # the master fails to bind and the command exits with an error.
+            self.socket_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+            cmd.extend([
+                "-o",
+                "ControlMaster=auto",
+                "-o",
+                f"ControlPath={self._socket_path(config)}",
+                "-o",
+                f"ControlPersist={max(1, int(self.config.persist_seconds))}",
+                "-o",
+                "ServerAliveInterval=5",
+                "-o",
+                "ServerAliveCountMax=2",
+            ])
+        cmd.append(f"{config.user}@{config.host}")
+        return cmd
+
+    # ------------------------------------------------------------------
+    # lifecycle
+    # ------------------------------------------------------------------
+
+    def is_alive(self, config: RemoteConfig) -> bool:
+        if not self.config.enabled or not self._socket_path(config).exists():
+            return False
+        return self._control(config, "check") == 0
+
+    def warm(self, config: RemoteConfig) -> bool:
+        """Open (or keep) a master connection so the next command skips the handshake."""
+        if not self.config.enabled:
+            return False
+        if not config.host or not config.user:
+            return False
+        key = connection_key(config)
+        state = self._load_state()
+        entry = state.get(key)
+        now = time.time()
+        if entry and self._expired(entry, now):
+            self.close(config)
+            state = self._load_state()
+            entry = None
+        if entry is None or not self.is_alive(config):
+            cmd = self.command(config)
+            cmd[1:1] = ["-f", "-N", "-o", "ControlMaster=yes"]
+            try:
+                proc = subprocess.run(cmd, capture_output=True, text=True, timeout=20, check=False)
+            except Exception as exc:
+                self.log(f"SSH pre-warm failed for {key}: {exc}")
+                return False
+            if proc.returncode != 0:
+                detail = (proc.stderr or "").strip() or f"Exit code {proc.returncode}"
+                self.log(f"SSH pre-warm failed for {key}: {detail}")
+                return False
+            state[key] = {"opened": now, "used": now}
+            self.log(f"SSH connection to {key} pre-warmed.")
+        else:
+            entry["used"] = now
+        self._save_state(state)
+        self.evict()
+        return True
+
+    def touch(self, config: RemoteConfig) -> None:
+        """Record a use of *config*'s master (opened implicitly by ControlMaster=auto)."""
+        if not self.config.enabled or not self._socket_path(config).exists():
+            return
+        key = connection_key(config)
+        state = self._load_state()
+        now = time.time()
+        entry = state.setdefault(key, {"opened": now, "used": now})
+        entry["used"] = now
+        self._save_state(state)
+        if len(state) > self.config.max_connections:
+            self.evict()
+
+    def close(self, config: RemoteConfig) -> None:
+        if self._socket_path(config).exists():
+            self._control(config, "exit")
+        state = self._load_state()
+        if state.pop(connection_key(config), None) is not None:
+            self._save_state(state)
+
+    def evict(self) -> list[str]:
+        """Drop dead and expired masters, then close the least recently used over the limit."""
+        state = self._load_state()
+        now = time.time()
+        evicted: list[str] = []
+        for key, entry in list(state.items()):
+            remote = _remote_from_key(key)
+            if self._expired(entry, now) or not self._socket_path(remote).exists():
+                if self._socket_path(remote).exists():
+                    self._control(remote, "exit")
+                del state[key]
+                evicted.append(key)
+        overflow = len(state) - max(0, self.config.max_connections)
+        if overflow > 0:
+            for key, _entry in sorted(state.items(), key=lambda kv: kv[1].get("used", 0))[:overflow]:
+                self._control(_remote_from_key(key), "exit")
+                del state[key]
+                evicted.append(key)
+        if evicted:
+            self._save_state(state)
+            self.log(f"Evicted SSH connections: {', '.join(evicted)}")
+        return evicted
+
+    def status(self) -> list[tuple[str, float, float, bool]]:
+        """(key, opened, last used, alive) for every tracked master."""
+        rows = []
+        for key, entry in sorted(self._load_state().items()):
+            alive = self.is_alive(_remote_from_key(key))
+            rows.append((key, entry.get("opened", 0.0), entry.get("used", 0.0), alive))
+        return rows
+
+    # ------------------------------------------------------------------
+    # internals
+    # ------------------------------------------------------------------
+
+    def _socket_path(self, config: RemoteConfig) -> Path:
+        # Hashed like OpenSSH's %C so long host names stay under the socket path limit.
+        digest = hashlib.sha1(connection_key(config).encode()).hexdigest()[:20]
+        return self.socket_dir / f"cm-{digest}"
+
+    def _control(self, config: RemoteConfig, op: str) -> int:
+        cmd = [
+            "ssh",
+            "-o",
+            f"ControlPath={self._socket_path(config)}",
+            "-O",
+            op,
+            "-p",
+            str(config.port),
+            f"{config.user}@{config.host}",
+        ]
+        try:
+            proc = subprocess.run(cmd, capture_output=True, text=True, timeout=5, check=False)
+        except Exception:
+            return -1
+        return proc.returncode
+
+    def _expired(self, entry: dict[str, float], now: float) -> bool:
+        lifetime = self.config.max_lifetime_seconds
+        if lifetime > 0 and now - entry.get("opened", now) > lifetime:
+            return True
+        return now - entry.get("used", now) > self.config.persist_seconds
+
+    def _load_state(self) -> dict[str, dict[str, float]]:
+        try:
+            return json.loads(self._state_path.read_text())
+        except Exception:
+            return {}
+
+    def _save_state(self, state: dict[str, dict[str, float]]) -> None:
+        try:
+            self.socket_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+            tmp = self._state_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(state))
+            tmp.replace(self._state_path)
+        except Exception:
+            pass
+
+
+def _remote_from_key(key: str) -> RemoteConfig:
+    user, _, rest = key.partition("@")
+    host, _, port = rest.rpartition(":")
+    return RemoteConfig(host=host, user=user, port=int(port or 22))
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from config import ScheduleEvent
+
+
+_TABLE = """
+CREATE TABLE IF NOT EXISTS events (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    action TEXT NOT NULL,
+    time_hhmm TEXT NOT NULL,
+    recurrence TEXT NOT NULL,
+    date_ymd TEXT NOT NULL,
+    weekdays TEXT NOT NULL,
+    enabled INTEGER NOT NULL,
+    target TEXT NOT NULL
+)"""
+_INDEX = "CREATE INDEX IF NOT EXISTS idx_events_position ON events(position)"
+
+_COLUMNS = ("id", "label", "action", "time_hhmm", "recurrence", "date_ymd", "weekdays", "enabled", "target")
+
+Row = tuple
+
+
+def _row(event: ScheduleEvent) -> Row:
+    return (
+        event.id,
+        event.label,
+        event.action,
+        event.time_hhmm,
+        event.recurrence,
+        event.date_ymd,
+        json.dumps(list(event.weekdays)),
+        int(event.enabled),
+        event.target,
+    )
+
+
+def _event(row: Row) -> ScheduleEvent:
+    values = dict(zip(_COLUMNS, row))
+    values["weekdays"] = json.loads(values["weekdays"])
+    values["enabled"] = bool(values["enabled"])
+    return ScheduleEvent(**values)
+
+
+class SqliteScheduleStore:
+    """Schedule events in SQLite (WAL), one row per event.
+
+    ``load_all`` remembers what it read; ``save_all`` then writes only the
+    rows this process added, changed or removed since, inside one
+    transaction. Concurrent writers (CLI, GUI, cron ``_run``) therefore only
+    collide when they touch the same event, instead of losing each other's
+    whole-file rewrites.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._snapshot: dict[str, Row] = {}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), timeout=10.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_TABLE)
+        self._conn.execute(_INDEX)
+        self._drop_label_key()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def is_empty(self) -> bool:
+        return self._conn.execute("SELECT 1 FROM events LIMIT 1").fetchone() is None
+
+    def load_all(self) -> list[ScheduleEvent]:
+        cur = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM events ORDER BY position")
+        rows = [tuple(row) for row in cur.fetchall()]
+        self._snapshot = {row[0]: row for row in rows}
+        return [_event(row) for row in rows]
+
+    def save_all(self, events: Iterable[ScheduleEvent]) -> int:
+        """Write the rows that differ from the last load/save; returns how many changed."""
+        wanted = [_row(e) for e in events]
+        wanted_ids = {row[0] for row in wanted}
+        changed = [row for row in wanted if self._snapshot.get(row[0]) != row]
+        removed = [event_id for event_id in self._snapshot if event_id not in wanted_ids]
+        if not changed and not removed:
+            return 0
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM events WHERE id = ?", [(event_id,) for event_id in removed])
+            for row in changed:
+                self._upsert(conn, row)
+        for event_id in removed:
+            del self._snapshot[event_id]
+        for row in changed:
+            self._snapshot[row[0]] = row
+        return len(changed) + len(removed)
+
+    def replace_all(self, events: Iterable[ScheduleEvent]) -> None:
+        """Overwrite the whole table in one transaction (used by migration)."""
+        rows = [_row(e) for e in events]
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM events")
+            for row in rows:
+                self._upsert(conn, row)
+        self._snapshot = {row[0]: row for row in rows}
+
+    def _drop_label_key(self) -> None:
+        """Drop the unused ``label_key`` column from a table made by an older version.
+
+        Done by copying rather than ``ALTER TABLE DROP COLUMN``, which older
+        SQLite builds (Raspberry Pi OS bullseye) lack.
+        """
+        if "label_key" not in self._columns():
+            return
+        with self.transaction() as conn:
+            if "label_key" not in self._columns():
+                return  # another process migrated first
+            conn.execute("DROP INDEX IF EXISTS idx_events_label_key")
+            conn.execute("DROP INDEX IF EXISTS idx_events_position")
+            conn.execute("ALTER TABLE events RENAME TO events_old")
+            conn.execute(_TABLE)
+            columns = ", ".join(("id", "position", *_COLUMNS[1:]))
+            conn.execute(f"INSERT INTO events ({columns}) SELECT {columns} FROM events_old")
+            conn.execute("DROP TABLE events_old")
+            conn.execute(_INDEX)
+
+    def _columns(self) -> set[str]:
+        return {row[1] for row in self._conn.execute("PRAGMA table_info(events)")}
+
+    def _upsert(self, conn: sqlite3.Connection, row: Row) -> None:
+        # Existing rows keep their position; new ones are appended.
+        conn.execute(
+            """
+            INSERT INTO events (id, position, label, action, time_hhmm,
+                                recurrence, date_ymd, weekdays, enabled, target)
+            VALUES (?, (SELECT COALESCE(MAX(position), -1) + 1 FROM events),
+                    ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                label = excluded.label,
+                action = excluded.action,
+                time_hhmm = excluded.time_hhmm,
+                recurrence = excluded.recurrence,
+                date_ymd = excluded.date_ymd,
+                weekdays = excluded.weekdays,
+                enabled = excluded.enabled,
+                target = excluded.target
+            """,
+            row,
+        )
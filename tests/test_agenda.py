@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+from agenda import CLASH, HOLDOFF, PEAK, ConflictIndex, build_agenda
+from config import AgendaConfig, AppConfig, HostConfig, ScheduleEvent
+
+
+NOW = datetime(2026, 1, 5, 6, 0)  # a Monday
+
+
+def _event(event_id: str, action: str, at: str, target: str, **kwargs) -> ScheduleEvent:
+    return ScheduleEvent(id=event_id, label=event_id, action=action, time_hhmm=at, target=target, **kwargs)
+
+
+@pytest.fixture
+def config() -> AppConfig:
+    return AppConfig(
+        hosts=[
+            HostConfig(name="a", host="a.lan", user="u"),
+            HostConfig(name="b", host="b.lan", user="u"),
+            HostConfig(name="c", host="c.lan", user="u", relay_pin=17),
+        ],
+        agenda=AgendaConfig(max_relay_presses_per_minute=0),
+    )
+
+
+def _kinds(index: ConflictIndex, event: ScheduleEvent) -> list[str]:
+    return [conflict.kind for conflict in index.conflicts(event, NOW)]
+
+
+def test_different_actions_on_one_host_in_one_minute_clash(config):
+    config.schedule = [_event("night", "suspend", "07:00", "a")]
+    index = ConflictIndex(config)
+    conflicts = index.conflicts(_event("morning", "wake", "07:00:30", "a"), NOW)
+    assert [c.kind for c in conflicts] == [CLASH]
+    assert conflicts[0].at == datetime(2026, 1, 5, 7, 0, 30)  # the candidate's next fire
+    assert "'night' (suspend), 'morning' (wake) act on a" in conflicts[0].text()
+    assert _kinds(index, _event("again", "suspend", "07:00", "a")) == []
+    assert _kinds(index, _event("other", "wake", "07:00", "c")) == []
+    assert _kinds(index, _event("later", "wake", "07:01", "a")) == []
+
+
+def test_an_event_never_conflicts_with_itself(config):
+    event = _event("fleet", "force-off", "07:00", "a,b")  # a and b share the default relay pin
+    config.schedule = [event]
+    index = ConflictIndex(config)
+    assert index.conflicts(event, NOW) == []
+    # An edit of the same event is vetted against the rest of the schedule only.
+    assert _kinds(index, _event("fleet", "wake", "07:00", "a")) == []
+
+
+def test_presses_on_a_shared_channel_inside_holdoff(config):
+    config.schedule = [_event("hard", "force-off", "07:00:00", "a")]  # busy 5.2s on pin 4
+    index = ConflictIndex(config)
+    conflicts = index.conflicts(_event("soon", "wake", "07:00:03", "b"), NOW)
+    assert [c.kind for c in conflicts] == [HOLDOFF]
+    assert "'hard' and 'soon' press relay pin 4 3s apart" in conflicts[0].message
+    # Across a minute boundary, too.
+    assert _kinds(index, _event("before", "force-off", "06:59:58", "b")) == [HOLDOFF]
+    assert _kinds(index, _event("after", "wake", "07:00:06", "b")) == []
+    assert _kinds(index, _event("elsewhere", "wake", "07:00:03", "c")) == []
+
+
+def test_peaks_need_other_events_in_the_minute(config):
+    config.agenda = AgendaConfig(max_fires_per_minute=1, max_relay_presses_per_minute=2)
+    config.schedule = [_event("one", "wake", "07:00", "a")]
+    index = ConflictIndex(config)
+    alone = _event("alone", "wake", "08:00", "a,b,c")  # three presses, but no one else's
+    assert index.conflicts(alone, NOW) == []
+    conflicts = index.conflicts(_event("crowd", "wake", "07:00:30", "b,c"), NOW)
+    assert [c.kind for c in conflicts] == [PEAK, PEAK]
+    peaks = sorted(c.message for c in conflicts)
+    assert peaks[0].startswith("2 events in one minute (limit 1)")
+    assert peaks[1].startswith("3 relay presses in one minute (limit 2)")
+
+
+def test_disabled_and_removed_events_are_ignored(config):
+    night = _event("night", "suspend", "07:00", "a")
+    config.schedule = [night]
+    index = ConflictIndex(config)
+    morning = _event("morning", "wake", "07:00", "a")
+    night.enabled = False
+    assert index.conflicts(morning, NOW) == []
+    night.enabled = True
+    assert _kinds(index, morning) == [CLASH]
+    index.remove("night")
+    assert index.conflicts(morning, NOW) == []
+
+
+def test_one_time_events_only_meet_weekly_fires_on_their_date(config):
+    config.schedule = [_event("daily", "suspend", "07:00", "a")]
+    index = ConflictIndex(config)
+    tuesday = _event("tue", "wake", "07:00", "a", recurrence="once", date_ymd="2026-01-06")
+    assert _kinds(index, tuesday) == [CLASH]
+    past = _event("past", "wake", "07:00", "a", recurrence="once", date_ymd="2026-01-01")
+    assert index.conflicts(past, NOW) == []
+    config.schedule = [_event("mondays", "suspend", "07:00", "a", weekdays=[0])]
+    assert ConflictIndex(config).conflicts(tuesday, NOW) == []
+
+
+def test_index_agrees_with_the_full_pass(config):
+    config.schedule = [
+        _event("night", "suspend", "07:00", "a"),
+        _event("hard", "force-off", "12:00:00", "a"),
+    ]
+    index = ConflictIndex(config)
+    candidates = [_event("morning", "wake", "07:00", "a"), _event("soon", "wake", "12:00:03", "b")]
+    for candidate in candidates:
+        expected = {c.kind for c in index.conflicts(candidate, NOW)}
+        full = build_agenda(
+            AppConfig(hosts=config.hosts, agenda=config.agenda, schedule=config.schedule + [candidate]),
+            start=NOW, days=7, engine="python",
+        )
+        assert {c.kind for c in full.conflicts} == expected
@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+import os
+import stat
+
+from api import ApiServer, connect, done
+
+
+def test_socket_is_owner_only_even_with_an_open_umask(tmp_path):
+    path = tmp_path / "api.sock"
+    previous = os.umask(0)
+    try:
+        server = ApiServer(path, lambda request: iter([done(True, request["op"])]))
+        assert os.umask(0) == 0  # the process umask is restored after bind
+    finally:
+        os.umask(previous)
+    server.start()
+    try:
+        assert stat.S_IMODE(path.stat().st_mode) == 0o600
+        client = connect(path)
+        assert client is not None and client.call("ping")["message"] == "ping"
+        client.close()
+    finally:
+        server.stop()
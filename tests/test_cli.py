@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from cli import PowerStackCLI
+from config import AppConfig, ScheduleEvent
+
+
+class RecordingCLI(PowerStackCLI):
+    """A CLI on an in-memory config that counts saves instead of writing files or the crontab."""
+
+    def __init__(self, events: list[ScheduleEvent]):
+        config = AppConfig()
+        config.schedule = events
+        super().__init__(log=lambda _msg: None, config=config)
+        self.saves = 0
+
+    def _save(self) -> None:
+        self.saves += 1
+
+
+def _events() -> list[ScheduleEvent]:
+    return [
+        ScheduleEvent(id="wake-1", label="Morning wake", action="wake", time_hhmm="07:00"),
+        ScheduleEvent(id="sleep-1", label="Night suspend", action="suspend", time_hhmm="23:00"),
+    ]
+
+
+# ----------------------------------------------------------------------
+# apply
+# ----------------------------------------------------------------------
+
+def test_apply_stages_operations_in_order_and_saves_once():
+    cli = RecordingCLI(_events())
+    done, errors = cli.apply_operations([
+        {"op": "add", "id": "lunch", "label": "Lunch", "action": "suspend", "time": "12:00"},
+        {"op": "update", "event": "lunch", "time": "12:30"},
+        {"op": "disable", "event": "morning wake"},
+        {"op": "remove", "event": "2"},
+    ])
+    assert errors == [] and len(done) == 4
+    assert cli.saves == 1
+    assert [(e.id, e.time_hhmm, e.enabled) for e in cli.config.schedule] == [
+        ("wake-1", "07:00", False),
+        ("lunch", "12:30", True),
+    ]
+    assert cli._find_event("Lunch").time_hhmm == "12:30"  # the index follows the new schedule
+
+
+def test_apply_changes_nothing_when_any_operation_fails():
+    events = _events()
+    cli = RecordingCLI(events)
+    done, errors = cli.apply_operations([
+        {"op": "disable", "event": "wake-1"},
+        {"op": "add", "label": "Broken", "time": "25:00"},
+        {"op": "update", "event": "no-such-event", "time": "08:00"},
+    ])
+    assert [error.split(":")[0] for error in errors] == ["operation 2", "operation 3"]
+    assert cli.saves == 0
+    assert cli.config.schedule is events and events[0].enabled  # the staged disable was dropped
+
+
+def test_apply_resolves_references_against_the_staged_schedule():
+    cli = RecordingCLI(_events())
+    _done, errors = cli.apply_operations([
+        {"op": "remove", "event": "wake-1"},
+        {"op": "enable", "event": "wake-1"},
+    ])
+    assert errors == ["operation 2: event not found: wake-1"]
+    assert len(cli.config.schedule) == 2
+
+
+# ----------------------------------------------------------------------
+# import / export
+# ----------------------------------------------------------------------
+
+def test_import_upserts_by_id_then_label_and_reports_bad_rows(tmp_path, capsys):
+    cli = RecordingCLI(_events())
+    rows = [
+        {"id": "wake-1", "time": "06:45"},
+        {"label": "Night suspend", "days": "mon,tue,wed,thu,fri"},
+        {"label": "Morning wake", "id": "wake-1"},
+        {"label": "Lunch", "action": "suspend", "time": "12:00"},
+        {"label": "No time"},
+    ]
+    source = tmp_path / "events.jsonl"
+    source.write_text("\n".join(json.dumps(row) for row in rows) + "\nnot json\n")
+    with pytest.raises(SystemExit) as exit_info:
+        cli.cmd_import(str(source))
+    assert exit_info.value.code == 1
+    err = capsys.readouterr().err
+    assert "line 5:" in err and "line 6:" in err
+    assert cli.saves == 1
+    schedule = {e.label: e for e in cli.config.schedule}
+    assert schedule["Morning wake"].time_hhmm == "06:45"
+    assert schedule["Night suspend"].weekdays == [0, 1, 2, 3, 4]
+    assert schedule["Lunch"].action == "suspend" and len(schedule) == 3
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "csv"])
+def test_export_then_import_is_a_no_op(tmp_path, fmt):
+    exported = tmp_path / f"events.{fmt}"
+    RecordingCLI(_events()).cmd_export(fmt, str(exported))
+    cli = RecordingCLI(_events())
+    cli.cmd_import(str(exported), fmt)
+    assert cli.saves == 0
+    assert cli.config.schedule == _events()
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import random
+from datetime import datetime
+
+import pytest
+
+import cron as cron_module
+from config import ScheduleEvent
+from cron import (
+    SYNC_DRIFT,
+    SYNC_SKIPPED,
+    SYNC_WROTE,
+    CronManager,
+    _field_values,
+    compact_slots,
+    cron_matches,
+    events_in_minute,
+    last_fire_minute,
+    line_recurrence,
+)
+
+
+def _event(event_id: str, time_hhmm: str, weekdays: list[int] | None = None, **fields) -> ScheduleEvent:
+    return ScheduleEvent(
+        id=event_id,
+        label=fields.pop("label", event_id),
+        action=fields.pop("action", "wake"),
+        time_hhmm=time_hhmm,
+        weekdays=list(range(7)) if weekdays is None else weekdays,
+        **fields,
+    )
+
+
+class FakeCrontab:
+    """Stands in for ``crontab -l`` / ``crontab -`` and counts the calls."""
+
+    def __init__(self, lines: list[str] | None = None):
+        self.lines = list(lines or [])
+        self.reads = 0
+        self.writes = 0
+
+    def read(self) -> list[str]:
+        self.reads += 1
+        return list(self.lines)
+
+    def write(self, lines: list[str]) -> None:
+        self.writes += 1
+        self.lines = list(lines)
+
+
+@pytest.fixture
+def crontab(tmp_path, monkeypatch) -> FakeCrontab:
+    fake = FakeCrontab(["MAILTO=me", "0 3 * * * backup"])
+    monkeypatch.setattr(cron_module, "STATE_PATH", tmp_path / "cron.state")
+    monkeypatch.setattr(CronManager, "_read_crontab", lambda self: fake.read())
+    monkeypatch.setattr(CronManager, "_write_crontab", lambda self, lines: fake.write(lines))
+    return fake
+
+
+def _exprs(block: list[str]) -> list[str]:
+    """The quoted slot expression of every _run_slot line."""
+    return [line.split("'")[1] for line in block if "_run_slot" in line]
+
+
+# ----------------------------------------------------------------------
+# slot dispatch
+# ----------------------------------------------------------------------
+
+def test_cron_matches_fields_and_ranges():
+    monday_0730 = datetime(2024, 1, 1, 7, 30)
+    assert cron_matches("30 07 * * 1", monday_0730)
+    assert cron_matches("29-31 6,7 * * 1-5", monday_0730)
+    assert not cron_matches("30 07 * * 0,2-6", monday_0730)
+    assert not cron_matches("31 07 * * *", monday_0730)
+    assert cron_matches("00 09 * * 7", datetime(2024, 1, 7, 9, 0))  # 7 is Sunday too
+
+
+def test_cron_matches_either_restricted_day_field():
+    # Like cron, with both day-of-month and weekday restricted either may match.
+    assert cron_matches("00 08 15 * 1", datetime(2024, 1, 15, 8, 0))  # the 15th (a Monday)
+    assert cron_matches("00 08 15 * 3", datetime(2024, 1, 15, 8, 0))  # only the 15th matches
+    assert cron_matches("00 08 15 * 3", datetime(2024, 1, 17, 8, 0))  # only Wednesday matches
+    assert not cron_matches("00 08 15 * 3", datetime(2024, 1, 16, 8, 0))
+    assert not cron_matches("00 08 15 1 *", datetime(2024, 2, 15, 8, 0))
+
+
+def test_last_fire_minute_looks_back_within_the_window():
+    now = datetime(2024, 1, 1, 7, 32, 45)
+    assert last_fire_minute("30 07 * * *", now) == datetime(2024, 1, 1, 7, 30)
+    assert last_fire_minute("32 07 * * *", now) == datetime(2024, 1, 1, 7, 32)
+    assert last_fire_minute("30 06 * * *", now, lookback_minutes=30) is None
+
+
+def test_events_in_minute_picks_due_events_in_time_order():
+    events = [
+        _event("late", "07:30:40"),
+        _event("early", "07:30:05"),
+        _event("other-minute", "07:31"),
+        _event("off", "07:30", enabled=False),
+        _event("weekend", "07:30", [5, 6]),
+        _event("once", "07:30:20", recurrence="once", date_ymd="2024-01-01"),
+        _event("once-later", "07:30", recurrence="once", date_ymd="2024-01-02"),
+    ]
+    due = events_in_minute(events, datetime(2024, 1, 1, 7, 30))  # a Monday
+    assert [(fire.second, event.id) for fire, event in due] == [(5, "early"), (20, "once"), (40, "late")]
+
+
+def test_events_in_minute_with_lead_crossing_midnight():
+    # A 90 s pre-warm for a 00:00:30 Tuesday event fires in Monday's 23:59.
+    event = _event("tue", "00:00:30", [1], action="suspend")
+    due = events_in_minute([event], datetime(2024, 1, 1, 23, 59), lead_seconds=90)
+    assert due == [(datetime(2024, 1, 1, 23, 59), event)]
+    assert events_in_minute([event], datetime(2024, 1, 2, 23, 59), lead_seconds=90) == []
+
+
+def test_slot_dispatch_shares_one_line_per_minute_and_day():
+    cron = CronManager(dispatch="slot")
+    events = [
+        _event("a", "07:30:00", [0, 1]),
+        _event("b", "07:30:45", [0]),
+        _event("c", "22:00", [4]),
+        _event("d", "09:15", recurrence="once", date_ymd="2024-03-05"),
+    ]
+    block = cron._build_block(events)
+    assert sorted(_exprs(block)) == sorted(["30 07 * * 1", "30 07 * * 2", "00 22 * * 5", "15 09 5 3 *"])
+    monday = next(line for line in block if "'30 07 * * 1'" in line)
+    assert monday.endswith("# 2 event(s)")
+    assert line_recurrence("15 09 5 3 *") == "once"
+    assert line_recurrence("30 07 * * 1") == "weekly"
+
+
+# ----------------------------------------------------------------------
+# diff-aware sync
+# ----------------------------------------------------------------------
+
+def test_unchanged_sync_spawns_no_crontab_process(crontab):
+    events = [_event("a", "07:30")]
+    assert CronManager().sync(events) == SYNC_WROTE
+    assert (crontab.reads, crontab.writes) == (1, 1)
+    assert CronManager().sync(events) == SYNC_SKIPPED  # a fresh process trusts the stored digest
+    assert (crontab.reads, crontab.writes) == (1, 1)
+    assert crontab.lines[:2] == ["MAILTO=me", "0 3 * * * backup"]
+
+
+def test_changed_schedule_rewrites_only_the_block(crontab):
+    cron = CronManager()
+    cron.sync([_event("a", "07:30")])
+    assert cron.sync([_event("a", "08:00")]) == SYNC_WROTE
+    assert crontab.lines[:2] == ["MAILTO=me", "0 3 * * * backup"]
+    assert any(line.startswith("00 08 ") for line in crontab.lines)
+    assert not any(line.startswith("30 07 ") for line in crontab.lines)
+
+
+def test_only_a_verified_sync_repairs_outside_edits(crontab):
+    cron = CronManager()
+    events = [_event("a", "07:30")]
+    cron.sync(events)
+    crontab.lines = [line.replace("30 07 ", "45 07 ") for line in crontab.lines]
+    assert cron.sync(events) == SYNC_SKIPPED
+    assert cron.sync(events, verify=True) == SYNC_DRIFT
+    assert any(line.startswith("30 07 ") for line in crontab.lines)
+    assert cron.sync(events, verify=True) == SYNC_SKIPPED
+    assert crontab.writes == 2
+
+
+def test_sync_later_coalesces_a_burst_into_one_write(crontab):
+    cron = CronManager()
+    outcomes = []
+    for time_hhmm in ("07:00", "07:10", "07:20"):
+        cron.sync_later([_event("a", time_hhmm)], lambda outcome, error: outcomes.append((outcome, error)), delay=60)
+    cron.flush_pending()
+    assert outcomes == [(SYNC_WROTE, None)] * 3
+    assert crontab.writes == 1
+    assert any(line.startswith("20 07 ") for line in crontab.lines)
+
+
+# ----------------------------------------------------------------------
+# compact dispatch
+# ----------------------------------------------------------------------
+
+def _dispatched(lines: dict[str, set[str]], events: list[ScheduleEvent], minute: datetime) -> list[str]:
+    """Event IDs run in *minute*, resolved the way ``_run_slot`` does for every line that fires."""
+    due = events_in_minute(events, minute)
+    run: list[str] = []
+    for expr in lines:
+        if cron_matches(expr, minute):
+            kind = line_recurrence(expr)
+            run.extend(event.id for _at, event in due if event.recurrence == kind)
+    return sorted(run)
+
+
+def test_compact_lines_run_every_event_exactly_once():
+    rng = random.Random(7)
+    events = []
+    for n in range(120):
+        time_hhmm = f"{rng.choice([6, 7, 8, 22, 23]):02d}:{rng.choice([0, 15, 30, 45, 50]):02d}"
+        if n % 6 == 0:
+            events.append(_event(f"once{n}", time_hhmm, recurrence="once", date_ymd=f"2024-01-0{rng.randint(1, 7)}"))
+        else:
+            events.append(_event(f"w{n}", time_hhmm, sorted(rng.sample(range(7), rng.randint(1, 7)))))
+    slots = CronManager(dispatch="slot")._slot_groups(events)
+    compact = compact_slots(slots)
+    assert len(compact) < len(slots)
+    # Outside these times of day no line can fire and no event is due.
+    times = {tuple(map(int, event.time_hhmm.split(":"))) for event in events}
+    for expr in [*slots, *compact]:
+        minutes, hours = expr.split()[:2]
+        times.update((h, m) for h in _field_values(hours, 0, 23) for m in _field_values(minutes, 0, 59))
+    for day in range(1, 8):  # a Monday to Sunday week holding every dated event
+        for hour, minute in sorted(times):
+            when = datetime(2024, 1, day, hour, minute)
+            expected = sorted(event.id for _at, event in events_in_minute(events, when))
+            assert _dispatched(slots, events, when) == expected
+            assert _dispatched(compact, events, when) == expected
+
+
+def test_compact_lines_use_lists_and_ranges():
+    events = [_event(f"e{hour}", f"{hour:02d}:30", [0, 1, 2, 3, 4]) for hour in (6, 7, 8)]
+    block = CronManager(dispatch="compact")._build_block(events)
+    assert _exprs(block) == ["30 06-08 * * 1-5"]
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future
+
+from executor import MANUAL, SCHEDULED, ActionExecutor
+
+
+def _blocked(executor: ActionExecutor, lane: str) -> threading.Event:
+    """Occupy *lane* until the returned event is set."""
+    release = threading.Event()
+    started = threading.Event()
+
+    def hold() -> None:
+        started.set()
+        release.wait(5)
+
+    executor.submit("hold", lane, hold)
+    assert started.wait(5)
+    return release
+
+
+def test_forced_request_does_not_merge_into_a_queued_one():
+    executor = ActionExecutor(2)
+    release = _blocked(executor, "pc1")
+    plain = executor.submit("wake", "pc1", lambda: "plain", SCHEDULED)
+    forced = executor.submit("wake", "pc1", lambda: "forced", MANUAL, variant="force")
+    again = executor.submit("wake", "pc1", lambda: "ignored", MANUAL)
+    release.set()
+    assert forced is not plain and again is plain
+    assert plain.result(timeout=5) == "plain"
+    assert forced.result(timeout=5) == "forced"
+    executor.shutdown()
+
+
+def test_a_lane_runs_one_job_at_a_time_while_others_proceed():
+    executor = ActionExecutor(2)
+    release = _blocked(executor, "pc1")
+    queued = executor.submit("wake", "pc1", lambda: "pc1 wake")
+    assert executor.submit("wake", "pc2", lambda: "pc2 wake").result(timeout=5) == "pc2 wake"
+    assert not queued.done()
+    assert executor.stats() == (1, [("hold", "pc1")])
+    release.set()
+    assert queued.result(timeout=5) == "pc1 wake"
+    assert executor.wait_idle(5)
+    executor.shutdown()
+
+
+def test_repeats_coalesce_and_manual_jobs_jump_the_queue():
+    executor = ActionExecutor(1)
+    release = _blocked(executor, "pc0")
+    order: list[str] = []
+    other = executor.submit("suspend", "pc2", lambda: order.append("pc2"), SCHEDULED)
+    scheduled = executor.submit("suspend", "pc1", lambda: order.append("pc1"), SCHEDULED)
+    manual = executor.submit("suspend", "pc1", lambda: order.append("pc1 again"), MANUAL)
+    assert manual is scheduled  # merged into the queued job, now at manual priority
+    release.set()
+    other.result(timeout=5)
+    assert order == ["pc1", "pc2"]
+    executor.shutdown()
+
+
+def test_async_jobs_free_the_worker_but_hold_the_lane():
+    executor = ActionExecutor(1)
+    press: Future = Future()
+    first = executor.submit("wake", "pc1", lambda: press)
+    # The only worker is free again: another host's job runs while the press is pending.
+    assert executor.submit("wake", "pc2", lambda: "pc2").result(timeout=5) == "pc2"
+    second = executor.submit("suspend", "pc1", lambda: "pc1 suspend")
+    assert not second.done() and executor.stats()[1] == [("wake", "pc1")]
+    press.set_result("pressed")
+    assert first.result(timeout=5) == "pressed"
+    assert second.result(timeout=5) == "pc1 suspend"
+    executor.shutdown()
+
+
+def test_resize_grows_and_shrinks_the_pool():
+    executor = ActionExecutor(1)
+    executor.resize(3)
+    releases = [_blocked(executor, f"pc{n}") for n in range(3)]  # three lanes busy at once
+    executor.resize(1)
+    for release in releases:
+        release.set()
+    assert executor.wait_idle(5)
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and len([t for t in executor._threads if t.is_alive()]) > 1:
+        executor.submit("ping", "pc9", lambda: None).result(timeout=5)
+        time.sleep(0.05)
+    assert len([t for t in executor._threads if t.is_alive()]) == 1
+    executor.shutdown()
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import gzip
+
+import logsink
+from config import LogConfig
+from logsink import RotatingLogWriter
+
+
+def test_failed_flush_keeps_lines_and_reports_once(tmp_path, capsys):
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    writer = RotatingLogWriter(blocker / "powerstack.log", LogConfig(buffer_lines=100, flush_seconds=0.0))
+    writer.write("first")
+    writer.write("second")
+    assert capsys.readouterr().err.count("[ERROR]") == 1
+    blocker.unlink()
+    writer.write("third")
+    lines = (blocker / "powerstack.log").read_text().splitlines()
+    assert [line.split("] ", 1)[1] for line in lines] == ["first", "second", "third"]
+
+
+def test_failed_compression_keeps_the_live_log(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "powerstack.log"
+    writer = RotatingLogWriter(path, LogConfig(max_bytes=40, buffer_lines=100, flush_seconds=0.0))
+    writer.write("x" * 30)
+
+    def broken_open(*_args, **_kwargs):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(logsink.gzip, "open", broken_open)
+    writer.write("y" * 30)
+    assert "No space left" in capsys.readouterr().err
+    assert not path.with_name("powerstack.log.rotating").exists()
+    assert not path.with_name("powerstack.log.1.gz").exists()
+    monkeypatch.undo()
+    writer.write("z")
+    assert "x" * 30 in gzip.open(path.with_name("powerstack.log.1.gz"), "rt").read()
+    assert path.read_text().count("y" * 30) == 1
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from config import MetricsConfig
+from metrics import MetricsRegistry
+
+
+def test_failed_flush_keeps_deltas_for_the_next_one(tmp_path, capsys):
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    registry = MetricsRegistry()
+    registry.configure(MetricsConfig(textfile_path=str(blocker / "powerstack.prom"), flush_seconds=0.0))
+    fires = registry.counter("test_fires_total", "Fires.", ("host",))
+    fires.inc(host="pc1")
+    registry.flush()
+    fires.inc(host="pc1")
+    registry.flush()
+    assert capsys.readouterr().err.count("[ERROR]") == 1
+    blocker.unlink()
+    registry.flush()
+    assert 'test_fires_total{host="pc1"} 2' in (blocker / "powerstack.prom").read_text()
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import fleet
+from config import AppConfig, HostConfig
+from control import CommandResult
+from fleet import FleetController
+
+
+def _fleet() -> tuple[FleetController, HostConfig]:
+    host = HostConfig(name="pc-01", host="192.0.2.10", user="ops")
+    controller = FleetController(AppConfig(hosts=[host]), None, lambda _message: None)
+    return controller, host
+
+
+def test_silent_probe_does_not_skip_suspend(monkeypatch):
+    controller, host = _fleet()
+    monkeypatch.setattr(fleet, "reachable", lambda *_args: False)
+    assert controller.plan("suspend", host) is None
+    assert controller.plan("force-off", host) is None
+    assert controller.power_states.get(host.name) is None
+
+
+def test_answered_probe_skips_wake(monkeypatch):
+    controller, host = _fleet()
+    monkeypatch.setattr(fleet, "reachable", lambda *_args: True)
+    result = controller.plan("wake", host)
+    assert result is not None and result.ok
+    assert controller.plan("suspend", host) is None
+
+
+def test_recent_suspend_skips_suspend(monkeypatch):
+    controller, host = _fleet()
+    monkeypatch.setattr(fleet, "reachable", lambda *_args: False)
+    controller.note_result("suspend", host, CommandResult(True, "Suspend command sent."))
+    result = controller.plan("suspend", host)
+    assert result is not None and "skipped" in result.message
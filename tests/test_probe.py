@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import errno
+import socket
+
+import pytest
+
+import probe
+from config import ConfirmConfig
+from probe import reachable, wait_for_state
+from pulse import PulseTimeline
+
+
+FAST = ConfirmConfig(initial_delay_seconds=0.05, max_delay_seconds=0.1, connect_timeout_seconds=0.2)
+
+
+@pytest.fixture
+def timeline() -> PulseTimeline:
+    return PulseTimeline("test-probes")
+
+
+@pytest.fixture
+def listener():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(8)
+    yield sock
+    sock.close()
+
+
+@pytest.fixture
+def silent_port():
+    """A port that drops SYNs: a listener whose backlog is already full, like a sleeping host."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(0)
+    port = sock.getsockname()[1]
+    fillers = []
+    for _ in range(4):
+        filler = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        filler.setblocking(False)
+        filler.connect_ex(("127.0.0.1", port))
+        fillers.append(filler)
+    yield port
+    for filler in fillers:
+        filler.close()
+    sock.close()
+
+
+def _closed_port() -> int:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def test_listener_confirms_up(listener, timeline):
+    port = listener.getsockname()[1]
+    assert wait_for_state("127.0.0.1", port, True, 2.0, FAST, timeline).result(timeout=5) is not None
+
+
+def test_silent_host_confirms_down(silent_port, timeline):
+    assert wait_for_state("127.0.0.1", silent_port, False, 2.0, FAST, timeline).result(timeout=5) is not None
+
+
+def test_deadline_yields_none(listener, timeline):
+    port = listener.getsockname()[1]
+    assert wait_for_state("127.0.0.1", port, False, 0.3, FAST, timeline).result(timeout=5) is None
+
+
+def test_refused_connect_counts_as_up(timeline):
+    port = _closed_port()
+    assert reachable("127.0.0.1", port, 0.5) is True
+    assert wait_for_state("127.0.0.1", port, True, 2.0, FAST, timeline).result(timeout=5) is not None
+    assert wait_for_state("127.0.0.1", port, False, 0.3, FAST, timeline).result(timeout=5) is None
+
+
+def test_failing_step_fails_the_future(listener, timeline, monkeypatch):
+    port = listener.getsockname()[1]
+
+    def no_sockets(*_args, **_kwargs):
+        raise OSError(errno.EMFILE, "Too many open files")
+
+    monkeypatch.setattr(probe.socket, "socket", no_sockets)
+    future = wait_for_state("127.0.0.1", port, True, 2.0, FAST, timeline)
+    error = future.exception(timeout=5)
+    assert isinstance(error, OSError) and error.errno == errno.EMFILE
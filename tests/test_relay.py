@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from config import RelayConfig
+from control import RelayController
+from pulse import PulseTimeline
+
+
+def test_failing_completion_fails_the_press_and_frees_the_channel():
+    calls = []
+
+    def log(message: str) -> None:
+        calls.append(message)
+        if "first complete" in message:
+            raise RuntimeError("log sink broke")
+
+    relay = RelayController(RelayConfig(holdoff_seconds=0.0), log, PulseTimeline("test-relay"))
+    first = relay.press(0.01, label="first")
+    second = relay.press(0.01, label="second")
+    with pytest.raises(RuntimeError):
+        first.result(timeout=5)
+    assert second.result(timeout=5) is None
+    assert any(message.startswith("first failed") for message in calls)
+
+
+def _timed(relay: RelayController, pin: int, label: str, spans: dict[str, list[float]]):
+    future = relay.press(0.2, label=label, channel=pin)
+    spans[label] = [time.monotonic()]
+    future.add_done_callback(lambda _f: spans[label].append(time.monotonic()))
+    return future
+
+
+def test_channels_overlap_but_one_channel_runs_in_order():
+    relay = RelayController(RelayConfig(gpio_pin=4, holdoff_seconds=0.0), lambda _msg: None, PulseTimeline("test-relay"))
+    spans: dict[str, list[float]] = {}
+    started = time.monotonic()
+    jobs = [_timed(relay, 4, "a1", spans), _timed(relay, 4, "a2", spans), _timed(relay, 17, "b1", spans)]
+    for job in jobs:
+        job.result(timeout=5)
+    assert relay.channels() == [4, 17]
+    assert spans["b1"][1] - started < 0.35  # ran alongside a1
+    assert spans["a2"][1] - started >= 0.4  # waited for a1
+    assert spans["a1"][1] <= spans["a2"][1]
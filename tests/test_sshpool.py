@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import stat
+
+from config import RemoteConfig, SshPoolConfig
+from sshpool import SshConnectionPool
+
+
+REMOTE = RemoteConfig(host="pc.lan", user="me", port=2222)
+
+
+def test_command_creates_the_socket_dir(tmp_path):
+    socket_dir = tmp_path / "ssh"
+    pool = SshConnectionPool(SshPoolConfig(enabled=True), lambda _msg: None, socket_dir)
+    cmd = pool.command(REMOTE)
+    assert socket_dir.is_dir()
+    assert stat.S_IMODE(socket_dir.stat().st_mode) == 0o700
+    control_path = next(arg for arg in cmd if arg.startswith("ControlPath="))
+    assert control_path.partition("=")[2].startswith(str(socket_dir))
+    assert cmd[-1] == "me@pc.lan"
+
+
+def test_command_without_multiplexing_leaves_no_dir(tmp_path):
+    socket_dir = tmp_path / "ssh"
+    pool = SshConnectionPool(SshPoolConfig(enabled=False), lambda _msg: None, socket_dir)
+    cmd = pool.command(REMOTE)
+    assert not socket_dir.exists()
+    assert not any(arg.startswith("ControlPath=") for arg in cmd)
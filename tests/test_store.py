@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import sqlite3
+
+from config import ScheduleEvent
+from store import SqliteScheduleStore
+
+
+def _event(event_id: str, label: str, time_hhmm: str = "07:00") -> ScheduleEvent:
+    return ScheduleEvent(id=event_id, label=label, action="wake", time_hhmm=time_hhmm)
+
+
+def test_migrates_a_table_with_label_key(tmp_path):
+    path = tmp_path / "schedule.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE events (
+            id TEXT PRIMARY KEY, position INTEGER NOT NULL, label TEXT NOT NULL,
+            label_key TEXT NOT NULL, action TEXT NOT NULL, time_hhmm TEXT NOT NULL,
+            recurrence TEXT NOT NULL, date_ymd TEXT NOT NULL, weekdays TEXT NOT NULL,
+            enabled INTEGER NOT NULL, target TEXT NOT NULL
+        );
+        CREATE INDEX idx_events_label_key ON events(label_key);
+        CREATE INDEX idx_events_position ON events(position);
+        INSERT INTO events VALUES ('b', 0, 'Later', 'later', 'wake', '08:00', 'weekly', '', '[0]', 1, '');
+        INSERT INTO events VALUES ('a', 1, 'Sooner', 'sooner', 'suspend', '07:00', 'weekly', '', '[1, 2]', 0, 'pc1');
+        """
+    )
+    conn.close()
+    store = SqliteScheduleStore(path)
+    assert "label_key" not in store._columns()
+    events = store.load_all()
+    assert [(e.id, e.label, e.weekdays, e.enabled, e.target) for e in events] == [
+        ("b", "Later", [0], True, ""),
+        ("a", "Sooner", [1, 2], False, "pc1"),
+    ]
+    events.append(_event("c", "New"))
+    assert store.save_all(events) == 1
+    store.close()
+    assert [e.id for e in SqliteScheduleStore(path).load_all()] == ["b", "a", "c"]
+
+
+def test_save_all_writes_only_what_changed_since_the_load(tmp_path):
+    store = SqliteScheduleStore(tmp_path / "schedule.db")
+    store.replace_all([_event("a", "A"), _event("b", "B"), _event("c", "C")])
+    events = store.load_all()
+    assert store.save_all(events) == 0
+    events[1].time_hhmm = "09:00"
+    del events[2]
+    events.append(_event("d", "D"))
+    assert store.save_all(events) == 3  # b changed, c removed, d added
+    assert store.save_all(events) == 0
+    assert [(e.id, e.time_hhmm) for e in store.load_all()] == [("a", "07:00"), ("b", "09:00"), ("d", "07:00")]
+
+
+def test_concurrent_writers_keep_each_others_edits(tmp_path):
+    path = tmp_path / "schedule.db"
+    SqliteScheduleStore(path).replace_all([_event("a", "A"), _event("b", "B")])
+    first, second = SqliteScheduleStore(path), SqliteScheduleStore(path)
+    mine, theirs = first.load_all(), second.load_all()
+    mine[0].enabled = False
+    theirs[1].label = "Renamed"
+    theirs.append(_event("c", "C"))
+    assert first.save_all(mine) == 1
+    assert second.save_all(theirs) == 2
+    events = SqliteScheduleStore(path).load_all()
+    assert [(e.id, e.label, e.enabled) for e in events] == [("a", "A", False), ("b", "Renamed", True), ("c", "C", True)]
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+import watch
+from watch import FileWatcher
+
+
+def test_stop_forgets_closed_descriptors(tmp_path):
+    if watch._load_inotify() is None:
+        pytest.skip("inotify not available")
+    watcher = FileWatcher([tmp_path / "config.json"], lambda: None, lambda: None)
+    assert watcher.start() == "inotify"
+    watcher.stop()
+    watcher._thread.join(5)
+    assert (watcher._fd, watcher._wake_r, watcher._wake_w) == (-1, -1, -1)
+    watcher.stop()  # must not write to a descriptor number now owned by someone else
+
+
+def test_callback_errors_are_logged(tmp_path, monkeypatch):
+    monkeypatch.setattr(watch, "_load_inotify", lambda: None)
+    path = tmp_path / "config.json"
+    path.write_text("{}")
+    logged: list[str] = []
+    called = threading.Event()
+
+    def on_change() -> None:
+        called.set()
+        raise RuntimeError("reload broke")
+
+    def log(message: str) -> None:
+        logged.append(message)
+
+    watcher = FileWatcher([path], on_change, lambda: path.read_text(), poll_seconds=0.1, log=log)
+    assert watcher.start() == "polling"
+    for attempt in range(50):  # the first write may land before the poller's first stamp
+        path.write_text(f'{{"attempt": {attempt}}}')
+        if called.wait(0.1):
+            break
+    assert called.is_set()
+    watcher.stop()
+    watcher._thread.join(5)
+    assert any("reload broke" in message for message in logged)
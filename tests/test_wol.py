@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import socket
+
+import pytest
+
+from config import RelayConfig, RemoteConfig
+from wol import magic_packet, parse_mac, send_magic_packet, wake_on_lan
+
+
+MAC = bytes.fromhex("aabbccddeeff")
+
+
+@pytest.mark.parametrize("text", ["aa:bb:cc:dd:ee:ff", "AA-BB-CC-DD-EE-FF", "aabb.ccdd.eeff", "aabbccddeeff"])
+def test_parse_mac_accepts_common_formats(text):
+    assert parse_mac(text) == MAC
+
+
+@pytest.mark.parametrize("text", ["", "aa:bb:cc:dd:ee", "aa:bb:cc:dd:ee:ff:00", "gg:bb:cc:dd:ee:ff"])
+def test_parse_mac_rejects_malformed_addresses(text):
+    with pytest.raises(ValueError, match="Invalid MAC address"):
+        parse_mac(text)
+
+
+def test_magic_packet_is_sync_stream_then_mac_sixteen_times():
+    packet = magic_packet("aa:bb:cc:dd:ee:ff")
+    assert len(packet) == 102
+    assert packet[:6] == b"\xff" * 6
+    assert packet[6:] == MAC * 16
+
+
+@pytest.fixture
+def listener():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(5)
+    yield sock
+    sock.close()
+
+
+def test_send_magic_packet_sends_each_copy(listener):
+    port = listener.getsockname()[1]
+    assert send_magic_packet("aa:bb:cc:dd:ee:ff", "127.0.0.1", port, repeat=3) == 3
+    for _ in range(3):
+        assert listener.recv(1024) == magic_packet("aa:bb:cc:dd:ee:ff")
+
+
+def test_wake_on_lan_uses_host_overrides(listener):
+    port = listener.getsockname()[1]
+    host = RemoteConfig(mac="aa:bb:cc:dd:ee:ff", wol_broadcast="127.0.0.1")
+    result = wake_on_lan(host, RelayConfig(wol_broadcast="192.0.2.255", wol_port=port, wol_repeat=1))
+    assert result.ok, result.message
+    assert "127.0.0.1" in result.message
+    assert listener.recv(1024) == magic_packet(host.mac)
+
+
+def test_wake_on_lan_reports_missing_or_bad_mac():
+    relay = RelayConfig(wol_broadcast="127.0.0.1")
+    missing = wake_on_lan(RemoteConfig(), relay)
+    assert not missing.ok and "No MAC address" in missing.message
+    bad = wake_on_lan(RemoteConfig(mac="not-a-mac"), relay)
+    assert not bad.ok and bad.message.startswith("Wake-on-LAN failed")
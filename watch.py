@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+from pathlib import Path
+from typing import Callable, Hashable
+
+
+# inotify(7) constants
+_IN_MODIFY = 0x002
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+
+def _load_inotify():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        libc.inotify_init1  # noqa: B018 - raises AttributeError off Linux
+        libc.inotify_add_watch
+    except (OSError, AttributeError):  # pragma: no cover - non-Linux dev machines
+        return None
+    return libc
+
+
+class FileWatcher:
+    """Calls *on_change* from a background thread when any of *paths* changes.
+
+    Uses inotify on the files' directories, which catches atomic
+    replace-by-rename writes as well as in-place ones, and falls back to
+    comparing *stamp()* (e.g. ``AppConfig.stamp``) every *poll_seconds*
+    where inotify is unavailable. Bursts of events (a temp file plus its
+    rename) within *settle_seconds* produce a single callback. Callers
+    should treat the callback as a hint and check whether the content
+    really changed.
+    """
+
+    def __init__(
+        self,
+        paths: list[Path],
+        on_change: Callable[[], None],
+        stamp: Callable[[], Hashable],
+        poll_seconds: float = 2.0,
+        settle_seconds: float = 0.2,
+        log: Callable[[str], None] = print,
+    ):
+        self.on_change = on_change
+        self.log = log
+        self.stamp = stamp
+        self.poll_seconds = poll_seconds
+        self.settle_seconds = settle_seconds
+        self.mode = ""
+        self._paths: list[Path] = []
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._libc = None
+        self._fd = -1
+        self._wake_r, self._wake_w = -1, -1
+        self._watches: dict[int, Path] = {}  # wd -> directory
+        self._dirs: dict[Path, int] = {}
+        self._thread: threading.Thread | None = None
+        self.set_paths(paths)
+
+    def start(self) -> str:
+        """Start watching; returns "inotify" or "polling"."""
+        libc = _load_inotify()
+        if libc is not None:
+            fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+            if fd >= 0:
+                self._libc = libc
+                self._fd = fd
+                self._wake_r, self._wake_w = os.pipe()
+                self._add_watches()
+        self.mode = "inotify" if self._fd >= 0 else "polling"
+        target = self._run_inotify if self._fd >= 0 else self._run_polling
+        self._thread = threading.Thread(target=target, name="powerstack-watch", daemon=True)
+        self._thread.start()
+        return self.mode
+
+    def set_paths(self, paths: list[Path]) -> None:
+        """Watch a new set of files (e.g. after the schedule moved to SQLite)."""
+        with self._lock:
+            self._paths = [Path(p) for p in paths]
+        if self._fd >= 0:
+            self._add_watches()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        with self._lock:  # the watch thread closes the pipe under the same lock
+            if self._wake_w >= 0:
+                try:
+                    os.write(self._wake_w, b"x")
+                except OSError:
+                    pass
+
+    # ------------------------------------------------------------------
+    # inotify
+    # ------------------------------------------------------------------
+
+    def _add_watches(self) -> None:
+        with self._lock:
+            dirs = {p.parent for p in self._paths}
+        for directory in dirs:
+            if directory in self._dirs:
+                continue
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+            if wd >= 0:
+                with self._lock:
+                    self._dirs[directory] = wd
+                    self._watches[wd] = directory
+
+    def _relevant(self, data: bytes) -> bool:
+        with self._lock:
+            names = {(p.parent, p.name) for p in self._paths}
+            watches = dict(self._watches)
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, _mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            if (watches.get(wd), name) in names:
+                return True
+        return False
+
+    def _run_inotify(self) -> None:
+        try:
+            while not self._stopping.is_set():
+                readable, _, _ = select.select([self._fd, self._wake_r], [], [])
+                if self._wake_r in readable:
+                    break
+                if not self._relevant(self._drain()):
+                    continue
+                # Let the writer finish (temp file, rename, WAL) before reporting.
+                if self._stopping.wait(self.settle_seconds):
+                    break
+                self._drain()
+                self._notify()
+        finally:
+            with self._lock:
+                for fd in (self._fd, self._wake_r, self._wake_w):
+                    try:
+                        os.close(fd)
+                    except OSError:
+                        pass
+                # A closed number may be reused by an unrelated file; never touch it again.
+                self._fd = self._wake_r = self._wake_w = -1
+
+    def _drain(self) -> bytes:
+        chunks = []
+        while True:
+            try:
+                chunk = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    # ------------------------------------------------------------------
+    # polling fallback
+    # ------------------------------------------------------------------
+
+    def _run_polling(self) -> None:
+        last = self.stamp()
+        while not self._stopping.wait(max(0.1, self.poll_seconds)):
+            stamp = self.stamp()
+            if stamp != last:
+                last = stamp
+                self._notify()
+
+    def _notify(self) -> None:
+        try:
+            self.on_change()
+        except Exception as exc:
+            self.log(f"[WARN] Config watch callback failed: {exc!r}")
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import socket
+
+from config import RelayConfig, RemoteConfig
+from control import CommandResult
+
+
+# SO_BINDTODEVICE is Linux-only and missing from older Python builds.
+_SO_BINDTODEVICE = getattr(socket, "SO_BINDTODEVICE", 25)
+
+
+def parse_mac(mac: str) -> bytes:
+    """``aa:bb:cc:dd:ee:ff`` (or ``-``/``.`` separated, or bare hex) as 6 bytes."""
+    digits = "".join(c for c in mac if c not in ":-. ")
+    if len(digits) != 12:
+        raise ValueError(f"Invalid MAC address: {mac!r}")
+    try:
+        return bytes.fromhex(digits)
+    except ValueError:
+        raise ValueError(f"Invalid MAC address: {mac!r}") from None
+
+
+def magic_packet(mac: str) -> bytes:
+    """Six 0xFF bytes followed by the MAC sixteen times."""
+    return b"\xff" * 6 + parse_mac(mac) * 16
+
+
+def send_magic_packet(
+    mac: str,
+    broadcast: str = "255.255.255.255",
+    port: int = 9,
+    interface: str = "",
+    repeat: int = 1,
+) -> int:
+    """Broadcast the magic packet for *mac* *repeat* times; returns packets sent.
+
+    *interface* pins the packet to one NIC (needs CAP_NET_RAW); otherwise the
+    routing table picks it from *broadcast*. Raises ValueError for a bad MAC
+    and OSError when the packet cannot be sent.
+    """
+    packet = magic_packet(mac)
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        if interface:
+            sock.setsockopt(socket.SOL_SOCKET, _SO_BINDTODEVICE, interface.encode())
+        count = max(1, repeat)
+        for _ in range(count):
+            sock.sendto(packet, (broadcast, port))
+    return count
+
+
+def wake_on_lan(host: RemoteConfig, relay: RelayConfig) -> CommandResult:
+    """Send *host* its magic packet using the host's overrides of the relay's WoL settings."""
+    if not host.mac:
+        return CommandResult(False, "No MAC address configured for Wake-on-LAN.")
+    broadcast = host.wol_broadcast or relay.wol_broadcast
+    interface = host.wol_interface or relay.wol_interface
+    try:
+        sent = send_magic_packet(host.mac, broadcast, relay.wol_port, interface, relay.wol_repeat)
+    except (ValueError, OSError) as exc:
+        return CommandResult(False, f"Wake-on-LAN failed: {exc}")
+    via = f" via {interface}" if interface else ""
+    return CommandResult(True, f"Wake-on-LAN packet sent to {host.mac} ({broadcast}{via}, x{sent}).")